@@ -0,0 +1,156 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+from uuid import UUID
+from datetime import date, datetime, timedelta
+
+from ..core.database import get_read_db
+from ..models.equipment import Equipment
+from ..models.analytics import (
+    ScanDailyEquipment, ScanDailyUser, ScanConfidenceHistogram, CONFIDENCE_BUCKETS
+)
+from ..schemas.analytics import (
+    TopEquipmentResponse, EquipmentScanCount, DailySeriesResponse, DailyCount,
+    ConfidenceHistogramResponse, ConfidenceBucket
+)
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Longest date range a single dashboard query may cover
+MAX_RANGE_DAYS = 366
+
+def _date_range(start: Optional[date], end: Optional[date], default_days: int) -> Tuple[date, date]:
+    """Resolve an inclusive date range, defaulting to the trailing `default_days`"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=default_days - 1)
+    
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_RANGE_DAYS} days")
+    
+    return start, end
+
+def _fill_days(start: date, end: date, rows) -> DailySeriesResponse:
+    """Build a gap-free day series from (day, count) rows"""
+    counts = {row.day: row.scan_count for row in rows}
+    days = [
+        DailyCount(day=start + timedelta(days=i), scan_count=counts.get(start + timedelta(days=i), 0))
+        for i in range((end - start).days + 1)
+    ]
+    return DailySeriesResponse(
+        start=start,
+        end=end,
+        total=sum(day.scan_count for day in days),
+        days=days
+    )
+
+@router.get("/equipment/top", response_model=TopEquipmentResponse)
+async def get_top_equipment(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(10, le=100),
+    db: Session = Depends(get_read_db)
+):
+    """Get the most scanned equipment over a date range (defaults to today)"""
+    start, end = _date_range(start, end, default_days=1)
+    
+    total = func.sum(ScanDailyEquipment.scan_count).label("scan_count")
+    rows = db.query(
+        ScanDailyEquipment.equipment_id,
+        Equipment.name_en,
+        Equipment.class_name,
+        total
+    ).outerjoin(
+        Equipment, Equipment.equipment_id == ScanDailyEquipment.equipment_id
+    ).filter(
+        ScanDailyEquipment.day.between(start, end)
+    ).group_by(
+        ScanDailyEquipment.equipment_id, Equipment.name_en, Equipment.class_name
+    ).order_by(total.desc()).limit(limit).all()
+    
+    return TopEquipmentResponse(
+        start=start,
+        end=end,
+        items=[
+            EquipmentScanCount(
+                equipment_id=row.equipment_id,
+                name_en=row.name_en,
+                class_name=row.class_name,
+                scan_count=row.scan_count
+            )
+            for row in rows
+        ]
+    )
+
+@router.get("/equipment/{equipment_id}/daily", response_model=DailySeriesResponse)
+async def get_equipment_daily(
+    equipment_id: UUID,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get daily scan counts for one piece of equipment (defaults to last 30 days)"""
+    start, end = _date_range(start, end, default_days=30)
+    
+    rows = db.query(ScanDailyEquipment.day, ScanDailyEquipment.scan_count).filter(
+        ScanDailyEquipment.equipment_id == str(equipment_id),
+        ScanDailyEquipment.day.between(start, end)
+    ).all()
+    
+    return _fill_days(start, end, rows)
+
+@router.get("/users/{user_id}/daily", response_model=DailySeriesResponse)
+async def get_user_daily(
+    user_id: UUID,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get daily scan activity for a user (defaults to last 30 days)"""
+    start, end = _date_range(start, end, default_days=30)
+    
+    rows = db.query(ScanDailyUser.day, ScanDailyUser.scan_count).filter(
+        ScanDailyUser.user_id == str(user_id),
+        ScanDailyUser.day.between(start, end)
+    ).all()
+    
+    return _fill_days(start, end, rows)
+
+@router.get("/confidence", response_model=ConfidenceHistogramResponse)
+async def get_confidence_histogram(
+    equipment_id: Optional[UUID] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get the confidence score histogram, optionally for one piece of equipment"""
+    start, end = _date_range(start, end, default_days=30)
+    
+    query = db.query(
+        ScanConfidenceHistogram.bucket,
+        func.sum(ScanConfidenceHistogram.scan_count)
+    ).filter(ScanConfidenceHistogram.day.between(start, end))
+    
+    if equipment_id:
+        query = query.filter(ScanConfidenceHistogram.equipment_id == str(equipment_id))
+    
+    counts = dict(query.group_by(ScanConfidenceHistogram.bucket).all())
+    width = 1.0 / CONFIDENCE_BUCKETS
+    buckets = [
+        ConfidenceBucket(
+            lower=round(i * width, 4),
+            upper=round((i + 1) * width, 4),
+            scan_count=counts.get(i, 0) or 0
+        )
+        for i in range(CONFIDENCE_BUCKETS)
+    ]
+    
+    return ConfidenceHistogramResponse(
+        start=start,
+        end=end,
+        equipment_id=equipment_id,
+        total=sum(bucket.scan_count for bucket in buckets),
+        buckets=buckets
+    )
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, Request, Response, status
+import os
+
+from ..core.config import settings
+from ..core.http_cache import etag_matches
+from ..core.streaming import FileRangeResponse, RangeNotSatisfiable, parse_range
+from ..services.asset_store import ASSET_CACHE_CONTROL, asset_path
+
+router = APIRouter(prefix="/assets", tags=["Assets"])
+
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+
+@router.api_route("/{key}/{name}", methods=["GET", "HEAD"])
+async def get_asset(key: str, name: str, request: Request):
+    """Serve a stored image or thumbnail (immutable, with byte-range support)"""
+    path = asset_path(key, name)
+    try:
+        stat = os.stat(path) if path else None
+    except FileNotFoundError:
+        stat = None
+    if stat is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    
+    etag = f'"{key[:32]}-{name}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": ASSET_CACHE_CONTROL,
+    }
+    media_type = MEDIA_TYPES[name.rsplit(".", 1)[1]]
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if settings.ASSET_ACCEL_REDIRECT_PREFIX:
+        # A fronting nginx serves the file with sendfile and handles Range itself
+        headers["X-Accel-Redirect"] = f"{settings.ASSET_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{key[:2]}/{key}/{name}"
+        return Response(headers=headers, media_type=media_type)
+    
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), stat.st_size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{stat.st_size}"}
+            )
+    
+    return FileRangeResponse(
+        str(path),
+        stat.st_size,
+        byte_range,
+        headers=headers,
+        media_type=media_type
+    )
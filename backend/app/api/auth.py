@@ -3,8 +3,6 @@ from sqlalchemy.orm import Session
 from typing import Optional
 import random
 from datetime import datetime, timedelta
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from uuid import UUID
 
 from ..core.database import get_db
@@ -13,6 +11,9 @@ from ..core.security import create_access_token
 from ..core.config import settings
 from ..models.user import User, AuthMethod
 from ..schemas.user import TokenResponse, UserResponse
+from ..services.google_auth import google_verifier
+from ..services.sms import sms_sender
+from ..services.upstream import UpstreamError
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -39,22 +40,18 @@ async def google_signin(
 ):
     """Authenticate user with Google OAuth ID token"""
     try:
-        # Verify Google ID token (in production, uncomment this)
-        # idinfo = id_token.verify_oauth2_token(
-        #     request.id_token,
-        #     requests.Request(),
-        #     settings.GOOGLE_CLIENT_ID
-        # )
-        # google_id = idinfo['sub']
-        # email = idinfo['email']
-        # name = idinfo.get('name')
-        # picture = idinfo.get('picture')
-        
-        # For demo purposes, use mock data
-        google_id = f"google_{random.randint(10000, 99999)}"
-        email = f"user{random.randint(1000, 9999)}@gmail.com"
-        name = "Demo User"
-        picture = None
+        if google_verifier.enabled:
+            idinfo = await google_verifier.verify(request.id_token)
+            google_id = idinfo['sub']
+            email = idinfo.get('email')
+            name = idinfo.get('name')
+            picture = idinfo.get('picture')
+        else:
+            # No client id configured: demo sign-in with mock data
+            google_id = f"google_{random.randint(10000, 99999)}"
+            email = f"user{random.randint(1000, 9999)}@gmail.com"
+            name = "Demo User"
+            picture = None
         
         # Check if user exists
         user = db.query(User).filter(User.google_id == google_id).first()
@@ -86,7 +83,12 @@ async def google_signin(
             access_token=access_token,
             user=UserResponse.from_orm(user)
         )
-        
+    
+    except UpstreamError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Google sign-in is temporarily unavailable. Please try again."
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -126,17 +128,15 @@ async def send_otp(
     redis.incr(rate_key)
     redis.expire(rate_key, 3600)
     
-    # Send SMS (in production, use Twilio)
-    # from twilio.rest import Client
-    # client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-    # message = client.messages.create(
-    #     body=f"Your EdTech Scanner OTP is: {otp_code}",
-    #     from_=settings.TWILIO_PHONE_NUMBER,
-    #     to=request.phone_number
-    # )
-    
-    # For demo, just log the OTP
-    print(f"OTP for {request.phone_number}: {otp_code}")
+    # Send SMS (printed only when Twilio is not configured)
+    try:
+        await sms_sender.send(request.phone_number, f"Your EdTech Scanner OTP is: {otp_code}")
+    except UpstreamError:
+        redis.delete(otp_key)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not send the OTP right now. Please try again shortly."
+        )
     
     return {
         "message": "OTP sent successfully",
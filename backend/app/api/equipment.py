@@ -1,24 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from sqlalchemy import or_, and_
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from uuid import UUID
+from datetime import datetime
+import asyncio
 
-from ..core.database import get_db
-from ..models.equipment import Equipment
-from ..schemas.equipment import EquipmentResponse, EquipmentListResponse, EquipmentCreate
+from ..core.config import settings
+from ..core.database import get_db, get_read_db, mark_written, STICKY_GLOBAL
+from ..core.http_cache import make_etag, conditional_response
+from ..core.negotiation import VARY, negotiate, negotiated_response
+from ..core.streaming import RequestBodyStreamingResponse
+from ..models.equipment import Equipment, EquipmentTombstone
+from ..schemas.equipment import (
+    EquipmentResponse, EquipmentListResponse, EquipmentCreate, EquipmentChangesResponse,
+    EquipmentBrowseResponse, EquipmentBatchResponse, EquipmentSummary, FacetCount, SimilarEquipment,
+    SimilarEquipmentResponse
+)
+from ..services.asset_store import AssetError, equipment_image_url, image_variants, ingest_image
+from ..services.catalog import equipment_by_id, get_catalog_version, notify_catalog_changed
+from ..services.catalog_facets import facet_index
+from ..services.catalog_import import IMPORT_CONTENT_TYPES, import_catalog
+from ..services.vector_index import reference_index
 
 router = APIRouter(prefix="/equipment", tags=["Equipment"])
 
+# Device width in pixels (already multiplied by the pixel ratio); picks the thumbnail size
+IMAGE_WIDTH_QUERY = Query(None, ge=1, le=4096)
+# Ids per /batch request (one IN query; also keeps URLs within proxy limits)
+MAX_BATCH_IDS = 100
+
+def to_response(equipment: Equipment, image_width: Optional[int] = None) -> EquipmentResponse:
+    """Build the API representation, pointing image_url at the thumbnail for the device"""
+    result = EquipmentResponse.from_orm(equipment)
+    if equipment.image_key:
+        result.image_url = equipment_image_url(equipment, image_width)
+        result.image_variants = image_variants(equipment.image_key)
+    return result
+
+def to_summary(equipment: Equipment, image_width: Optional[int] = None) -> EquipmentSummary:
+    """Compact representation embedded in other responses (e.g. scan history)"""
+    result = EquipmentSummary.from_orm(equipment)
+    result.image_url = equipment_image_url(equipment, image_width)
+    return result
+
 @router.get("/list", response_model=EquipmentListResponse)
 async def get_equipment_list(
+    request: Request,
+    response: Response,
     category: Optional[str] = None,
     search: Optional[str] = None,
     language: str = "en",
     limit: int = Query(50, le=100),
     offset: int = 0,
-    db: Session = Depends(get_db)
+    image_width: Optional[int] = IMAGE_WIDTH_QUERY,
+    db: Session = Depends(get_read_db)
 ):
-    """Get list of all equipment with optional filters"""
+    """Get list of all equipment with optional filters
+    
+    JSON, MessagePack or CBOR per `Accept`, compressed per `Accept-Encoding`.
+    """
+    # Answer repeat syncs from the catalog version before touching any rows
+    version, last_modified = get_catalog_version(db)
+    representation = negotiate(request)
+    etag = make_etag("list", version, category, search, language, limit, offset, image_width, *representation)
+    response.headers["Vary"] = VARY
+    not_modified = conditional_response(request, response, etag, last_modified)
+    if not_modified:
+        return not_modified
+    
     query = db.query(Equipment)
     
     # Apply filters
@@ -37,29 +87,224 @@ async def get_equipment_list(
     # Apply pagination
     equipment_list = query.offset(offset).limit(limit).all()
     
-    return EquipmentListResponse(
+    return negotiated_response(request, EquipmentListResponse(
         total=total,
-        items=[EquipmentResponse.from_orm(eq) for eq in equipment_list]
+        items=[to_response(eq, image_width) for eq in equipment_list]
+    ), stream_field="items", headers=response.headers)
+
+@router.get("/categories")
+async def get_categories(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db)
+):
+    """Get list of all equipment categories"""
+    version, last_modified = get_catalog_version(db)
+    not_modified = conditional_response(request, response, make_etag("categories", version), last_modified)
+    if not_modified:
+        return not_modified
+    
+    # Served from the facet index rather than a DISTINCT scan per call
+    facet_index.sync(db, version)
+    return {"categories": facet_index.categories()}
+
+@router.get("/browse", response_model=EquipmentBrowseResponse)
+async def browse_equipment(
+    request: Request,
+    response: Response,
+    category: List[str] = Query([]),
+    tag: List[str] = Query([]),
+    match: str = "all",
+    limit: int = Query(50, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    facet_limit: int = Query(50, ge=0, le=1000),
+    image_width: Optional[int] = IMAGE_WIDTH_QUERY,
+    db: Session = Depends(get_read_db)
+):
+    """Browse equipment by category and tags, with category and tag counts
+    
+    Repeat `category` to allow several; repeat `tag` and pick `match=all`
+    (every tag) or `match=any`. Filtering and counting run on an in-memory
+    inverted index; only the returned page is read from the database.
+    """
+    if match not in ("all", "any"):
+        raise HTTPException(status_code=400, detail="match must be 'all' or 'any'")
+    
+    version, last_modified = get_catalog_version(db)
+    etag = make_etag(
+        "browse", version, sorted(category), sorted(tag), match, limit, offset, facet_limit, image_width
+    )
+    not_modified = conditional_response(request, response, etag, last_modified)
+    if not_modified:
+        return not_modified
+    
+    facet_index.sync(db, version)
+    result = facet_index.browse(category, tag, match == "all", offset, limit, facet_limit)
+    
+    rows = equipment_by_id(db, result.equipment_ids)
+    
+    return EquipmentBrowseResponse(
+        total=result.total,
+        # A row deleted since the index last synced is simply left out of the page
+        items=[to_response(rows[equipment_id], image_width) for equipment_id in result.equipment_ids if equipment_id in rows],
+        categories=[FacetCount(value=value, count=count) for value, count in result.categories],
+        tags=[FacetCount(value=value, count=count) for value, count in result.tags]
+    )
+
+@router.get("/batch", response_model=EquipmentBatchResponse)
+async def get_equipment_batch(
+    request: Request,
+    response: Response,
+    ids: List[str] = Query([], description="Equipment ids, comma-separated or repeated"),
+    image_width: Optional[int] = IMAGE_WIDTH_QUERY,
+    db: Session = Depends(get_read_db)
+):
+    """Get many equipment items in one request and one query
+    
+    Items come back in the order asked for (duplicates once); ids with no
+    equipment are listed in `missing`. JSON, MessagePack or CBOR per
+    `Accept`, compressed per `Accept-Encoding`.
+    """
+    requested = []
+    for value in ids:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                requested.append(str(UUID(part)))
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid equipment id: {part}")
+    requested = list(dict.fromkeys(requested))
+    if not requested:
+        raise HTTPException(status_code=400, detail="Pass the equipment ids to fetch in `ids`")
+    if len(requested) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    
+    version, last_modified = get_catalog_version(db)
+    representation = negotiate(request)
+    etag = make_etag("batch", version, requested, image_width, *representation)
+    response.headers["Vary"] = VARY
+    not_modified = conditional_response(request, response, etag, last_modified)
+    if not_modified:
+        return not_modified
+    
+    rows = equipment_by_id(db, requested)
+    
+    return negotiated_response(request, EquipmentBatchResponse(
+        items=[to_response(rows[equipment_id], image_width) for equipment_id in requested if equipment_id in rows],
+        missing=[equipment_id for equipment_id in requested if equipment_id not in rows]
+    ), stream_field="items", headers=response.headers)
+
+@router.get("/changes", response_model=EquipmentChangesResponse)
+async def get_equipment_changes(
+    updated_since: Optional[datetime] = None,
+    since_id: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    image_width: Optional[int] = IMAGE_WIDTH_QUERY,
+    db: Session = Depends(get_read_db)
+):
+    """Get equipment changed or deleted since a previous sync (delta catalog sync)
+    
+    Pass back `next_since` / `next_since_id` from the previous page; omit both
+    for a full sync. Updates and deletions share one feed ordered on the
+    indexed `updated_at` / `deleted_at` columns, so `limit` bounds both.
+    """
+    query = db.query(Equipment)
+    tombstones = []
+    
+    if updated_since:
+        query = query.filter(or_(
+            Equipment.updated_at > updated_since,
+            and_(Equipment.updated_at == updated_since, Equipment.equipment_id > (since_id or ""))
+        ))
+        tombstones = db.query(EquipmentTombstone).filter(or_(
+            EquipmentTombstone.deleted_at > updated_since,
+            and_(EquipmentTombstone.deleted_at == updated_since, EquipmentTombstone.equipment_id > (since_id or ""))
+        )).order_by(EquipmentTombstone.deleted_at, EquipmentTombstone.equipment_id).limit(limit + 1).all()
+    
+    rows = query.order_by(Equipment.updated_at, Equipment.equipment_id).limit(limit + 1).all()
+    changes = sorted(
+        [(eq.updated_at, eq.equipment_id, eq) for eq in rows]
+        + [(tombstone.deleted_at, tombstone.equipment_id, tombstone) for tombstone in tombstones],
+        key=lambda change: change[:2]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    # Advance the cursor past everything returned in this page
+    next_since, next_since_id = updated_since, since_id
+    if changes:
+        next_since, next_since_id = changes[-1][:2]
+    
+    return EquipmentChangesResponse(
+        items=[to_response(change, image_width) for _, _, change in changes if isinstance(change, Equipment)],
+        deleted=[change.equipment_id for _, _, change in changes if isinstance(change, EquipmentTombstone)],
+        next_since=next_since,
+        next_since_id=next_since_id,
+        has_more=has_more
     )
 
 @router.get("/{equipment_id}", response_model=EquipmentResponse)
 async def get_equipment_detail(
     equipment_id: UUID,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    image_width: Optional[int] = IMAGE_WIDTH_QUERY,
+    db: Session = Depends(get_read_db)
 ):
     """Get detailed information about specific equipment"""
-    equipment = db.query(Equipment).filter(Equipment.equipment_id == equipment_id).first()
+    equipment = db.query(Equipment).filter(Equipment.equipment_id == str(equipment_id)).first()
     
     if not equipment:
         raise HTTPException(status_code=404, detail="Equipment not found")
     
-    return EquipmentResponse.from_orm(equipment)
+    etag = make_etag("detail", equipment.equipment_id, equipment.updated_at, image_width)
+    not_modified = conditional_response(request, response, etag, equipment.updated_at)
+    if not_modified:
+        return not_modified
+    
+    return to_response(equipment, image_width)
 
-@router.get("/categories")
-async def get_categories(db: Session = Depends(get_db)):
-    """Get list of all equipment categories"""
-    categories = db.query(Equipment.category).distinct().all()
-    return {"categories": [cat[0] for cat in categories]}
+@router.get("/{equipment_id}/similar", response_model=SimilarEquipmentResponse)
+async def get_similar_equipment(
+    equipment_id: UUID,
+    limit: int = Query(5, ge=1, le=20),
+    image_width: Optional[int] = IMAGE_WIDTH_QUERY,
+    db: Session = Depends(get_read_db)
+):
+    """Get the equipment whose reference images look most like this one
+    
+    Classes are ranked by the cosine distance between their mean reference
+    embeddings; equipment without reference images has no neighbours.
+    """
+    equipment = db.query(Equipment).filter(Equipment.equipment_id == str(equipment_id)).first()
+    
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    
+    index = reference_index()
+    if index is None:
+        raise HTTPException(
+            status_code=503,
+            detail=(
+                "Reference embeddings have not been built: set embedding.tensor in models/model_config.json, "
+                "then run python manage.py build-embeddings"
+            )
+        )
+    
+    # Over-fetch so classes that have since left the catalog can be skipped
+    ranked = index.similar_classes(equipment.class_name, limit=limit * 2)
+    rows = {
+        eq.class_name: eq
+        for eq in db.query(Equipment).filter(Equipment.class_name.in_([name for name, _ in ranked]))
+    }
+    items = [
+        SimilarEquipment(equipment=to_response(rows[name], image_width), distance=distance)
+        for name, distance in ranked if name in rows
+    ]
+    
+    return SimilarEquipmentResponse(equipment_id=equipment_id, items=items[:limit])
 
 @router.post("/", response_model=EquipmentResponse)
 async def create_equipment(
@@ -76,5 +321,83 @@ async def create_equipment(
     db.add(new_equipment)
     db.commit()
     db.refresh(new_equipment)
+    mark_written(STICKY_GLOBAL)
+    notify_catalog_changed([new_equipment.equipment_id])
+    
+    return to_response(new_equipment)
+
+@router.post("/import")
+async def import_equipment(
+    request: Request,
+    chunk_size: int = Query(500, ge=1, le=5000)
+):
+    """Bulk create or update equipment from a streamed NDJSON or CSV body (Admin only - for demo purposes)
+    
+    Rows are validated as they arrive and upserted on class_name in chunks of
+    `chunk_size`; one NDJSON progress line per chunk (with row errors) and a
+    final summary line are streamed back while the upload continues.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = IMPORT_CONTENT_TYPES.get(content_type)
+    if not fmt:
+        raise HTTPException(
+            status_code=415,
+            detail="Send the catalog as NDJSON (application/x-ndjson) or CSV (text/csv)"
+        )
+    
+    return RequestBodyStreamingResponse(
+        import_catalog(request.stream(), fmt, chunk_size),
+        media_type="application/x-ndjson"
+    )
+
+@router.put("/{equipment_id}/image", response_model=EquipmentResponse)
+async def upload_equipment_image(
+    equipment_id: UUID,
+    image: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """Store a reference image and its WebP thumbnails for equipment (Admin only - for demo purposes)"""
+    equipment = db.query(Equipment).filter(Equipment.equipment_id == str(equipment_id)).first()
+    
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    
+    data = await image.read()
+    if len(data) > settings.MAX_FILE_SIZE_MB * 1024 * 1024:
+        raise HTTPException(status_code=400, detail=f"Image size exceeds {settings.MAX_FILE_SIZE_MB}MB limit")
+    
+    try:
+        # Decoding and thumbnail encoding are CPU-bound
+        equipment.image_key = await asyncio.to_thread(ingest_image, data)
+    except AssetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    db.commit()
+    db.refresh(equipment)
+    mark_written(STICKY_GLOBAL)
+    notify_catalog_changed([equipment.equipment_id])
+    
+    return to_response(equipment)
+
+@router.delete("/{equipment_id}")
+async def delete_equipment(
+    equipment_id: UUID,
+    db: Session = Depends(get_db)
+):
+    """Delete equipment and leave a tombstone for delta syncs (Admin only - for demo purposes)"""
+    equipment = db.query(Equipment).filter(Equipment.equipment_id == str(equipment_id)).first()
+    
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    
+    db.merge(EquipmentTombstone(
+        equipment_id=equipment.equipment_id,
+        class_name=equipment.class_name,
+        deleted_at=datetime.utcnow()
+    ))
+    db.delete(equipment)
+    db.commit()
+    mark_written(STICKY_GLOBAL)
+    notify_catalog_changed([str(equipment_id)])
     
-    return EquipmentResponse.from_orm(new_equipment)
+    return {"message": "Equipment deleted", "equipment_id": str(equipment_id)}
@@ -1,48 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Request, Response
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
 from typing import Optional
+from itertools import islice
 from uuid import UUID, uuid4
+from datetime import datetime
 import numpy as np
 from PIL import Image
+import asyncio
 import io
+import json
 
-from ..core.database import get_db
+from ..core.database import get_db, get_read_db, mark_written
+from ..core.metrics import metrics
+from ..core.negotiation import NegotiatedRoute, encodings, negotiate, negotiated_response, stream_body
+from ..core.security import require_admin
+from ..core.tracing import span
 from ..models.equipment import Equipment
 from ..models.scan import ScanMetadata
-from ..schemas.scan import ScanAnalysisResponse, ChatRequest, ChatResponse, ScanMetadataCreate
+from ..schemas.scan import (
+    ScanAnalysisResponse, ChatRequest, ChatResponse, ScanMetadataCreate, ModelInputSpecResponse,
+    ScanMetadataResponse, ScanHistoryResponse, ScanChangesResponse
+)
 from ..services.tflite_inference import TFLiteModel
+from ..services.raw_tensor import (
+    RAW_TENSOR_CONTENT_TYPE, RAW_TENSOR_HEADER, RawTensorError, RawTensorSpecMismatch,
+    decode_raw_tensor
+)
 from ..services.ai_chat import GeminiChat
+from ..services.catalog import equipment_by_id
+from ..services.scan_renderer import scan_renderer, select_language
+from ..services.analytics import record_scans
+from ..services.scan_logger import scan_logger
+from ..services.scan_archive import read_archived_scans
+from ..services.scan_changes import assign_change_seqs, delete_scan, read_changes
+from ..services.scan_export import EXPORT_FORMATS, ScanExportFilter, export_pieces
+from ..services.vector_index import reference_index
 
-router = APIRouter(prefix="/scan", tags=["Scanning"])
+from .equipment import IMAGE_WIDTH_QUERY, to_summary
+
+# Bodies may also arrive as MessagePack or CBOR, and compressed (see core/negotiation.py)
+router = APIRouter(prefix="/scan", tags=["Scanning"], route_class=NegotiatedRoute)
 
 # Initialize ML model and AI chat (singleton)
 tflite_model = TFLiteModel()
 gemini_chat = GeminiChat()
 
+open_set_rejections = metrics.counter(
+    "scan_open_set_rejections_total", "Scans rejected for being far from every reference embedding"
+)
+
 @router.post("/analyze", response_model=ScanAnalysisResponse)
 async def analyze_image(
     image: UploadFile = File(...),
     user_id: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    language_preference: Optional[str] = Form(None),
+    accept_language: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
     """Analyze equipment image using TFLite model"""
-    # Validate file type
-    if not image.content_type.startswith("image/"):
+    # Validate file type (encoded image or pre-resized raw tensor)
+    is_raw_tensor = image.content_type == RAW_TENSOR_CONTENT_TYPE
+    if not is_raw_tensor and not image.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Read image
-    image_bytes = await image.read()
+    # Read image (already parsed out of the multipart body into a spooled file)
+    with span("upload.read") as read_span:
+        image_bytes = await image.read()
+        read_span.set("bytes", len(image_bytes))
     
     # Validate file size (10MB limit)
     if len(image_bytes) > 10 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="Image size exceeds 10MB limit")
     
     try:
-        # Open image with PIL
-        pil_image = Image.open(io.BytesIO(image_bytes))
-        
-        # Run inference
-        predictions = tflite_model.predict(pil_image)
+        if is_raw_tensor:
+            # Map the tensor straight into the interpreter input, skipping decode/resize
+            try:
+                with span("image.decode", format="raw_tensor"):
+                    pixels = decode_raw_tensor(image_bytes, tflite_model.input_spec())
+            except RawTensorSpecMismatch as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            except RawTensorError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            # Inference is CPU-bound: run it off the event loop, one invoke per interpreter at a time
+            predictions = await asyncio.to_thread(tflite_model.predict_array, pixels)
+        else:
+            # Open image with PIL
+            pil_image = Image.open(io.BytesIO(image_bytes))
+            
+            # Run inference (decode, resize and invoke) off the event loop
+            predictions = await asyncio.to_thread(tflite_model.predict, pil_image)
         
         # Get top prediction
         class_name = predictions['class_name']
@@ -55,8 +105,29 @@ async def analyze_image(
                 detail=f"Low confidence ({confidence:.2%}). Please take a clearer photo."
             )
         
+        # Open-set rejection: the classifier always picks a label, so objects far
+        # from every reference image are treated as not catalog equipment. Only
+        # runs with a model embedding that matches the references' tensor.
+        index = reference_index()
+        max_distance = tflite_model.config.get("postprocessing", {}).get("open_set_max_distance")
+        embedding = predictions['embedding']
+        if (
+            index is not None and max_distance is not None and embedding is not None
+            and index.tensor == tflite_model.embedding_tensor
+        ):
+            with span("scan.open_set_check", references=len(index)) as check_span:
+                distances, _ = index.search(embedding, k=1)
+                check_span.set("distance", float(distances[0, 0]))
+            if distances[0, 0] > max_distance:
+                open_set_rejections.inc()
+                raise HTTPException(
+                    status_code=404,
+                    detail="This object does not look like any equipment in the catalog"
+                )
+        
         # Query equipment database
-        equipment = db.query(Equipment).filter(Equipment.class_name == class_name).first()
+        with span("catalog.lookup", class_name=class_name):
+            equipment = db.query(Equipment).filter(Equipment.class_name == class_name).first()
         
         if not equipment:
             raise HTTPException(
@@ -67,36 +138,30 @@ async def analyze_image(
         # Create scan ID
         scan_id = uuid4()
         
-        # If user is authenticated, log to database
+        # If user is authenticated, queue for the write-behind logger
         if user_id:
             try:
-                scan_metadata = ScanMetadata(
-                    scan_id=scan_id,
-                    user_id=UUID(user_id),
-                    equipment_id=equipment.equipment_id,
-                    confidence_score=confidence
-                )
-                db.add(scan_metadata)
-                db.commit()
+                # The row itself is written by the logger's next batch (its own trace)
+                with span("scan_log.enqueue"):
+                    await scan_logger.enqueue({
+                        "scan_id": str(scan_id),
+                        "user_id": str(UUID(user_id)),
+                        "equipment_id": equipment.equipment_id,
+                        "confidence_score": confidence,
+                        "scanned_at": datetime.utcnow()
+                    })
+                mark_written(str(UUID(user_id)))
             except Exception as e:
-                print(f"Error saving scan metadata: {e}")
+                print(f"Error queueing scan metadata: {e}")
                 # Continue even if metadata save fails
         
-        # Return enriched response
-        return ScanAnalysisResponse(
-            scan_id=scan_id,
-            equipment_id=equipment.equipment_id,
-            equipment_name=equipment.name_en,
-            class_name=equipment.class_name,
-            confidence_score=confidence,
-            category=equipment.category,
-            description=equipment.description_en,
-            usage=equipment.usage_en,
-            safety_info=equipment.safety_info_en,
-            image_url=equipment.image_url,
-            tags=equipment.tags or []
-        )
-        
+        # Return enriched response (pre-rendered body with per-scan fields spliced in)
+        language = select_language(language_preference, accept_language)
+        with span("scan.serialize", language=language) as serialize_span:
+            content = scan_renderer.render(equipment, language, scan_id, confidence, predictions['stage'])
+            serialize_span.set("bytes", len(content))
+        return Response(content=content, media_type="application/json")
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -105,14 +170,24 @@ async def analyze_image(
             detail=f"Error analyzing image: {str(e)}"
         )
 
+@router.get("/input-spec", response_model=ModelInputSpecResponse)
+async def get_input_spec():
+    """Get the raw tensor layout the current model expects from clients"""
+    return ModelInputSpecResponse(
+        **tflite_model.input_spec(),
+        content_type=RAW_TENSOR_CONTENT_TYPE,
+        header_format=RAW_TENSOR_HEADER.format,
+        header_size=RAW_TENSOR_HEADER.size
+    )
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_ai(
     request: ChatRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Chat with AI about identified equipment"""
     # Get equipment details
-    equipment = db.query(Equipment).filter(Equipment.equipment_id == request.equipment_id).first()
+    equipment = db.query(Equipment).filter(Equipment.equipment_id == str(request.equipment_id)).first()
     
     if not equipment:
         raise HTTPException(status_code=404, detail="Equipment not found")
@@ -128,64 +203,262 @@ async def chat_with_ai(
     
     try:
         # Generate AI response
-        ai_response = gemini_chat.generate_response(
+        ai_response = await gemini_chat.generate_response(
             equipment_context=context,
             user_message=request.user_message,
             conversation_history=request.conversation_history
         )
         
         return ChatResponse(message=ai_response)
-        
+    
     except Exception as e:
         # Fallback to mock response if AI fails
         return ChatResponse(
             message=f"I understand you're asking about {request.equipment_name}. This is a {equipment.category.lower()} equipment. How can I help you learn more about it?"
         )
 
+@router.post("/chat/stream")
+async def stream_chat_with_ai(
+    request: ChatRequest,
+    db: Session = Depends(get_read_db)
+):
+    """Chat with AI about identified equipment, streamed as server-sent events
+    
+    Each event carries {"text": chunk}; a final `done` event ends the answer.
+    """
+    equipment = db.query(Equipment).filter(Equipment.equipment_id == str(request.equipment_id)).first()
+    
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    
+    context = {
+        "equipment_name": equipment.name_en,
+        "category": equipment.category,
+        "description": equipment.description_en,
+        "usage": equipment.usage_en,
+        "safety_info": equipment.safety_info_en
+    }
+    
+    async def events():
+        async for chunk in gemini_chat.stream_response(
+            equipment_context=context,
+            user_message=request.user_message,
+            conversation_history=request.conversation_history
+        ):
+            yield f"data: {json.dumps({'text': chunk})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/sync")
 async def sync_scans(
+    request: Request,
     scans: list[ScanMetadataCreate],
     db: Session = Depends(get_db)
 ):
-    """Sync scan metadata to cloud (for authenticated users)"""
+    """Sync scan metadata to cloud (for authenticated users)
+    
+    Accepts JSON, MessagePack or CBOR, optionally gzip or zstd compressed.
+    """
     synced_count = 0
+    synced_rows = []
     
     for scan_data in scans:
         try:
+            scan_row = scan_data.dict()
+            scan_row["user_id"] = str(scan_data.user_id)
+            scan_row["equipment_id"] = str(scan_data.equipment_id)
+            scan_row["scanned_at"] = scan_data.scanned_at or datetime.utcnow()
+            
             # Check if scan already exists
             existing = db.query(ScanMetadata).filter(
-                ScanMetadata.user_id == scan_data.user_id,
-                ScanMetadata.equipment_id == scan_data.equipment_id,
-                ScanMetadata.scanned_at == scan_data.scanned_at
+                ScanMetadata.user_id == scan_row["user_id"],
+                ScanMetadata.equipment_id == scan_row["equipment_id"],
+                ScanMetadata.scanned_at == scan_row["scanned_at"]
             ).first()
             
             if not existing:
-                scan_metadata = ScanMetadata(**scan_data.dict())
-                db.add(scan_metadata)
+                synced_rows.append(scan_row)
                 synced_count += 1
         except Exception as e:
             print(f"Error syncing scan: {e}")
             continue
     
+    # Change feed positions and analytics rollups commit with the synced rows
+    assign_change_seqs(db, synced_rows)
+    db.add_all(ScanMetadata(**scan_row) for scan_row in synced_rows)
+    record_scans(db, synced_rows)
     db.commit()
+    mark_written(*{row["user_id"] for row in synced_rows})
     
-    return {
+    return negotiated_response(request, {
         "message": f"Successfully synced {synced_count} scans",
         "synced_count": synced_count
-    }
+    })
+
+def embed_equipment(db: Session, scans: list[ScanMetadataResponse], image_width: Optional[int]):
+    """Attach equipment summaries to a page of scans with one catalog query"""
+    with span("catalog.lookup", scans=len(scans)):
+        rows = equipment_by_id(db, (scan.equipment_id for scan in scans))
+    summaries = {equipment_id: to_summary(equipment, image_width) for equipment_id, equipment in rows.items()}
+    for scan in scans:
+        scan.equipment = summaries.get(str(scan.equipment_id))
 
-@router.get("/history")
+@router.get("/history", response_model=ScanHistoryResponse)
 async def get_scan_history(
+    request: Request,
     user_id: UUID,
     limit: int = 50,
     offset: int = 0,
-    db: Session = Depends(get_db)
+    include_archived: bool = False,
+    include_equipment: bool = False,
+    image_width: Optional[int] = IMAGE_WIDTH_QUERY,
+    db: Session = Depends(get_read_db)
 ):
-    """Get user's scan history metadata from cloud"""
+    """Get user's scan history metadata from cloud
+    
+    With `include_archived`, paging continues past the live rows into the
+    columnar archive of months moved out of the database. With
+    `include_equipment`, each scan carries an equipment summary (names,
+    category, thumbnail for `image_width`), loaded in one query per page.
+    The response is JSON, MessagePack or CBOR per `Accept`, compressed per
+    `Accept-Encoding`.
+    """
     scans = db.query(ScanMetadata).filter(
-        ScanMetadata.user_id == user_id
+        ScanMetadata.user_id == str(user_id)
     ).order_by(
         ScanMetadata.scanned_at.desc()
     ).offset(offset).limit(limit).all()
     
-    return {"scans": scans, "total": len(scans)}
+    # Archived months are all older than live rows, so they follow them in the listing
+    if include_archived and len(scans) < limit:
+        if scans:
+            live_total = offset + len(scans)
+        else:
+            live_total = db.query(func.count(ScanMetadata.scan_id)).filter(
+                ScanMetadata.user_id == str(user_id)
+            ).scalar()
+        archive_offset = max(0, offset - live_total)
+        archived = islice(
+            read_archived_scans(user_id=str(user_id)),
+            archive_offset,
+            archive_offset + limit - len(scans)
+        )
+        scans = list(scans) + list(archived)
+    
+    results = [ScanMetadataResponse.model_validate(scan) for scan in scans]
+    if include_equipment:
+        embed_equipment(db, results, image_width)
+    
+    return negotiated_response(request, {
+        "scans": results,
+        "total": len(results)
+    }, stream_field="scans")
+
+@router.get("/changes", response_model=ScanChangesResponse)
+async def get_scan_changes(
+    request: Request,
+    user_id: UUID,
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    include_equipment: bool = False,
+    image_width: Optional[int] = IMAGE_WIDTH_QUERY,
+    db: Session = Depends(get_read_db)
+):
+    """Get scans added or deleted since a previous pull (incremental history sync)
+    
+    Pass back `next_since` from the previous page; 0 fetches the whole live
+    history. Keep paging while `has_more` is true. Archived months are not
+    part of the feed (see `/history?include_archived=true`).
+    `include_equipment` embeds equipment summaries as in `/history`.
+    """
+    scans, tombstones, next_since, has_more = read_changes(db, str(user_id), since, limit)
+    
+    results = [ScanMetadataResponse.model_validate(scan) for scan in scans]
+    if include_equipment:
+        embed_equipment(db, results, image_width)
+    
+    return negotiated_response(request, ScanChangesResponse(
+        scans=results,
+        deleted=[tombstone.scan_id for tombstone in tombstones],
+        next_since=next_since,
+        has_more=has_more
+    ), stream_field="scans")
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+async def export_scans(
+    request: Request,
+    export_format: str = Query("csv", alias="format"),
+    user_id: Optional[UUID] = None,
+    email_domain: Optional[str] = None,
+    equipment_id: Optional[UUID] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    include_archived: bool = False,
+    compression: Optional[str] = None
+):
+    """Stream scan metadata as CSV or NDJSON (Admin only: `Authorization: Bearer <ADMIN_API_TOKEN>`)
+    
+    Filter by user, by `email_domain` (a school's accounts), by equipment and
+    by `scanned_at` range; no filters exports the whole table, oldest first.
+    Rows are read through a server-side cursor and encoded batch by batch,
+    so memory stays flat for any export size. The body is compressed per
+    `Accept-Encoding`, or with `compression=gzip|zstd` sent as a compressed file.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if compression and compression not in encodings():
+        raise HTTPException(status_code=400, detail=f"compression must be one of: {', '.join(encodings())}")
+    
+    filters = ScanExportFilter(
+        user_id=str(user_id) if user_id else None,
+        email_domain=email_domain,
+        equipment_id=str(equipment_id) if equipment_id else None,
+        start=start,
+        end=end
+    )
+    media_type = EXPORT_FORMATS[export_format]
+    filename = f"scans-{datetime.utcnow():%Y%m%dT%H%M%S}.{export_format}"
+    headers = {}
+    if compression:
+        encoding = compression
+        filename += ".gz" if compression == "gzip" else ".zst"
+        media_type = "application/gzip" if compression == "gzip" else "application/zstd"
+    else:
+        encoding = negotiate(request)[1]
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        headers["Vary"] = "Accept-Encoding"
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    
+    # A sync iterator: Starlette runs it in the threadpool, off the event loop
+    return StreamingResponse(
+        stream_body(media_type, encoding, export_pieces(export_format, filters, include_archived)),
+        media_type=media_type,
+        headers=headers
+    )
+
+@router.delete("/history/{scan_id}")
+async def delete_scan_history_entry(
+    scan_id: UUID,
+    user_id: UUID,
+    db: Session = Depends(get_db)
+):
+    """Delete a scan from the user's history; other devices see it in `/changes`"""
+    scan = db.query(ScanMetadata).filter(
+        ScanMetadata.scan_id == str(scan_id),
+        ScanMetadata.user_id == str(user_id)
+    ).first()
+    
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    
+    delete_scan(db, scan)
+    db.commit()
+    mark_written(str(user_id))
+    
+    return {"message": "Scan deleted", "scan_id": str(scan_id)}
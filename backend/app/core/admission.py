@@ -0,0 +1,247 @@
+from typing import Iterable, List, Optional
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .config import settings
+from .metrics import metrics
+from .security import verify_token
+from .tracing import span
+
+admission_requests = metrics.counter("admission_requests_total", "Requests seen by admission control by priority and outcome")
+admission_shed = metrics.counter("admission_shed_total", "Requests shed by admission control by priority and reason")
+admission_limit = metrics.gauge("admission_limit", "Current adaptive concurrency limit")
+admission_in_flight = metrics.gauge("admission_in_flight", "Admitted requests currently running")
+admission_queue_depth = metrics.gauge("admission_queue_depth", "Requests waiting for a concurrency slot")
+admission_queue_wait = metrics.histogram("admission_queue_wait_seconds", "Time admitted requests waited for a slot")
+
+PRIORITY_AUTHENTICATED = 0
+PRIORITY_ANONYMOUS = 1
+PRIORITY_NAMES = {PRIORITY_AUTHENTICATED: "authenticated", PRIORITY_ANONYMOUS: "anonymous"}
+
+# The no-load latency baseline is re-measured this often so it can follow drift
+MIN_LATENCY_WINDOW_SECONDS = 60.0
+
+class Rejected(Exception):
+    """Raised when a request is shed; `reason` is queue_full, deadline or evicted"""
+    
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class AdmissionController:
+    """Adaptive concurrency limit with a priority wait queue
+    
+    Up to `limit` requests run at once; the rest wait (authenticated first,
+    then FIFO) for at most `queue_timeout` seconds. The limit follows
+    measured latency: it grows by one per `limit` completions while latency
+    stays within `tolerance` times the no-load baseline, and shrinks in
+    proportion to the slowdown (at most halving) once it does not.
+    """
+    
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 32,
+        max_queue: int = 32,
+        queue_timeout: float = 2.0,
+        tolerance: float = 2.0
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+        
+        self.in_flight = 0
+        self.queued = 0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        self._min_latency: Optional[float] = None
+        self._min_latency_since = time.monotonic()
+        self._avg_latency: Optional[float] = None
+        admission_limit.set(self.limit)
+    
+    async def acquire(self, priority: int):
+        """Wait for a slot; raises Rejected when the request is shed"""
+        if self.in_flight < int(self.limit) and not self.queued:
+            self.in_flight += 1
+            admission_in_flight.set(self.in_flight)
+            return
+        
+        if self.queued >= self.max_queue and not self._evict_for(priority):
+            raise Rejected("queue_full")
+        
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._sequence), future]
+        heapq.heappush(self._waiters, entry)
+        self.queued += 1
+        admission_queue_depth.set(self.queued)
+        started = time.monotonic()
+        try:
+            await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # A slot handed over just before the client went away must be given back
+            if future.done() and not future.cancelled() and future.result():
+                self.release()
+            raise
+        finally:
+            if not future.done():
+                # Timed out, or the client went away while waiting
+                future.cancel()
+                self.queued -= 1
+                admission_queue_depth.set(self.queued)
+        
+        if future.cancelled():
+            raise Rejected("deadline")
+        if not future.result():
+            raise Rejected("evicted")
+        admission_queue_wait.observe(time.monotonic() - started)
+    
+    def _evict_for(self, priority: int) -> bool:
+        """Drop the newest waiter of lower priority to make room; False if there is none"""
+        candidates = [entry for entry in self._waiters if entry[0] > priority and not entry[2].done()]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        victim[2].set_result(False)
+        self.queued -= 1
+        admission_queue_depth.set(self.queued)
+        return True
+    
+    def release(self, latency: Optional[float] = None):
+        """Free a slot (handing it to the best waiter) and feed the latency sample to the limit"""
+        if latency is not None:
+            self._adjust(latency)
+        self.in_flight -= 1
+        self._dispatch()
+    
+    def _dispatch(self):
+        """Hand free slots (including ones a raised limit just opened) to the best waiters"""
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            future.set_result(True)
+            self.in_flight += 1
+            self.queued -= 1
+        admission_in_flight.set(self.in_flight)
+        admission_queue_depth.set(self.queued)
+    
+    def _adjust(self, latency: float):
+        now = time.monotonic()
+        if self._min_latency is None or now - self._min_latency_since >= MIN_LATENCY_WINDOW_SECONDS:
+            self._min_latency, self._min_latency_since = latency, now
+        else:
+            self._min_latency = min(self._min_latency, latency)
+        self._avg_latency = latency if self._avg_latency is None else 0.9 * self._avg_latency + 0.1 * latency
+        
+        gradient = self.tolerance * self._min_latency / max(latency, 1e-6)
+        if gradient >= 1.0:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        else:
+            self.limit = max(self.min_limit, self.limit * max(0.5, gradient))
+        admission_limit.set(self.limit)
+    
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        if not self._avg_latency:
+            return 1
+        backlog = (self.queued + self.in_flight) * self._avg_latency / max(self.limit, 1.0)
+        return min(30, max(1, math.ceil(backlog)))
+
+def request_priority(scope: Scope) -> int:
+    """Requests with a valid bearer token outrank anonymous ones"""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and verify_token(token.strip()):
+                return PRIORITY_AUTHENTICATED
+            break
+    return PRIORITY_ANONYMOUS
+
+class AdmissionMiddleware:
+    """Applies an AdmissionController to selected POST endpoints
+    
+    A request takes its slot once its whole body has arrived, when the
+    route reads the last chunk, so slow uploads hold neither a slot nor
+    the latency samples the limit follows. Shed requests are answered with
+    503 + Retry-After before the route parses or decodes the upload.
+    """
+    
+    def __init__(self, app: ASGIApp, paths: Iterable[str], controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.paths = set(paths)
+        self.controller = controller or AdmissionController(
+            initial_limit=settings.ADMISSION_INITIAL_LIMIT,
+            min_limit=settings.ADMISSION_MIN_LIMIT,
+            max_limit=settings.ADMISSION_MAX_LIMIT,
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+            tolerance=settings.ADMISSION_LATENCY_TOLERANCE
+        )
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        
+        priority = request_priority(scope)
+        labels = {"priority": PRIORITY_NAMES[priority]}
+        # started is set once admitted; shed once a 503 has gone out instead
+        state = {"started": None, "shed": False}
+        
+        async def admit_after_body():
+            message = await receive()
+            if message["type"] != "http.request" or message.get("more_body", False) or state["started"] is not None:
+                return message
+            try:
+                # The inference queue: analyze requests wait here for a model slot
+                with span("admission.queue_wait", priority=labels["priority"], queued=self.controller.queued):
+                    await self.controller.acquire(priority)
+            except Rejected as e:
+                admission_requests.inc(labels={**labels, "outcome": "shed"})
+                admission_shed.inc(labels={**labels, "reason": e.reason})
+                state["shed"] = True
+                await self._reject(send)
+                # The route's body parsing fails and its error response is dropped below
+                raise
+            admission_requests.inc(labels={**labels, "outcome": "admitted"})
+            state["started"] = time.monotonic()
+            return message
+        
+        async def send_unless_shed(message):
+            if not state["shed"]:
+                await send(message)
+        
+        latency = None
+        try:
+            await self.app(scope, admit_after_body, send_unless_shed)
+            if state["started"] is not None:
+                latency = time.monotonic() - state["started"]
+        except Rejected:
+            pass
+        finally:
+            if state["started"] is not None:
+                # Failed requests free their slot without skewing the latency baseline
+                self.controller.release(latency)
+    
+    async def _reject(self, send: Send):
+        body = json.dumps({"detail": "Server is busy, please retry shortly"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(self.controller.retry_after()).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,6 +1,10 @@
 from pydantic_settings import BaseSettings
 from typing import List
 
+def _unless_placeholder(value: str) -> str:
+    """Empty for values still set to a .env.example placeholder such as your-google-client-id"""
+    return "" if value.startswith("your-") else value
+
 class Settings(BaseSettings):
     # App
     APP_NAME: str = "EdTech Scanner API"
@@ -11,6 +15,18 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     DATABASE_TEST_URL: str = ""
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    # Read replicas (comma-separated URLs); empty sends reads to the primary
+    DATABASE_REPLICA_URLS: str = ""
+    DATABASE_REPLICA_POLICY: str = "round_robin"  # or "least_connections"
+    DATABASE_READ_YOUR_WRITES_SECONDS: int = 5
+    
+    # SQLite profile (applied when DATABASE_URL is sqlite://)
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE_MB: int = 256
+    SQLITE_CACHE_SIZE_MB: int = 64
+    SQLITE_SERIALIZE_WRITES: bool = True
     
     # Redis
     REDIS_URL: str
@@ -19,18 +35,41 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
+    ADMIN_API_TOKEN: str = ""  # bearer token for admin-only routes; empty disables them
     
     # Google OAuth
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
+    GOOGLE_CERTS_DEADLINE_MS: int = 3000
     
     # Twilio
     TWILIO_ACCOUNT_SID: str = ""
     TWILIO_AUTH_TOKEN: str = ""
     TWILIO_PHONE_NUMBER: str = ""
+    TWILIO_API_BASE_URL: str = "https://api.twilio.com"
+    SMS_DEADLINE_MS: int = 5000  # never retried: a retry could send the code twice
     
     # Google Gemini
     GEMINI_API_KEY: str = ""
+    GEMINI_API_BASE_URL: str = "https://generativelanguage.googleapis.com"
+    GEMINI_MODEL: str = "gemini-pro"
+    GEMINI_DEADLINE_MS: int = 10000  # total per chat message, retries included
+    GEMINI_ATTEMPT_TIMEOUT_MS: int = 6000
+    GEMINI_MAX_CONCURRENCY: int = 8
+    GEMINI_RETRIES: int = 2
+    GEMINI_RETRY_BACKOFF_MS: int = 200
+    GEMINI_HEDGE_AFTER_MS: int = 0  # 0 disables hedged requests
+    GEMINI_BREAKER_FAILURES: int = 5
+    GEMINI_BREAKER_RESET_SECONDS: float = 30.0
+    GEMINI_FAULT_INJECTION: str = ""  # e.g. "latency=2,error_rate=0.3" to use a local stub instead
+    
+    # Local upstream stand-ins (python run_stubs.py); UPSTREAM_STUBS_URL points Gemini,
+    # Google sign-in and SMS at them, e.g. http://127.0.0.1:8100
+    UPSTREAM_STUBS_URL: str = ""
+    STUB_GEMINI_FAULTS: str = "p50=0.8,p99=4,error_rate=0.01,chunk_latency=0.05"
+    STUB_GOOGLE_FAULTS: str = "p50=0.03,p99=0.25"
+    STUB_SMS_FAULTS: str = "p50=0.3,p99=2,error_rate=0.01"
     
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:8080,http://localhost:3000"
@@ -38,6 +77,82 @@ class Settings(BaseSettings):
     # File Upload
     MAX_FILE_SIZE_MB: int = 10
     
+    # Scan logging (write-behind)
+    SCAN_LOG_FLUSH_INTERVAL_MS: int = 200
+    SCAN_LOG_BATCH_SIZE: int = 500
+    SCAN_LOG_QUEUE_SIZE: int = 10000
+    SCAN_LOG_ENQUEUE_TIMEOUT_MS: int = 1000
+    SCAN_LOG_SPOOL_PATH: str = ""  # empty disables the durable spool
+    
+    # Scan storage tiers
+    SCAN_PARTITION_MONTHS_AHEAD: int = 2
+    SCAN_ARCHIVE_AFTER_MONTHS: int = 12
+    SCAN_ARCHIVE_DIR: str = "./archive"
+    SCAN_EXPORT_BATCH_ROWS: int = 5000  # rows fetched per server-side cursor round trip in exports
+    
+    # Production launcher (run_prod.py)
+    WEB_WORKERS: int = 0  # 0 = one worker per CPU
+    WEB_GRACEFUL_TIMEOUT_SECONDS: int = 30
+    
+    # Admission control in front of /api/scan/analyze
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_INITIAL_LIMIT: int = 4
+    ADMISSION_MIN_LIMIT: int = 1
+    ADMISSION_MAX_LIMIT: int = 32
+    ADMISSION_MAX_QUEUE: int = 32
+    ADMISSION_QUEUE_TIMEOUT_MS: int = 2000
+    ADMISSION_LATENCY_TOLERANCE: float = 2.0  # shrink the limit above this multiple of no-load latency
+    
+    # Bulk endpoint encodings (JSON, MessagePack, CBOR; zstd or gzip)
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024  # smaller bodies are sent uncompressed
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_ZSTD_LEVEL: int = 3
+    RESPONSE_STREAM_MIN_ITEMS: int = 200  # encode lists this long item by item while sending
+    REQUEST_BODY_MAX_MB: int = 10  # limit on a decompressed request body
+    
+    # Request tracing (span tree per request; OTLP/JSON export)
+    TRACING_ENABLED: bool = True
+    TRACING_SAMPLE_RATE: float = 1.0  # share of traces exported; slow ones always are
+    TRACING_SLOW_REQUEST_MS: int = 1000  # log the span tree of slower requests; 0 disables
+    TRACING_EXPORT_PATH: str = ""  # append OTLP/JSON lines here, e.g. ./traces.jsonl
+    TRACING_OTLP_ENDPOINT: str = ""  # e.g. http://localhost:4318/v1/traces
+    
+    # Reference embeddings for similar-equipment lookup and open-set rejection
+    REFERENCE_EMBEDDINGS_PATH: str = "./models/reference_embeddings.npz"
+    VECTOR_INDEX_IVF_THRESHOLD: int = 50000  # switch from brute force to IVF at this size
+    VECTOR_INDEX_IVF_PROBES: int = 8
+    
+    # Equipment image store (content-addressed, served from /api/assets)
+    ASSET_DIR: str = "./assets"
+    ASSET_IMAGE_SIZES: str = "128,256,512"  # WebP thumbnails (longest side, px) made at upload
+    ASSET_DEFAULT_IMAGE_SIZE: int = 256
+    ASSET_WEBP_QUALITY: int = 80
+    ASSET_ACCEL_REDIRECT_PREFIX: str = ""  # e.g. /_assets to let nginx sendfile the bytes
+    
+    @property
+    def database_replica_urls_list(self) -> List[str]:
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+    
+    @property
+    def gemini_api_base_url(self) -> str:
+        return self.UPSTREAM_STUBS_URL or self.GEMINI_API_BASE_URL
+    
+    @property
+    def google_certs_url(self) -> str:
+        return f"{self.UPSTREAM_STUBS_URL}/oauth2/v1/certs" if self.UPSTREAM_STUBS_URL else self.GOOGLE_CERTS_URL
+    
+    @property
+    def twilio_api_base_url(self) -> str:
+        return self.UPSTREAM_STUBS_URL or self.TWILIO_API_BASE_URL
+    
+    @property
+    def google_client_id(self) -> str:
+        return _unless_placeholder(self.GOOGLE_CLIENT_ID)
+    
+    @property
+    def twilio_account_sid(self) -> str:
+        return _unless_placeholder(self.TWILIO_ACCOUNT_SID)
+    
     @property
     def allowed_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
@@ -1,19 +1,160 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Dict, List, Optional
+import itertools
+import re
+
 from .config import settings
+from .metrics import metrics
+from .redis import get_redis
+from .sqlite import configure_sqlite_engine, sqlite_connect_args
+from .tracing import NOOP_SPAN, start_span
+
+# Reads for a scope that wrote recently go to the primary; catalog writes use the global scope
+STICKY_GLOBAL = "global"
+
+read_sessions = metrics.counter("db_read_sessions_total", "Read-only sessions by the engine they were routed to")
+pool_size_gauge = metrics.gauge("db_pool_size", "Configured connection pool size per engine")
+pool_checked_out_gauge = metrics.gauge("db_pool_checked_out", "Connections currently in use per engine")
+pool_checked_in_gauge = metrics.gauge("db_pool_checked_in", "Idle connections held by the pool per engine")
+pool_overflow_gauge = metrics.gauge("db_pool_overflow", "Connections opened beyond the pool size per engine")
+
+# Statements are recorded on spans up to this length (parameters never are)
+TRACE_STATEMENT_CHARS = 300
+
+def _create_engine(url: str) -> Engine:
+    if url.startswith("sqlite"):
+        return configure_sqlite_engine(create_engine(
+            url,
+            connect_args=sqlite_connect_args(),
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW
+        ))
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW
+    )
+
+def _trace_engine(target: Engine, name: str) -> Engine:
+    """Record every statement run on the engine as a db.query span of the current trace"""
+    
+    @event.listens_for(target, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("trace_spans", []).append(start_span(
+            "db.query",
+            **{
+                "db.system": target.dialect.name,
+                "db.engine": name,
+                "db.statement": re.sub(r"\s+", " ", statement).strip()[:TRACE_STATEMENT_CHARS],
+            }
+        ))
+    
+    @event.listens_for(target, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            query_span = spans.pop()
+            if not executemany and cursor.rowcount is not None and cursor.rowcount >= 0:
+                query_span.set("db.rowcount", cursor.rowcount)
+            query_span.end()
+    
+    @event.listens_for(target, "handle_error")
+    def fail_query(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            query_span = spans.pop()
+            query_span.fail(exception_context.original_exception)
+            query_span.end()
+    
+    return target
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
-)
+engine = _trace_engine(_create_engine(settings.DATABASE_URL), "primary")
+replica_engines: List[Engine] = [
+    _trace_engine(_create_engine(url), f"replica{i}")
+    for i, url in enumerate(settings.database_replica_urls_list)
+]
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Unbound; each read session is bound to the engine the router picks
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+def _trace_commits(factory: sessionmaker):
+    """Time each commit (flush included) as a db.commit span"""
+    
+    @event.listens_for(factory, "before_commit")
+    def start_commit(session: Session):
+        session.info["trace_commit"] = start_span("db.commit")
+    
+    @event.listens_for(factory, "after_commit")
+    def end_commit(session: Session):
+        session.info.pop("trace_commit", NOOP_SPAN).end()
+    
+    @event.listens_for(factory, "after_soft_rollback")
+    def fail_commit(session: Session, previous_transaction):
+        commit_span = session.info.pop("trace_commit", None)
+        if commit_span is not None:
+            commit_span.set("rolled_back", True)
+            commit_span.end()
+
+_trace_commits(SessionLocal)
+_trace_commits(ReadSessionLocal)
 
 Base = declarative_base()
 
+def _checked_out(target: Engine) -> int:
+    checkedout = getattr(target.pool, "checkedout", None)
+    return checkedout() if checkedout else 0
+
+class ReplicaRouter:
+    """Pick a replica engine for each read-only session"""
+    
+    def __init__(self, engines: List[Engine], policy: str = settings.DATABASE_REPLICA_POLICY):
+        if policy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica policy '{policy}'")
+        self.engines = engines
+        self.policy = policy
+        self._counter = itertools.count()
+    
+    def choose(self) -> Optional[Engine]:
+        if not self.engines:
+            return None
+        
+        start = next(self._counter) % len(self.engines)
+        if self.policy == "least_connections":
+            # Rotate the starting point so ties are spread rather than all landing on the first replica
+            rotated = self.engines[start:] + self.engines[:start]
+            return min(rotated, key=_checked_out)
+        return self.engines[start]
+
+replica_router = ReplicaRouter(replica_engines)
+
+def engine_name(target: Engine) -> str:
+    if target is engine:
+        return "primary"
+    return f"replica{replica_engines.index(target)}"
+
+def mark_written(*scopes: str):
+    """Send reads for these scopes (user ids or STICKY_GLOBAL) to the primary while replicas catch up"""
+    if not replica_engines:
+        return
+    redis = get_redis()
+    for scope in scopes:
+        redis.setex(f"db:written:{scope}", settings.DATABASE_READ_YOUR_WRITES_SECONDS, "1")
+
+def _recently_written(scope: str) -> bool:
+    return bool(get_redis().get(f"db:written:{scope}"))
+
+def _read_scope(request: Request) -> str:
+    user_id = request.path_params.get("user_id") or request.query_params.get("user_id")
+    return str(user_id) if user_id else STICKY_GLOBAL
+
 def get_db():
     """Dependency for getting database session"""
     db = SessionLocal()
@@ -21,3 +162,54 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db(request: Request):
+    """Dependency for read-only database sessions, served by a replica when one is configured
+    
+    Requests for a user (or for the catalog) that wrote within
+    DATABASE_READ_YOUR_WRITES_SECONDS read from the primary instead, as do
+    all reads while the chosen replica is unreachable.
+    """
+    target = replica_router.choose()
+    if target is not None and _recently_written(_read_scope(request)):
+        target = None
+    
+    db = None
+    if target is not None:
+        db = ReadSessionLocal(bind=target)
+        try:
+            db.connection()
+        except OperationalError as e:
+            print(f"Replica {engine_name(target)} unavailable, reading from primary: {e}")
+            db.close()
+            db, target = None, None
+    if db is None:
+        db, target = SessionLocal(), engine
+    
+    read_sessions.inc(labels={"engine": engine_name(target)})
+    try:
+        yield db
+    finally:
+        db.close()
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """Connection pool usage for the primary and every replica"""
+    stats = {}
+    for target in [engine] + replica_engines:
+        pool = target.pool
+        stats[engine_name(target)] = {
+            "size": pool.size() if hasattr(pool, "size") else 0,
+            "checked_out": _checked_out(target),
+            "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else 0,
+            "overflow": max(0, pool.overflow()) if hasattr(pool, "overflow") else 0,
+        }
+    return stats
+
+def update_pool_metrics():
+    """Copy current pool stats into the /metrics gauges"""
+    for name, stats in pool_stats().items():
+        labels = {"engine": name}
+        pool_size_gauge.set(stats["size"], labels)
+        pool_checked_out_gauge.set(stats["checked_out"], labels)
+        pool_checked_in_gauge.set(stats["checked_in"], labels)
+        pool_overflow_gauge.set(stats["overflow"], labels)
@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response, status
+from typing import Optional
+import hashlib
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values that determine a response body"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8"))
+    return f'"{digest.hexdigest()[:20]}"'
+
+def _http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value, usegmt=True)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    """Check If-Modified-Since with one-second HTTP date resolution"""
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> Optional[Response]:
+    """Attach cache validators and return a 304 response if the client copy is current"""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, no-cache"
+    }
+    if last_modified:
+        headers["Last-Modified"] = _http_date(last_modified)
+    if "vary" in response.headers:
+        headers["Vary"] = response.headers["vary"]
+    
+    response.headers.update(headers)
+    
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = bool(if_modified_since and last_modified
+                     and _not_modified_since(if_modified_since, last_modified))
+    
+    if fresh:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
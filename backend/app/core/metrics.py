@@ -0,0 +1,121 @@
+from typing import Dict, List, Optional, Tuple
+import bisect
+import threading
+
+# Latency buckets in seconds (upper bounds, +Inf is implicit)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_key(labels: Optional[Dict[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((labels or {}).items()))
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Counter:
+    """Monotonically increasing count"""
+    
+    def __init__(self, name: str, documentation: str):
+        self.name, self.documentation = name, documentation
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_label_key(labels), 0)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+    
+    def dec(self, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        self.inc(-amount, labels)
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    """Distribution of observed values (cumulative buckets, sum and count)"""
+    
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.documentation = name, documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        with self._lock:
+            # Per-bucket counts, then sum and count
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0, 0])
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+    
+    def count(self, labels: Optional[Dict[str, str]] = None) -> int:
+        series = self._series.get(_label_key(labels))
+        return series[-1] if series else 0
+    
+    def total(self, labels: Optional[Dict[str, str]] = None) -> float:
+        series = self._series.get(_label_key(labels))
+        return series[-2] if series else 0.0
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+class MetricsRegistry:
+    """Process-local metrics, exposed in Prometheus text format at /metrics"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def _get_or_create(self, cls, name: str, documentation: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, **kwargs)
+            return metric
+    
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._get_or_create(Counter, name, documentation)
+    
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation)
+    
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, buckets=buckets)
+    
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
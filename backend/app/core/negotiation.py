@@ -0,0 +1,367 @@
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.responses import Response, StreamingResponse
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+from uuid import UUID
+import io
+import time
+import zlib
+
+import orjson
+
+from .config import settings
+from .metrics import metrics
+
+# Compact formats and zstd are offered only where their libraries are installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+# Other names clients use for MessagePack
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+
+VARY = "Accept, Accept-Encoding"
+
+# Pieces of a streamed body are compressed and sent in chunks of about this size
+STREAM_CHUNK_BYTES = 64 * 1024
+
+response_bytes = metrics.counter(
+    "negotiated_response_bytes_total", "Body bytes sent by negotiated endpoints, by format and content coding"
+)
+encode_seconds = metrics.histogram(
+    "negotiated_encode_cpu_seconds", "CPU time spent encoding and compressing a negotiated response body"
+)
+
+def formats() -> List[str]:
+    """Response formats this process can produce, JSON first"""
+    return [JSON] + [media_type for media_type, lib in ((MSGPACK, msgpack), (CBOR, cbor2)) if lib]
+
+def encodings() -> List[str]:
+    """Content codings this process can produce, preferred first"""
+    return (["zstd"] if zstandard else []) + ["gzip"]
+
+def _parse_header(header: Optional[str]) -> Dict[str, Tuple[float, int]]:
+    """Parse an Accept-style header into {value: (quality, position)}"""
+    parsed = {}
+    for position, part in enumerate((header or "").split(",")):
+        value, *params = part.split(";")
+        value = value.strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, q = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(q)
+                except ValueError:
+                    quality = 0.0
+        parsed.setdefault(MEDIA_TYPE_ALIASES.get(value, value), (quality, position))
+    return parsed
+
+def _choose(
+    parsed: Dict[str, Tuple[float, int]],
+    offered: Sequence[str],
+    wildcards: Callable[[str], List[str]],
+    client_order: bool
+) -> Optional[str]:
+    """Pick the offer with the highest quality, exact matches before wildcards
+    
+    Ties go to the client's order when `client_order` is set, otherwise to
+    the order of `offered`.
+    """
+    best, best_rank = None, None
+    for preference, value in enumerate(offered):
+        # The most specific pattern the client listed decides this offer's quality
+        for specificity, pattern in enumerate([value] + wildcards(value)):
+            if pattern not in parsed:
+                continue
+            quality, position = parsed[pattern]
+            order = (-position, -preference) if client_order else (-preference, -position)
+            rank = (quality, -specificity) + order
+            if quality > 0 and (best_rank is None or rank > best_rank):
+                best, best_rank = value, rank
+            break
+    return best
+
+def negotiate(request: Request) -> Tuple[str, Optional[str]]:
+    """(media type, content coding or None) for the response to this request
+    
+    Clients that send no Accept header, or accept nothing we produce, get
+    JSON as before; compression is only used when Accept-Encoding asks.
+    """
+    media_type = _choose(
+        _parse_header(request.headers.get("accept")),
+        formats(),
+        lambda value: [value.split("/")[0] + "/*", "*/*"],
+        client_order=True
+    ) or JSON
+    encoding = _choose(
+        _parse_header(request.headers.get("accept-encoding")),
+        encodings(),
+        lambda value: ["*"],
+        client_order=False
+    )
+    return media_type, encoding
+
+def _utc(value: datetime) -> datetime:
+    """Stored timestamps are naive UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def _json_default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Cannot encode {type(value).__name__} as JSON")
+
+def _msgpack_default(value):
+    # UUIDs go out as 16 raw bytes, timestamps as the MessagePack timestamp extension
+    if isinstance(value, UUID):
+        return value.bytes
+    if isinstance(value, datetime):
+        # Packed natively (datetime=True) once it carries a timezone
+        return _utc(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+def _cbor_default(encoder, value):
+    if isinstance(value, BaseModel):
+        return encoder.encode(value.model_dump())
+    raise TypeError(f"Cannot encode {type(value).__name__} as CBOR")
+
+def _encoder(media_type: str) -> Callable[[Any], bytes]:
+    """Encoder for one response; reuses its packer or CBOR encoder across calls"""
+    if media_type == MSGPACK:
+        return msgpack.Packer(default=_msgpack_default, datetime=True).pack
+    if media_type == CBOR:
+        # UUIDs use tag 37, naive (UTC) timestamps tag 1 (epoch seconds)
+        buffer = io.BytesIO()
+        encoder = cbor2.CBOREncoder(
+            buffer, datetime_as_timestamp=True, timezone=timezone.utc, default=_cbor_default
+        )
+        
+        def encode(value) -> bytes:
+            buffer.seek(0)
+            buffer.truncate()
+            encoder.encode(value)
+            return buffer.getvalue()
+        
+        return encode
+    return lambda value: orjson.dumps(value, default=_json_default)
+
+def _compressor(encoding: str) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """(compress a chunk and flush it, finish the stream) for a content coding"""
+    if encoding == "zstd":
+        stream = zstandard.ZstdCompressor(level=settings.RESPONSE_ZSTD_LEVEL).compressobj()
+        return (
+            lambda chunk: stream.compress(chunk) + stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            stream.flush
+        )
+    stream = zlib.compressobj(settings.RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return lambda chunk: stream.compress(chunk) + stream.flush(zlib.Z_SYNC_FLUSH), stream.flush
+
+def _split(content: Union[BaseModel, Mapping[str, Any]], stream_field: str) -> Tuple[Dict[str, Any], Sequence]:
+    """Separate the large list field from the rest of the document"""
+    if isinstance(content, BaseModel):
+        return content.model_dump(exclude={stream_field}), getattr(content, stream_field)
+    return {name: value for name, value in content.items() if name != stream_field}, content[stream_field]
+
+def _cbor_map_header(size: int) -> bytes:
+    # Documents here have few top-level fields
+    assert size < 24
+    return bytes([0xa0 | size])
+
+def _encode_pieces(media_type: str, head: Dict[str, Any], field: str, items: Sequence) -> Iterator[bytes]:
+    """Encode {**head, field: items} one list item at a time"""
+    encode = _encoder(media_type)
+    if media_type == JSON:
+        opening = encode(head)[:-1]
+        yield opening + (b"," if head else b"") + encode(field) + b":["
+        for position, item in enumerate(items):
+            yield (b"," if position else b"") + encode(item)
+        yield b"]}"
+    elif media_type == MSGPACK:
+        packer = msgpack.Packer()
+        yield (
+            packer.pack_map_header(len(head) + 1)
+            + b"".join(encode(name) + encode(value) for name, value in head.items())
+            + encode(field)
+            + packer.pack_array_header(len(items))
+        )
+        for item in items:
+            yield encode(item)
+    else:
+        # An indefinite-length array, closed by a break byte
+        yield (
+            _cbor_map_header(len(head) + 1)
+            + b"".join(encode(name) + encode(value) for name, value in head.items())
+            + encode(field)
+            + b"\x9f"
+        )
+        for item in items:
+            yield encode(item)
+        yield b"\xff"
+
+def stream_body(media_type: str, encoding: Optional[str], pieces: Iterator[bytes]) -> Iterator[bytes]:
+    """Group encoded pieces into chunks, compressing and flushing each one (also used by exports)"""
+    compress, finish = _compressor(encoding) if encoding else (None, None)
+    labels = {"format": media_type, "encoding": encoding or "identity"}
+    cpu = 0.0
+    exhausted = False
+    while not exhausted:
+        started = time.thread_time()
+        buffer, size = [], 0
+        for piece in pieces:
+            buffer.append(piece)
+            size += len(piece)
+            if size >= STREAM_CHUNK_BYTES:
+                break
+        else:
+            exhausted = True
+        chunk = b"".join(buffer)
+        if compress:
+            chunk = compress(chunk) + (finish() if exhausted else b"")
+        cpu += time.thread_time() - started
+        if chunk:
+            response_bytes.inc(len(chunk), labels=labels)
+            yield chunk
+    encode_seconds.observe(cpu, labels=labels)
+
+def negotiated_response(
+    request: Request,
+    content: Union[BaseModel, Mapping[str, Any]],
+    stream_field: Optional[str] = None,
+    headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    """Encode a response body in the format and content coding the client asked for
+    
+    JSON (the default), MessagePack or CBOR, compressed with zstd or gzip
+    once the body reaches RESPONSE_COMPRESSION_MIN_BYTES. When the
+    `stream_field` list has RESPONSE_STREAM_MIN_ITEMS items or more, the
+    body is encoded and compressed item by item as it is sent instead.
+    """
+    media_type, encoding = negotiate(request)
+    labels = {"format": media_type, "encoding": encoding or "identity"}
+    
+    if stream_field:
+        head, items = _split(content, stream_field)
+        if len(items) >= settings.RESPONSE_STREAM_MIN_ITEMS:
+            response = StreamingResponse(
+                stream_body(media_type, encoding, _encode_pieces(media_type, head, stream_field, items)),
+                media_type=media_type
+            )
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+            return _finish(response, headers)
+    
+    started = time.thread_time()
+    body = _encoder(media_type)(content)
+    if encoding and len(body) >= settings.RESPONSE_COMPRESSION_MIN_BYTES:
+        compress, finish = _compressor(encoding)
+        body = compress(body) + finish()
+    else:
+        encoding = None
+        labels["encoding"] = "identity"
+    encode_seconds.observe(time.thread_time() - started, labels=labels)
+    response_bytes.inc(len(body), labels=labels)
+    
+    response = Response(body, media_type=media_type)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return _finish(response, headers)
+
+def _finish(response: Response, headers: Optional[Mapping[str, str]]) -> Response:
+    response.headers["Vary"] = VARY
+    for name, value in (headers or {}).items():
+        # Headers set on an injected Response parameter, minus its own body framing
+        if name.lower() not in ("content-length", "content-type"):
+            response.headers[name] = value
+    return response
+
+_DECOMPRESS_ERRORS = (zlib.error, ValueError) + ((zstandard.ZstdError,) if zstandard else ())
+
+def _decompress(body: bytes, encoding: str) -> bytes:
+    limit = settings.REQUEST_BODY_MAX_MB * 1024 * 1024
+    try:
+        if encoding == "gzip":
+            stream = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            data = stream.decompress(body, limit + 1)
+            if len(data) <= limit and not stream.eof:
+                raise ValueError("truncated gzip stream")
+        elif encoding == "zstd" and zstandard:
+            data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)).read(limit + 1)
+        else:
+            raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    except _DECOMPRESS_ERRORS as e:
+        raise HTTPException(status_code=400, detail=f"Malformed {encoding} request body: {e}")
+    if len(data) > limit:
+        raise HTTPException(status_code=413, detail=f"Decoded request body exceeds {settings.REQUEST_BODY_MAX_MB}MB")
+    return data
+
+def _decode(body: bytes, media_type: str):
+    try:
+        if media_type == MSGPACK and msgpack:
+            # timestamp=3 turns the timestamp extension into aware datetimes
+            return msgpack.unpackb(body, raw=False, timestamp=3)
+        if media_type == CBOR and cbor2:
+            return cbor2.loads(body)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Malformed {media_type} request body: {e}")
+    raise HTTPException(status_code=415, detail=f"Unsupported Content-Type: {media_type}")
+
+async def decode_request(request: Request) -> Request:
+    """Undo a request body's content coding and compact format for FastAPI's JSON body parsing
+    
+    Returns the request unchanged unless it carries a MessagePack or CBOR
+    body or a compressed JSON one; other bodies (uploads) pass through.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    media_type = MEDIA_TYPE_ALIASES.get(media_type, media_type)
+    encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if media_type not in (JSON, MSGPACK, CBOR):
+        return request
+    if media_type == JSON and encoding == "identity":
+        return request
+    
+    body = await request.body()
+    if encoding != "identity":
+        body = _decompress(body, encoding)
+    
+    headers = [
+        (name, value) for name, value in request.scope["headers"]
+        if name not in (b"content-type", b"content-encoding", b"content-length")
+    ]
+    headers += [(b"content-type", JSON.encode()), (b"content-length", str(len(body)).encode())]
+    decoded = Request({**request.scope, "headers": headers}, request.receive)
+    # Starlette caches the parsed body on these attributes; FastAPI reads it through request.json()
+    decoded._body = body
+    if media_type != JSON:
+        decoded._json = _decode(body, media_type)
+    return decoded
+
+class NegotiatedRoute(APIRoute):
+    """APIRoute that also accepts MessagePack, CBOR and gzip/zstd-compressed request bodies"""
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        
+        async def negotiated_handler(request: Request) -> Response:
+            return await handler(await decode_request(request))
+        
+        return negotiated_handler
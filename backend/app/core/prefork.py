@@ -0,0 +1,279 @@
+from typing import Dict, Optional
+import gc
+import os
+import select
+import signal
+import socket
+import time
+import traceback
+
+def memory_usage(pid: int) -> Optional[Dict[str, float]]:
+    """RSS, PSS (shared pages split between sharers) and private memory of a process in MiB
+    
+    Reads /proc/<pid>/smaps_rollup, so it returns None off Linux.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    fields[name] = int(rest.split()[0]) / 1024
+    except (OSError, ValueError):
+        return None
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+class PreforkServer:
+    """Serves an ASGI app from worker processes forked off a preloaded master
+    
+    The caller imports the app and preloads shared state (model bytes,
+    labels, catalog caches) in the master; each fork happens right after
+    gc.freeze() so that state stays copy-on-write shared and workers only
+    build their own interpreters, pools and event loop. Workers serve one
+    inherited listening socket with uvicorn. A worker that dies is replaced.
+    SIGHUP replaces the workers one at a time, and each old worker stops
+    only once its replacement reports ready. SIGTERM and SIGINT stop every
+    worker gracefully.
+    """
+    
+    # A worker dying this soon after its fork is probably crash-looping
+    MIN_WORKER_LIFETIME_SECONDS = 5.0
+    
+    def __init__(
+        self,
+        app,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 2,
+        graceful_timeout: float = 30.0,
+        ready_timeout: float = 120.0,
+        log_level: str = "info"
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.worker_count = workers
+        self.graceful_timeout = graceful_timeout
+        self.ready_timeout = ready_timeout
+        self.log_level = log_level
+        
+        # pid -> (fd the worker reports readiness on, fork time)
+        self.workers: Dict[int, tuple] = {}
+        self._stopping = False
+        self._restart_requested = False
+    
+    def run(self):
+        self.socket = socket.create_server((self.host, self.port), backlog=2048)
+        self.socket.set_inheritable(True)
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        signal.set_wakeup_fd(self._wake_w)
+        signal.signal(signal.SIGHUP, self._on_restart)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        # A handler (rather than SIG_DFL) so dead workers wake the loop
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        
+        print(f"Master {os.getpid()} listening on http://{self.host}:{self.port}, starting {self.worker_count} workers")
+        started = time.monotonic()
+        pending = [self._spawn() for _ in range(self.worker_count)]
+        for pid in pending:
+            self._wait_ready(pid)
+        print(f"{len(self.workers)} workers ready in {time.monotonic() - started:.1f}s")
+        self.report_memory()
+        
+        while not self._stopping:
+            self._sleep(1.0)
+            self._reap()
+            if self._restart_requested and not self._stopping:
+                self._restart_requested = False
+                self._rolling_restart()
+        
+        self._stop_all()
+        self.socket.close()
+        print("Master stopped")
+    
+    def _on_restart(self, signum, frame):
+        self._restart_requested = True
+    
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+    
+    def _sleep(self, timeout: float):
+        """Wait for a signal (delivered through the wakeup fd) or the timeout"""
+        ready, _, _ = select.select([self._wake_r], [], [], timeout)
+        if ready:
+            try:
+                os.read(self._wake_r, 4096)
+            except BlockingIOError:
+                pass
+    
+    def _spawn(self) -> int:
+        ready_r, ready_w = os.pipe()
+        # Collected objects would leave holes that new allocations fill, dirtying shared pages
+        gc.freeze()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            self._worker(ready_w)
+        os.close(ready_w)
+        self.workers[pid] = (ready_r, time.monotonic())
+        return pid
+    
+    def _worker(self, ready_fd: int):
+        """Child side of the fork; never returns"""
+        code = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            for other_ready_fd, _ in self.workers.values():
+                os.close(other_ready_fd)
+            gc.enable()
+            
+            import uvicorn
+            
+            class WorkerServer(uvicorn.Server):
+                async def startup(self, sockets=None):
+                    await super().startup(sockets=sockets)
+                    if not self.should_exit:
+                        os.write(ready_fd, b"1")
+                        os.close(ready_fd)
+            
+            config = uvicorn.Config(
+                self.app,
+                lifespan="on",
+                log_level=self.log_level,
+                timeout_graceful_shutdown=int(self.graceful_timeout)
+            )
+            # uvicorn handles SIGTERM/SIGINT itself by finishing in-flight requests
+            WorkerServer(config).run(sockets=[self.socket])
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+    
+    def _wait_ready(self, pid: int) -> bool:
+        """Block until the worker reports ready; False if it died or timed out first"""
+        ready_fd = self.workers[pid][0]
+        deadline = time.monotonic() + self.ready_timeout
+        while not self._stopping:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"Worker {pid} not ready after {self.ready_timeout:g}s")
+                return False
+            ready, _, _ = select.select([ready_fd], [], [], min(remaining, 1.0))
+            if ready:
+                # One byte means ready, EOF means the worker exited during startup
+                return os.read(ready_fd, 1) == b"1"
+        return False
+    
+    def _forget(self, pid: int):
+        ready_fd, _ = self.workers.pop(pid)
+        os.close(ready_fd)
+    
+    def _reap(self):
+        """Collect dead workers and replace them"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid not in self.workers:
+                continue
+            lifetime = time.monotonic() - self.workers[pid][1]
+            self._forget(pid)
+            if self._stopping:
+                continue
+            print(f"Worker {pid} exited (status {os.waitstatus_to_exitcode(status)}), starting a replacement")
+            if lifetime < self.MIN_WORKER_LIFETIME_SECONDS:
+                time.sleep(1.0)
+            self._wait_ready(self._spawn())
+    
+    def _rolling_restart(self):
+        print(f"Rolling restart of {len(self.workers)} workers")
+        for old_pid in list(self.workers):
+            if self._stopping:
+                return
+            if old_pid not in self.workers:
+                continue
+            new_pid = self._spawn()
+            if not self._wait_ready(new_pid):
+                print(f"Replacement worker {new_pid} failed to start; keeping the remaining workers")
+                self._retire(new_pid)
+                return
+            self._retire(old_pid)
+            print(f"Worker {old_pid} replaced by {new_pid}")
+        self.report_memory()
+    
+    def _retire(self, pid: int):
+        """Ask a worker to finish in-flight requests and exit, killing it after the graceful timeout"""
+        if pid not in self.workers:
+            return
+        self._forget(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while time.monotonic() < deadline:
+            try:
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    return
+            except ChildProcessError:
+                return
+            time.sleep(0.05)
+        print(f"Worker {pid} did not stop within {self.graceful_timeout:g}s, killing it")
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+    
+    def _stop_all(self):
+        print(f"Stopping {len(self.workers)} workers")
+        pids = list(self.workers)
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            for pid in list(self.workers):
+                try:
+                    done = os.waitpid(pid, os.WNOHANG)[0]
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    self._forget(pid)
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            print(f"Worker {pid} did not stop within {self.graceful_timeout:g}s, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self._forget(pid)
+    
+    def report_memory(self):
+        """Print RSS, PSS and private memory of the master and each worker"""
+        rows = [("master", os.getpid())] + [("worker", pid) for pid in self.workers]
+        for role, pid in rows:
+            usage = memory_usage(pid)
+            if usage is None:
+                return
+            print(
+                f"  {role} {pid}: RSS {usage['rss']:.0f} MiB, PSS {usage['pss']:.0f} MiB, "
+                f"private {usage['private']:.0f} MiB"
+            )
@@ -1,4 +1,7 @@
 import os
+import sqlite3
+import threading
+import time
 from .config import settings
 
 # In-memory redis mock for development
@@ -36,10 +39,114 @@ class MemoryRedis:
         if key in self.data:
             self.data[key]['expires'] = time.time() + seconds
 
-# Use in-memory redis for dev or real redis for production
+class SQLiteRedis:
+    """Redis subset on a WAL-mode SQLite file, shared by every worker on the host
+    
+    Each thread (and each forked worker) opens its own connection; every
+    command is a single autocommitted statement, so `incr` is atomic across
+    processes. Expired keys read as missing and are deleted in small
+    batches at most every SWEEP_INTERVAL_SECONDS per process.
+    """
+    
+    SWEEP_INTERVAL_SECONDS = 30
+    SWEEP_BATCH = 500
+    
+    def __init__(self, path: str, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires REAL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires) WHERE expires IS NOT NULL;
+        """)
+    
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not cross a fork, so they are keyed by pid as well as thread
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            connection = sqlite3.connect(
+                self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.connection, self._local.pid = connection, pid
+        return self._local.connection
+    
+    def _write(self, sql, parameters=()):
+        now = time.time()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.SWEEP_INTERVAL_SECONDS
+            self.sweep(now)
+        return self._connection().execute(sql, parameters)
+    
+    def sweep(self, now: float = None) -> int:
+        """Delete up to SWEEP_BATCH expired keys (oldest first); returns how many"""
+        cursor = self._connection().execute(
+            "DELETE FROM kv WHERE key IN "
+            "(SELECT key FROM kv WHERE expires IS NOT NULL AND expires <= ? ORDER BY expires LIMIT ?)",
+            (now or time.time(), self.SWEEP_BATCH)
+        )
+        return cursor.rowcount
+    
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+    
+    def setex(self, key, seconds, value):
+        self._write(
+            "INSERT INTO kv (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            (key, str(value), time.time() + seconds)
+        )
+        return True
+    
+    def delete(self, *keys):
+        if not keys:
+            return 0
+        placeholders = ", ".join("?" * len(keys))
+        return self._write(f"DELETE FROM kv WHERE key IN ({placeholders})", keys).rowcount
+    
+    def incr(self, key):
+        # One statement: an expired key restarts from 1 without a TTL, a live one keeps its TTL
+        row = self._write(
+            "INSERT INTO kv (key, value, expires) VALUES (:key, '1', NULL) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = CASE WHEN expires <= :now THEN 1 ELSE CAST(value AS INTEGER) + 1 END, "
+            "expires = CASE WHEN expires <= :now THEN NULL ELSE expires END "
+            "RETURNING value",
+            {"key": key, "now": time.time()}
+        ).fetchone()
+        return int(row[0])
+    
+    def expire(self, key, seconds):
+        now = time.time()
+        cursor = self._write(
+            "UPDATE kv SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (now + seconds, key, now)
+        )
+        return cursor.rowcount > 0
+
+def sqlite_kv_path(url: str) -> str:
+    """File path from a sqlite:///relative/path or sqlite:////absolute/path KV URL"""
+    return url[len("sqlite:///"):]
+
+# Use in-memory redis for dev, a shared SQLite file for multi-worker
+# single-box installs, or real redis for production
 if settings.REDIS_URL.startswith("redis://") or settings.REDIS_URL.startswith("rediss://"):
     import redis
     redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+elif settings.REDIS_URL.startswith("sqlite:///"):
+    redis_client = SQLiteRedis(sqlite_kv_path(settings.REDIS_URL), busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS)
 else:
     redis_client = MemoryRedis()
 
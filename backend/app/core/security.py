@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import Header, HTTPException
 from jose import JWTError, jwt
+import hmac
 from passlib.context import CryptContext
 from .config import settings
 
@@ -33,3 +35,11 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
     return pwd_context.verify(plain_password, hashed_password)
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """Dependency for admin-only routes: requires `Authorization: Bearer <ADMIN_API_TOKEN>`"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if not settings.ADMIN_API_TOKEN or scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.strip().encode(), settings.ADMIN_API_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
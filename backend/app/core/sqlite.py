@@ -0,0 +1,78 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import asyncio
+import sqlite3
+import threading
+
+from .config import settings
+from .tracing import span
+
+# Statements that never need the write lock; everything else is treated as a write
+_READ_PREFIXES = ("SELECT", "PRAGMA", "EXPLAIN")
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+def sqlite_connect_args() -> dict:
+    """Driver arguments for the SQLite profile (busy timeout, cross-thread pooling)"""
+    return {
+        "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        "check_same_thread": False,
+    }
+
+def configure_sqlite_engine(engine: Engine) -> Engine:
+    """Apply the single-node SQLite profile to an engine
+    
+    Every new connection switches to WAL with synchronous=NORMAL and gets
+    mmap, page cache and busy-timeout pragmas, so readers never block on the
+    writer. With SQLITE_SERIALIZE_WRITES, write transactions in this process
+    queue on one lock from their first write statement until the connection
+    returns to the pool; other processes still wait on SQLite's own lock
+    for up to the busy timeout. Writes issued on the event-loop thread never
+    wait for that lock: when it is taken they go straight to SQLite's busy
+    handler, as writes from other processes do.
+    """
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_MB) * 1024 * 1024}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_MB) * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+    
+    if not settings.SQLITE_SERIALIZE_WRITES:
+        return engine
+    
+    write_lock = threading.Lock()
+    timeout = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def acquire_writer(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("sqlite_writer") or statement.lstrip()[:7].upper().startswith(_READ_PREFIXES):
+            return
+        if not write_lock.acquire(blocking=False):
+            if _on_event_loop():
+                # Blocking here would stall every request on this worker; the next write statement retries
+                return
+            # Only contended waits get a span; an uncontended lock costs nothing to trace
+            with span("sqlite.write_lock_wait"):
+                if not write_lock.acquire(timeout=timeout):
+                    raise sqlite3.OperationalError("database is locked (timed out waiting for the write queue)")
+        conn.info["sqlite_writer"] = True
+    
+    def release_writer(dbapi_connection, connection_record, *args):
+        if connection_record is not None and connection_record.info.pop("sqlite_writer", False):
+            write_lock.release()
+    
+    # Checkin follows the commit or reset-on-return rollback, so the lock covers the whole transaction
+    event.listen(engine, "checkin", release_writer)
+    event.listen(engine, "invalidate", release_writer)
+    return engine
@@ -0,0 +1,110 @@
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+from typing import Mapping, Optional, Tuple
+import os
+
+import anyio
+
+class RequestBodyStreamingResponse(StreamingResponse):
+    """StreamingResponse for handlers that keep reading the request body while they reply
+    
+    The stock response listens on `receive` for a client disconnect, which
+    would swallow request body messages that the body iterator still needs.
+    A disconnect surfaces instead as ClientDisconnect from `request.stream()`.
+    """
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when a Range header lies entirely outside the file"""
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end) pair
+    
+    Returns None when the whole file should be sent: no header, another
+    unit, a malformed value or several ranges (which we may ignore).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+class FileRangeResponse(Response):
+    """Sends a file (or one byte range of it) with the ASGI zero-copy extension when available
+    
+    Servers that advertise `http.response.zerocopysend` hand the descriptor
+    to sendfile(2); otherwise the range is read in chunks off the event loop.
+    """
+    chunk_size = 256 * 1024
+    
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        byte_range: Optional[Tuple[int, int]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+    ):
+        self.path = path
+        self.start, end = byte_range or (0, size - 1)
+        self.count = end - self.start + 1
+        super().__init__(
+            status_code=206 if byte_range else 200,
+            headers=headers,
+            media_type=media_type,
+        )
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["content-length"] = str(self.count)
+        if byte_range:
+            self.headers["content-range"] = f"bytes {self.start}-{end}/{size}"
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD" or self.count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            return
+        
+        fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY)
+        try:
+            offset, remaining = self.start, self.count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(self.chunk_size, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # The file shrank under us; end the body rather than hang the client
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
@@ -0,0 +1,468 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import atexit
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .metrics import metrics
+
+TRACE_ID_HEADER = "x-trace-id"
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_TRACE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# OTLP span kinds and status codes
+KIND_INTERNAL, KIND_SERVER = 1, 2
+STATUS_UNSET, STATUS_ERROR = 0, 2
+
+# Spans beyond this many in one trace are counted but not kept
+MAX_SPANS_PER_TRACE = 512
+# Attribute values are cut to this length in logged span trees (not in exports)
+TREE_VALUE_CHARS = 80
+# Finished traces waiting for the exporter thread
+EXPORT_QUEUE_SIZE = 1000
+EXPORT_BATCH_SIZE = 100
+
+traces_finished = metrics.counter("tracing_traces_total", "Finished traces by what happened to them")
+slow_requests = metrics.counter("tracing_slow_requests_total", "Requests slower than TRACING_SLOW_REQUEST_MS")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+class Span:
+    """One timed operation in a trace; the root span covers the whole request"""
+    
+    __slots__ = ("trace", "name", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "status", "message")
+    
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.message = ""
+    
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def fail(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.message = f"{type(error).__name__}: {error}"
+    
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+    
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+class _NoopSpan:
+    """Stands in for a span when nothing is being traced"""
+    
+    def set(self, key: str, value: Any):
+        pass
+    
+    def fail(self, error: BaseException):
+        pass
+    
+    def end(self):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """Spans of one request (or background job), kept in memory until it finishes"""
+    
+    def __init__(self, trace_id: Optional[str] = None, sampled: Optional[bool] = None):
+        self.trace_id = trace_id or _new_id(128)
+        self.sampled = sampled if sampled is not None else random.random() < settings.TRACING_SAMPLE_RATE
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+    
+    def start_span(self, name: str, parent_id: Optional[str], kind: int = KIND_INTERNAL, **attributes) -> Span:
+        span = Span(self, name, parent_id, kind, attributes)
+        # Spans may be opened from worker threads (sync dependencies, thread-pooled DB calls)
+        with self._lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+        return span
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_trace_id() -> Optional[str]:
+    parent = _current_span.get()
+    return parent.trace.trace_id if parent else None
+
+def start_span(name: str, **attributes):
+    """Open a child of the current span without making it current (end it yourself)
+    
+    For callbacks that start and finish in different calls, such as
+    SQLAlchemy's before/after cursor events. Returns NOOP_SPAN when the
+    caller is not inside a trace.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return parent.trace.start_span(name, parent.span_id, **attributes)
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Any]:
+    """Time a block as a child of the current span; a no-op outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = parent.trace.start_span(name, parent.span_id, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.fail(e)
+        raise
+    finally:
+        child.end()
+        _current_span.reset(token)
+
+@contextmanager
+def trace(
+    name: str,
+    trace_id: Optional[str] = None,
+    parent_id: Optional[str] = None,
+    sampled: Optional[bool] = None,
+    kind: int = KIND_INTERNAL,
+    **attributes
+) -> Iterator[Any]:
+    """Start a new trace with a root span (a request, or a background job such as a flush)
+    
+    On exit the trace is exported when sampled, and its whole span tree is
+    logged when the root took longer than TRACING_SLOW_REQUEST_MS.
+    """
+    if not settings.TRACING_ENABLED:
+        yield NOOP_SPAN
+        return
+    current = Trace(trace_id, sampled)
+    root = current.start_span(name, parent_id, kind, **attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.fail(e)
+        raise
+    finally:
+        root.end()
+        _current_span.reset(token)
+        finish(current, root)
+
+def finish(current: Trace, root: Span):
+    """Slow-request log and export for a finished trace"""
+    for open_span in current.spans:
+        # Anything still open (a failed commit, an abandoned stream) ends with the root
+        if open_span.end_ns is None:
+            open_span.end_ns = root.end_ns
+            open_span.attributes.setdefault("unfinished", True)
+    
+    slow = settings.TRACING_SLOW_REQUEST_MS > 0 and root.duration_ms >= settings.TRACING_SLOW_REQUEST_MS
+    if slow:
+        slow_requests.inc()
+        print(f"Slow trace {current.trace_id} ({root.duration_ms:.0f} ms):")
+        print("\n".join(format_tree(span_records(current.spans))))
+        if current.dropped:
+            print(f"  ... {current.dropped} more spans not recorded")
+    
+    # Slow traces are kept whatever the sample rate, so they can be looked up later
+    if current.sampled or slow:
+        traces_finished.inc(labels={"outcome": "exported" if exporter.submit(current) else "dropped"})
+    else:
+        traces_finished.inc(labels={"outcome": "not_sampled"})
+
+SpanRecord = Tuple[str, Optional[str], str, int, int, Dict[str, Any], str]
+
+def span_records(spans: Iterable[Span]) -> List[SpanRecord]:
+    """(span id, parent id, name, start ns, end ns, attributes, error message) per span"""
+    return [
+        (s.span_id, s.parent_id, s.name, s.start_ns, s.end_ns or s.start_ns, s.attributes,
+         s.message if s.status == STATUS_ERROR else "")
+        for s in spans
+    ]
+
+def _shorten(value: Any) -> str:
+    text = str(value)
+    return text if len(text) <= TREE_VALUE_CHARS else text[:TREE_VALUE_CHARS - 3] + "..."
+
+def format_tree(records: List[SpanRecord]) -> List[str]:
+    """Indented span tree with each span's offset from the trace start and its duration"""
+    if not records:
+        return []
+    ids = {record[0] for record in records}
+    children: Dict[Optional[str], List[SpanRecord]] = {}
+    for record in records:
+        parent = record[1] if record[1] in ids else None
+        children.setdefault(parent, []).append(record)
+    start = min(record[3] for record in records)
+    
+    lines = []
+    
+    def walk(parent: Optional[str], depth: int):
+        for span_id, _, name, start_ns, end_ns, attributes, error in sorted(children.get(parent, []), key=lambda r: r[3]):
+            details = " ".join(f"{key}={_shorten(value)}" for key, value in attributes.items())
+            if error:
+                details = f"{details} error={error!r}".strip()
+            lines.append(
+                f"  {'  ' * depth}{name:<{max(1, 40 - 2 * depth)}} "
+                f"+{(start_ns - start) / 1e6:8.1f} ms {(end_ns - start_ns) / 1e6:9.1f} ms  {details}".rstrip()
+            )
+            walk(span_id, depth + 1)
+    
+    walk(None, 0)
+    return lines
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """An OTLP/JSON ExportTraceServiceRequest (what collectors accept on /v1/traces)"""
+    spans = []
+    for current in traces:
+        for s in current.spans:
+            otlp_span = {
+                "traceId": current.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": s.kind,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": _otlp_attributes(s.attributes),
+                "status": {"code": s.status, "message": s.message} if s.status == STATUS_ERROR else {},
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({
+            "service.name": settings.APP_NAME,
+            "service.version": settings.VERSION,
+            "deployment.environment": settings.ENVIRONMENT,
+            "process.pid": os.getpid(),
+        })},
+        "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+    }]}
+
+def read_exported_spans(path: str, trace_id: str) -> List[SpanRecord]:
+    """Spans of one trace from an OTLP/JSON lines export file (for `manage.py trace`)"""
+    def attribute_value(value: Dict[str, Any]):
+        for kind in ("stringValue", "boolValue", "doubleValue"):
+            if kind in value:
+                return value[kind]
+        return int(value.get("intValue", 0))
+    
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if trace_id not in line:
+                continue
+            for resource_spans in json.loads(line).get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for s in scope_spans.get("spans", []):
+                        if s["traceId"] != trace_id:
+                            continue
+                        records.append((
+                            s["spanId"],
+                            s.get("parentSpanId") or None,
+                            s["name"],
+                            int(s["startTimeUnixNano"]),
+                            int(s["endTimeUnixNano"]),
+                            {a["key"]: attribute_value(a["value"]) for a in s.get("attributes", [])},
+                            s.get("status", {}).get("message", "") if s.get("status", {}).get("code") == STATUS_ERROR else "",
+                        ))
+    return records
+
+class SpanExporter:
+    """Ships finished traces from a background thread so requests never wait on export
+    
+    Writes OTLP/JSON lines to TRACING_EXPORT_PATH (the format of the
+    OpenTelemetry Collector's file exporter) and/or POSTs them to an OTLP/HTTP
+    endpoint such as a local collector's http://localhost:4318/v1/traces.
+    The thread is started per process on first use, so forked workers each
+    get their own.
+    """
+    
+    def __init__(self):
+        self._queue: "queue.Queue[Trace]" = queue.Queue(EXPORT_QUEUE_SIZE)
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def configured(self) -> bool:
+        return bool(settings.TRACING_EXPORT_PATH or settings.TRACING_OTLP_ENDPOINT)
+    
+    def submit(self, finished: Trace) -> bool:
+        """Queue a trace for export; False when export is off or the queue is full"""
+        if not self.configured:
+            return False
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(finished)
+            return True
+        except queue.Full:
+            return False
+    
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker inherits the parent's queue contents but not its thread
+            self._queue = queue.Queue(EXPORT_QUEUE_SIZE)
+            threading.Thread(target=self._run, name="span-exporter", daemon=True).start()
+            atexit.register(self.flush)
+            self._pid = os.getpid()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._export(batch)
+    
+    def flush(self):
+        """Export whatever is still queued (at exit)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._export(batch)
+    
+    def _export(self, batch: List[Trace]):
+        payload = json.dumps(to_otlp(batch), separators=(",", ":"))
+        if settings.TRACING_EXPORT_PATH:
+            try:
+                # One write per batch keeps lines from different workers whole
+                fd = os.open(settings.TRACING_EXPORT_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, (payload + "\n").encode("utf-8"))
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                print(f"Could not write traces to {settings.TRACING_EXPORT_PATH}: {e}")
+        if settings.TRACING_OTLP_ENDPOINT:
+            request = urllib.request.Request(
+                settings.TRACING_OTLP_ENDPOINT,
+                data=payload.encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+            except Exception as e:
+                print(f"Could not send traces to {settings.TRACING_OTLP_ENDPOINT}: {e}")
+
+exporter = SpanExporter()
+
+def _incoming_context(scope: Scope) -> Tuple[Optional[str], Optional[str], Optional[bool]]:
+    """(trace id, parent span id, sampled) from traceparent or X-Trace-Id"""
+    trace_id = None
+    for name, value in scope.get("headers", []):
+        if name == TRACEPARENT_HEADER.encode():
+            match = _TRACEPARENT.match(value.decode("latin-1").strip().lower())
+            if match and match.group(1) != "0" * 32:
+                return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+        elif name == TRACE_ID_HEADER.encode():
+            candidate = value.decode("latin-1").strip().lower().replace("-", "")
+            if _TRACE_ID.match(candidate):
+                trace_id = candidate
+    return trace_id, None, None
+
+class TracingMiddleware:
+    """Opens a root span per HTTP request and propagates its trace id
+    
+    Continues a W3C `traceparent` (or a bare `X-Trace-Id`) from the client
+    and returns `X-Trace-Id` and `traceparent` on the response, so a slow
+    scan reported by the app can be found in the exported traces. Reading
+    the request body is timed as its own span.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        
+        trace_id, parent_id, sampled = _incoming_context(scope)
+        with trace(
+            f"{scope['method']} {scope['path']}",
+            trace_id=trace_id,
+            parent_id=parent_id,
+            sampled=sampled,
+            kind=KIND_SERVER,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as root:
+            body_span = None
+            
+            async def traced_receive() -> Message:
+                nonlocal body_span
+                if body_span is None:
+                    body_span = start_span("http.receive_body")
+                message = await receive()
+                if message["type"] == "http.request":
+                    body_span.set("bytes", body_span.attributes.get("bytes", 0) + len(message.get("body", b"")))
+                    if not message.get("more_body", False):
+                        body_span.end()
+                return message
+            
+            async def traced_send(message: Message):
+                if message["type"] == "http.response.start":
+                    root.set("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        root.status = STATUS_ERROR
+                        root.message = f"HTTP {message['status']}"
+                    headers = list(message.get("headers", []))
+                    headers.append((TRACE_ID_HEADER.encode(), root.trace.trace_id.encode()))
+                    headers.append((TRACEPARENT_HEADER.encode(), f"00-{root.trace.trace_id}-{root.span_id}-01".encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+            
+            try:
+                await self.app(scope, traced_receive, traced_send)
+            finally:
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    root.name = f"{scope['method']} {route.path}"
@@ -1,23 +1,31 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import time
 
+from .core.admission import AdmissionMiddleware
 from .core.config import settings
-from .core.database import Base, engine
-from .api import auth, equipment, scan
+from .core.database import pool_stats, update_pool_metrics
+from .core.metrics import metrics
+from .core.tracing import TracingMiddleware
+from .api import auth, equipment, scan, analytics, assets
+from .services.scan_logger import scan_logger
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# The schema is managed by migrations (`python manage.py migrate`), never by workers
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     print(f"Starting {settings.APP_NAME} v{settings.VERSION}")
     print(f"Environment: {settings.ENVIRONMENT}")
+    # Interpreters are per process; build them before taking traffic rather than on the first scan
+    scan.tflite_model.load_interpreters()
+    await scan_logger.start()
     yield
     print("Shutting down...")
+    # Flush queued scan records before the worker exits
+    await scan_logger.stop()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -27,13 +35,18 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# CORS middleware
+# Admission control: shed analyze requests before their uploads are read
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, paths=["/api/scan/analyze"])
+
+# CORS middleware (added last so it also wraps 503 responses from admission control)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins_list,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
 # Request timing middleware
@@ -45,10 +58,15 @@ async def add_process_time_header(request: Request, call_next):
     response.headers["X-Process-Time"] = str(process_time)
     return response
 
+# Tracing (added last so the root span covers every other middleware, admission wait included)
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(equipment.router, prefix="/api")
 app.include_router(scan.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
+app.include_router(assets.router, prefix="/api")
 
 # Health check endpoint
 @app.get("/health")
@@ -61,6 +79,17 @@ async def health_check():
         "environment": settings.ENVIRONMENT
     }
 
+@app.get("/health/db")
+async def database_health():
+    """Connection pool usage for the primary and each read replica"""
+    return {"pools": pool_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Process metrics in Prometheus text format"""
+    update_pool_metrics()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     """Root endpoint"""
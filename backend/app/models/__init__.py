@@ -1,4 +1,5 @@
 # Models package
 from .user import User
-from .equipment import Equipment
-from .scan import ScanMetadata
+from .equipment import Equipment, EquipmentTombstone
+from .scan import ScanMetadata, ScanChangeCounter, ScanTombstone
+from .analytics import ScanDailyEquipment, ScanDailyUser, ScanConfidenceHistogram
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, String, Integer, Date, Index
+from ..core.database import Base
+
+# Confidence scores are rolled up into this many equal-width buckets over [0, 1]
+CONFIDENCE_BUCKETS = 10
+
+class ScanDailyEquipment(Base):
+    """Scans per equipment per day, maintained incrementally from scan inserts"""
+    __tablename__ = "scan_daily_equipment"
+    
+    day = Column(Date, primary_key=True)
+    equipment_id = Column(String(36), primary_key=True, index=True)
+    scan_count = Column(Integer, nullable=False, default=0)
+
+class ScanDailyUser(Base):
+    """Scans per user per day, maintained incrementally from scan inserts"""
+    __tablename__ = "scan_daily_user"
+    
+    user_id = Column(String(36), primary_key=True)
+    day = Column(Date, primary_key=True)
+    scan_count = Column(Integer, nullable=False, default=0)
+
+class ScanConfidenceHistogram(Base):
+    """Confidence score histogram per equipment per day"""
+    __tablename__ = "scan_confidence_histogram"
+    
+    day = Column(Date, primary_key=True)
+    equipment_id = Column(String(36), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    scan_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index("ix_scan_confidence_histogram_equipment_day", "equipment_id", "day"),
+    )
@@ -42,6 +42,16 @@ class Equipment(Base):
     safety_info_en = Column(Text, nullable=True)
     safety_info_km = Column(Text, nullable=True)
     image_url = Column(String(512), nullable=True)
+    # SHA-256 of an uploaded image in the asset store; takes precedence over image_url
+    image_key = Column(String(64), nullable=True)
     tags = Column(JSONEncodedList, nullable=True, default=list)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+class EquipmentTombstone(Base):
+    """Records deleted equipment so delta catalog syncs can report removals"""
+    __tablename__ = "equipment_tombstones"
+    
+    equipment_id = Column(String(36), primary_key=True)
+    class_name = Column(String(100), nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
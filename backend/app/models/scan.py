@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Text, BigInteger, Index
 from datetime import datetime
 import uuid
 import json
@@ -26,3 +26,25 @@ class ScanMetadata(Base):
     device_info = Column(JSONType, nullable=True)
     scanned_at = Column(DateTime, default=datetime.utcnow, index=True)
     synced_at = Column(DateTime, default=datetime.utcnow)
+    # Position in the user's change feed (see services.scan_changes)
+    change_seq = Column(BigInteger, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_scan_metadata_user_change_seq", "user_id", "change_seq"),
+    )
+
+class ScanChangeCounter(Base):
+    """Last change sequence number handed out per user"""
+    __tablename__ = "scan_change_counters"
+    
+    user_id = Column(String(36), primary_key=True)
+    last_seq = Column(BigInteger, nullable=False, default=0)
+
+class ScanTombstone(Base):
+    """Records deleted scans so change feeds can report removals"""
+    __tablename__ = "scan_tombstones"
+    
+    user_id = Column(String(36), primary_key=True)
+    change_seq = Column(BigInteger, primary_key=True)
+    scan_id = Column(String(36), nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
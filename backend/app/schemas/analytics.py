@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from uuid import UUID
+from datetime import date
+
+class EquipmentScanCount(BaseModel):
+    equipment_id: UUID
+    name_en: Optional[str] = None
+    class_name: Optional[str] = None
+    scan_count: int
+
+class TopEquipmentResponse(BaseModel):
+    start: date
+    end: date
+    items: List[EquipmentScanCount]
+
+class DailyCount(BaseModel):
+    day: date
+    scan_count: int
+
+class DailySeriesResponse(BaseModel):
+    start: date
+    end: date
+    total: int
+    days: List[DailyCount]
+
+class ConfidenceBucket(BaseModel):
+    lower: float
+    upper: float
+    scan_count: int
+
+class ConfidenceHistogramResponse(BaseModel):
+    start: date
+    end: date
+    equipment_id: Optional[UUID] = None
+    total: int
+    buckets: List[ConfidenceBucket]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 from uuid import UUID
 from datetime import datetime
 
@@ -22,12 +22,57 @@ class EquipmentCreate(EquipmentBase):
 
 class EquipmentResponse(EquipmentBase):
     equipment_id: UUID
+    # Thumbnail URLs by size when the image is in the asset store
+    image_variants: Dict[str, str] = {}
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
 
+class EquipmentSummary(BaseModel):
+    """What a list row needs: names, category and a thumbnail"""
+    equipment_id: UUID
+    class_name: str
+    name_en: str
+    name_km: Optional[str] = None
+    category: str
+    image_url: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
 class EquipmentListResponse(BaseModel):
     total: int
     items: List[EquipmentResponse]
+
+class EquipmentBatchResponse(BaseModel):
+    # In the order asked for; ids with no equipment are listed in `missing`
+    items: List[EquipmentResponse]
+    missing: List[UUID]
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class EquipmentBrowseResponse(BaseModel):
+    total: int
+    items: List[EquipmentResponse]
+    # Most frequent first; categories are counted without the category filter
+    categories: List[FacetCount]
+    tags: List[FacetCount]
+
+class EquipmentChangesResponse(BaseModel):
+    items: List[EquipmentResponse]
+    deleted: List[UUID]
+    next_since: Optional[datetime] = None
+    next_since_id: Optional[str] = None
+    has_more: bool
+
+class SimilarEquipment(BaseModel):
+    equipment: EquipmentResponse
+    distance: float
+
+class SimilarEquipmentResponse(BaseModel):
+    equipment_id: UUID
+    items: List[SimilarEquipment]
@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional, List, Dict, Any
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timezone
+
+from .equipment import EquipmentSummary
 
 class ScanAnalysisRequest(BaseModel):
     user_id: Optional[UUID] = None
@@ -18,6 +20,23 @@ class ScanAnalysisResponse(BaseModel):
     safety_info: Optional[str] = None
     image_url: Optional[str] = None
     tags: List[str] = []
+    # Cascade stage whose model answered (see models/model_config.json)
+    inference_stage: Optional[str] = None
+
+class ModelInputSpecResponse(BaseModel):
+    model_name: Optional[str] = None
+    model_version: Optional[str] = None
+    spec_version: int
+    shape: List[int]
+    dtype: str
+    layout: str
+    color_space: str
+    content_type: str
+    header_format: str
+    header_size: int
+    
+    class Config:
+        protected_namespaces = ()
 
 class ChatRequest(BaseModel):
     equipment_id: UUID
@@ -34,13 +53,37 @@ class ScanMetadataCreate(BaseModel):
     equipment_id: UUID
     confidence_score: float
     device_info: Optional[Dict[str, Any]] = None
+    scanned_at: Optional[datetime] = None
+    
+    @field_validator("scanned_at")
+    @classmethod
+    def to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """Timestamps are stored as naive UTC (MessagePack and CBOR ones arrive timezone-aware)"""
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
 
 class ScanMetadataResponse(BaseModel):
     scan_id: UUID
     user_id: UUID
     equipment_id: UUID
     confidence_score: float
+    device_info: Optional[Dict[str, Any]] = None
     scanned_at: datetime
+    synced_at: Optional[datetime] = None
+    change_seq: Optional[int] = None
+    # Only with include_equipment=true; None when the item has since been deleted
+    equipment: Optional[EquipmentSummary] = None
     
     class Config:
         from_attributes = True
+
+class ScanHistoryResponse(BaseModel):
+    scans: List[ScanMetadataResponse]
+    total: int
+
+class ScanChangesResponse(BaseModel):
+    scans: List[ScanMetadataResponse]
+    deleted: List[UUID]
+    next_since: int
+    has_more: bool
@@ -1,25 +1,139 @@
-from typing import Dict, List, Any
-import os
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
+import asyncio
+import json
+
+from ..core.config import settings
+from .upstream import (
+    CircuitBreaker, FaultInjectingUpstream, ResilientClient, UpstreamError, http_client, raise_for_status
+)
+from .stub_answers import stub_reply, stub_stream
+
+def _retryable(error: BaseException) -> bool:
+    """Blocked prompts (ValueError) and 4xx errors other than 429 fail the same way again"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and 400 <= code < 500 and code != 429:
+        return False
+    return not isinstance(error, ValueError)
+
+def _request_body(prompt: str) -> Dict[str, Any]:
+    return {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+
+def _response_text(data: Dict[str, Any]) -> str:
+    """Text of a GenerateContentResponse; ValueError when the prompt was blocked"""
+    blocked = data.get("promptFeedback", {}).get("blockReason")
+    if blocked:
+        raise ValueError(f"Prompt blocked: {blocked}")
+    candidates = data.get("candidates") or []
+    if not candidates:
+        return ""
+    return "".join(part.get("text", "") for part in candidates[0].get("content", {}).get("parts", []))
+
+async def _sse_texts(response) -> AsyncIterator[str]:
+    """Text chunks of a streamGenerateContent?alt=sse response; closes it when done"""
+    try:
+        async for line in response.aiter_lines():
+            if line.startswith("data:"):
+                text = _response_text(json.loads(line[5:]))
+                if text:
+                    yield text
+    finally:
+        await response.aclose()
 
 class GeminiChat:
     """Google Gemini AI chat service for equipment assistance"""
     
     def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY", "")
-        self.model = None
+        self.api_key = settings.GEMINI_API_KEY
+        self.client = None
+        self.stream_client = None
         
-        # Try to initialize Gemini
-        if self.api_key:
-            try:
-                import google.generativeai as genai
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel('gemini-pro')
-                print("Gemini AI initialized successfully")
-            except Exception as e:
-                print(f"Could not initialize Gemini: {e}")
-                print("Using mock AI responses")
+        if settings.GEMINI_FAULT_INJECTION:
+            stub = FaultInjectingUpstream.from_spec(
+                settings.GEMINI_FAULT_INJECTION,
+                respond=stub_reply
+            )
+            self.client = self._client(stub)
+            self.stream_client = self._client(lambda prompt: stub_stream(stub, prompt), stream=True)
+            print(f"Gemini replaced by fault-injecting stub ({settings.GEMINI_FAULT_INJECTION})")
+        elif self.api_key or settings.UPSTREAM_STUBS_URL:
+            # The REST API directly; UPSTREAM_STUBS_URL swaps in the local stand-in
+            self.client = self._client(self._generate)
+            self.stream_client = self._client(self._open_stream, stream=True)
+            print(f"Gemini {settings.GEMINI_MODEL} at {settings.gemini_api_base_url}")
+    
+    def _client(self, call, stream: bool = False) -> ResilientClient:
+        hedge_after = settings.GEMINI_HEDGE_AFTER_MS / 1000
+        return ResilientClient(
+            "gemini_stream" if stream else "gemini",
+            call,
+            deadline=settings.GEMINI_DEADLINE_MS / 1000,
+            attempt_timeout=settings.GEMINI_ATTEMPT_TIMEOUT_MS / 1000,
+            max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+            retries=settings.GEMINI_RETRIES,
+            backoff=settings.GEMINI_RETRY_BACKOFF_MS / 1000,
+            # A hedge that lost after starting to stream would leave its response open
+            hedge_after=None if stream else hedge_after or None,
+            breaker=CircuitBreaker(
+                "gemini_stream" if stream else "gemini",
+                failure_threshold=settings.GEMINI_BREAKER_FAILURES,
+                reset_timeout=settings.GEMINI_BREAKER_RESET_SECONDS
+            ),
+            retryable=_retryable
+        )
     
-    def generate_response(
+    def _url(self, method: str) -> str:
+        return f"{settings.gemini_api_base_url}/v1beta/models/{settings.GEMINI_MODEL}:{method}"
+    
+    async def _generate(self, prompt: str) -> str:
+        """One request to Gemini"""
+        response = await http_client().post(
+            self._url("generateContent"), params={"key": self.api_key}, json=_request_body(prompt)
+        )
+        raise_for_status(response)
+        return _response_text(response.json())
+    
+    async def _open_stream(self, prompt: str) -> Tuple[str, AsyncIterator[str]]:
+        """Start a streamed answer; returns once the first chunk is in, with an iterator over the rest"""
+        client = http_client()
+        request = client.build_request(
+            "POST", self._url("streamGenerateContent"),
+            params={"alt": "sse", "key": self.api_key}, json=_request_body(prompt)
+        )
+        response = await client.send(request, stream=True)
+        try:
+            if response.status_code >= 400:
+                await response.aread()
+                raise_for_status(response)
+            chunks = _sse_texts(response)
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            # An empty answer; the exhausted iterator has already closed the response
+            return "", chunks
+        except BaseException:
+            await response.aclose()
+            raise
+        return first, chunks
+    
+    def _build_prompt(
+        self,
+        equipment_context: Dict[str, Any],
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]]
+    ) -> str:
+        # Build context prompt
+        context = self._build_context(equipment_context)
+        
+        # Build conversation
+        conversation_text = context + "\n\n"
+        if conversation_history:
+            for msg in conversation_history:
+                role = "User" if msg.get("role") == "user" else "Assistant"
+                conversation_text += f"{role}: {msg.get('content', '')}\n"
+        
+        conversation_text += f"User: {user_message}\nAssistant:"
+        return conversation_text
+    
+    async def generate_response(
         self,
         equipment_context: Dict[str, Any],
         user_message: str,
@@ -27,30 +141,52 @@ class GeminiChat:
     ) -> str:
         """Generate AI response using Gemini or fallback to mock"""
         
-        if self.model and self.api_key:
+        if self.client:
             try:
-                # Build context prompt
-                context = self._build_context(equipment_context)
-                
-                # Build conversation
-                conversation_text = context + "\n\n"
-                if conversation_history:
-                    for msg in conversation_history:
-                        role = "User" if msg.get("role") == "user" else "Assistant"
-                        conversation_text += f"{role}: {msg.get('content', '')}\n"
-                
-                conversation_text += f"User: {user_message}\nAssistant:"
-                
-                # Generate response
-                response = self.model.generate_content(conversation_text)
-                return response.text
-                
-            except Exception as e:
-                print(f"Gemini error: {e}, using fallback")
+                return await self.client(self._build_prompt(equipment_context, user_message, conversation_history))
+            except UpstreamError as e:
+                # While the circuit is open every message falls back without trying
+                if e.reason != "circuit_open":
+                    print(f"Gemini error: {e}, using fallback")
         
         # Fallback to mock responses
         return self._generate_mock_response(equipment_context, user_message)
     
+    async def stream_response(
+        self,
+        equipment_context: Dict[str, Any],
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """Yield the answer in chunks as Gemini produces them (the mock answer in one piece)
+        
+        The deadline and retries cover the wait for the first chunk; after
+        that each chunk must follow within GEMINI_ATTEMPT_TIMEOUT_MS, or the
+        answer ends where it stopped.
+        """
+        if self.stream_client:
+            prompt = self._build_prompt(equipment_context, user_message, conversation_history)
+            try:
+                first, rest = await self.stream_client(prompt)
+            except UpstreamError as e:
+                if e.reason != "circuit_open":
+                    print(f"Gemini error: {e}, using fallback")
+            else:
+                try:
+                    if first:
+                        yield first
+                    while True:
+                        yield await asyncio.wait_for(rest.__anext__(), settings.GEMINI_ATTEMPT_TIMEOUT_MS / 1000)
+                except StopAsyncIteration:
+                    pass
+                except Exception as e:
+                    print(f"Gemini stream broke off: {e!r}")
+                finally:
+                    await rest.aclose()
+                return
+        
+        yield self._generate_mock_response(equipment_context, user_message)
+    
     def _build_context(self, equipment_context: Dict[str, Any]) -> str:
         """Build context prompt for Gemini"""
         context = f"""You are an expert science equipment assistant helping students learn about laboratory equipment.
@@ -72,7 +208,7 @@ Your role is to:
 5. Keep responses under 150 words
 
 Please answer the user's questions naturally and helpfully."""
-        
+
         return context
     
     def _generate_mock_response(
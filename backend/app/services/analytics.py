@@ -0,0 +1,112 @@
+from sqlalchemy import select, delete, insert, func, case, cast, Integer
+from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Iterable, Tuple
+
+from ..models.scan import ScanMetadata
+from ..models.analytics import (
+    ScanDailyEquipment, ScanDailyUser, ScanConfidenceHistogram, CONFIDENCE_BUCKETS
+)
+
+def confidence_bucket(confidence: float) -> int:
+    """Map a confidence score in [0, 1] to its histogram bucket"""
+    return min(max(int(confidence * CONFIDENCE_BUCKETS), 0), CONFIDENCE_BUCKETS - 1)
+
+def _dialect_insert(db: Session):
+    """Pick the INSERT construct that supports ON CONFLICT for the bound database"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"Rollup upserts are not supported on {dialect}")
+    return dialect_insert
+
+def _increment(db: Session, model, key_columns: Tuple[str, ...], counts: Counter):
+    """Add counts to rollup rows, creating them as needed (one multi-row upsert)"""
+    if not counts:
+        return
+    
+    table = model.__table__
+    stmt = _dialect_insert(db)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={"scan_count": table.c.scan_count + stmt.excluded.scan_count}
+    )
+    db.execute(stmt, [
+        dict(zip(key_columns, key), scan_count=count)
+        for key, count in counts.items()
+    ])
+
+def _apply_scans(db: Session, scans: Iterable[Dict[str, Any]], sign: int):
+    """Add (sign 1) or subtract (sign -1) each scan's count in every rollup table"""
+    per_equipment, per_user, histogram = Counter(), Counter(), Counter()
+    
+    for scan in scans:
+        day = (scan.get("scanned_at") or datetime.utcnow()).date()
+        equipment_id = str(scan["equipment_id"])
+        per_equipment[(day, equipment_id)] += sign
+        per_user[(str(scan["user_id"]), day)] += sign
+        histogram[(day, equipment_id, confidence_bucket(scan["confidence_score"]))] += sign
+    
+    _increment(db, ScanDailyEquipment, ("day", "equipment_id"), per_equipment)
+    _increment(db, ScanDailyUser, ("user_id", "day"), per_user)
+    _increment(db, ScanConfidenceHistogram, ("day", "equipment_id", "bucket"), histogram)
+
+def record_scans(db: Session, scans: Iterable[Dict[str, Any]]):
+    """Fold newly inserted scan rows into the rollup tables
+    
+    Runs inside the caller's transaction so rollups commit (or roll back)
+    together with the scan rows themselves.
+    """
+    _apply_scans(db, scans, 1)
+
+def unrecord_scans(db: Session, scans: Iterable[Dict[str, Any]]):
+    """Take deleted scan rows back out of the rollup tables (in the deleting transaction)"""
+    _apply_scans(db, scans, -1)
+
+def rebuild_rollups(db: Session) -> Dict[str, int]:
+    """Recompute the rollup tables from scan_metadata (full scan, run offline)
+    
+    Only days that still have scans in scan_metadata are replaced. Days of
+    months moved to the Parquet archive keep their rollup rows, which were
+    complete when the month was archived.
+    """
+    day = func.date(ScanMetadata.scanned_at)
+    
+    # Postgres rounds on CAST(float AS int); SQLite truncates, which is floor for scores >= 0
+    scaled = ScanMetadata.confidence_score * CONFIDENCE_BUCKETS
+    if db.get_bind().dialect.name == "postgresql":
+        scaled = func.floor(scaled)
+    bucket = case(
+        (ScanMetadata.confidence_score >= 1.0, CONFIDENCE_BUCKETS - 1),
+        else_=cast(scaled, Integer)
+    )
+    
+    live_days = select(day).distinct()
+    for model in (ScanDailyEquipment, ScanDailyUser, ScanConfidenceHistogram):
+        db.execute(delete(model).where(model.day.in_(live_days)))
+    
+    db.execute(insert(ScanDailyEquipment).from_select(
+        ["day", "equipment_id", "scan_count"],
+        select(day, ScanMetadata.equipment_id, func.count())
+        .group_by(day, ScanMetadata.equipment_id)
+    ))
+    db.execute(insert(ScanDailyUser).from_select(
+        ["user_id", "day", "scan_count"],
+        select(ScanMetadata.user_id, day, func.count())
+        .group_by(ScanMetadata.user_id, day)
+    ))
+    db.execute(insert(ScanConfidenceHistogram).from_select(
+        ["day", "equipment_id", "bucket", "scan_count"],
+        select(day, ScanMetadata.equipment_id, bucket, func.count())
+        .group_by(day, ScanMetadata.equipment_id, bucket)
+    ))
+    db.commit()
+    
+    return {
+        model.__tablename__: db.query(func.count()).select_from(model).scalar()
+        for model in (ScanDailyEquipment, ScanDailyUser, ScanConfidenceHistogram)
+    }
@@ -0,0 +1,115 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+from PIL import Image, ImageOps
+
+from ..core.config import settings
+
+# URLs embed the content hash, so a given URL always serves the same bytes
+ASSET_URL_PREFIX = "/api/assets"
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ASSET_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+ASSET_NAME_PATTERN = re.compile(r"^(original\.(jpg|png|webp|gif)|[0-9]+\.webp)$")
+
+# Source formats accepted at ingest -> extension of the stored original
+SOURCE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+class AssetError(ValueError):
+    """Raised for uploads that are not a supported, decodable image"""
+
+def image_sizes() -> List[int]:
+    """Thumbnail sizes (longest side in pixels) generated at ingest, smallest first"""
+    return sorted({int(size) for size in settings.ASSET_IMAGE_SIZES.split(",") if size.strip()})
+
+def asset_dir(key: str) -> Path:
+    """Directory holding the original and thumbnails of one image (sharded by hash prefix)"""
+    return Path(settings.ASSET_DIR) / key[:2] / key
+
+def asset_path(key: str, name: str) -> Optional[Path]:
+    """Path of a stored file, or None for names that cannot be an asset"""
+    if not ASSET_KEY_PATTERN.match(key) or not ASSET_NAME_PATTERN.match(name):
+        return None
+    return asset_dir(key) / name
+
+def asset_url(key: str, name: str) -> str:
+    return f"{ASSET_URL_PREFIX}/{key}/{name}"
+
+def variant_name(size: int) -> str:
+    return f"{size}.webp"
+
+def choose_size(width: Optional[int] = None) -> int:
+    """Smallest thumbnail at least `width` pixels wide (the largest if none is)"""
+    sizes = image_sizes()
+    if not width:
+        width = settings.ASSET_DEFAULT_IMAGE_SIZE
+    return next((size for size in sizes if size >= width), sizes[-1])
+
+def image_variants(key: str) -> Dict[str, str]:
+    """URL of every thumbnail of an image, keyed by size"""
+    return {str(size): asset_url(key, variant_name(size)) for size in image_sizes()}
+
+def equipment_image_url(equipment, width: Optional[int] = None) -> Optional[str]:
+    """Thumbnail URL for a device `width` when the image is stored locally, else `image_url`"""
+    if equipment.image_key:
+        return asset_url(equipment.image_key, variant_name(choose_size(width)))
+    return equipment.image_url
+
+def _write_atomic(path: Path, data: bytes):
+    """Write through a temp file so readers never see a partial asset"""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def _thumbnail(image: Image.Image, size: int) -> bytes:
+    """Encode a WebP no wider or taller than `size` (never upscaled)"""
+    thumb = image.copy()
+    thumb.thumbnail((size, size), Image.LANCZOS)
+    out = io.BytesIO()
+    thumb.save(out, "WEBP", quality=settings.ASSET_WEBP_QUALITY, method=4)
+    return out.getvalue()
+
+def ingest_image(data: bytes) -> str:
+    """Store an image under its SHA-256 and pre-generate WebP thumbnails; returns the key
+    
+    Ingesting the same bytes again is a no-op, so re-uploads and duplicates
+    across equipment share one copy on disk.
+    """
+    key = hashlib.sha256(data).hexdigest()
+    
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = image.format
+        image.load()
+    except Image.DecompressionBombError:
+        raise AssetError("Image has too many pixels")
+    except OSError:
+        raise AssetError("File is not a readable image")
+    if source_format not in SOURCE_EXTENSIONS:
+        raise AssetError(f"Unsupported image format {source_format} (expected JPEG, PNG, WebP or GIF)")
+    
+    directory = asset_dir(key)
+    directory.mkdir(parents=True, exist_ok=True)
+    
+    # Thumbnails follow the EXIF orientation; the original is kept byte for byte
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    for size in image_sizes():
+        path = directory / variant_name(size)
+        if not path.exists():
+            _write_atomic(path, _thumbnail(image, size))
+    
+    original = directory / f"original.{SOURCE_EXTENSIONS[source_format]}"
+    if not original.exists():
+        _write_atomic(original, data)
+    return key
@@ -0,0 +1,47 @@
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional, Tuple, List, Callable, Dict, Iterable
+
+from ..models.equipment import Equipment, EquipmentTombstone
+
+def get_catalog_version(db: Session) -> Tuple[str, Optional[datetime]]:
+    """Return a version token and last-modified time covering every catalog row"""
+    # One round trip; MAX() on the indexed timestamps is an index lookup
+    stmt = select(
+        select(func.count(Equipment.equipment_id)).scalar_subquery(),
+        select(func.max(Equipment.updated_at)).scalar_subquery(),
+        select(func.count(EquipmentTombstone.equipment_id)).scalar_subquery(),
+        select(func.max(EquipmentTombstone.deleted_at)).scalar_subquery()
+    )
+    live_count, last_updated, deleted_count, last_deleted = db.execute(stmt).one()
+    
+    timestamps = [ts for ts in (last_updated, last_deleted) if ts is not None]
+    last_modified = max(timestamps) if timestamps else None
+    
+    version = f"{live_count}:{last_updated}:{deleted_count}:{last_deleted}"
+    return version, last_modified
+
+def equipment_by_id(db: Session, equipment_ids: Iterable[str]) -> Dict[str, Equipment]:
+    """Load the given equipment rows in one query, keyed by id (unknown ids are left out)"""
+    ids = list(dict.fromkeys(str(equipment_id) for equipment_id in equipment_ids))
+    if not ids:
+        return {}
+    return {
+        equipment.equipment_id: equipment
+        for equipment in db.query(Equipment).filter(Equipment.equipment_id.in_(ids))
+    }
+
+# In-process caches derived from the catalog register here to be dropped on writes
+_catalog_listeners: List[Callable[[Optional[Iterable[str]]], None]] = []
+
+def on_catalog_change(listener: Callable[[Optional[Iterable[str]]], None]):
+    """Register a callback run after catalog writes (receives changed ids, or None for all)"""
+    _catalog_listeners.append(listener)
+    return listener
+
+def notify_catalog_changed(equipment_ids: Optional[Iterable[str]] = None):
+    """Tell in-process catalog caches that equipment rows changed"""
+    ids = list(equipment_ids) if equipment_ids is not None else None
+    for listener in _catalog_listeners:
+        listener(ids)
@@ -0,0 +1,342 @@
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from dataclasses import dataclass
+from datetime import datetime
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import bisect
+import threading
+import time
+
+import numpy as np
+
+from ..core.metrics import metrics
+from ..models.equipment import Equipment, EquipmentTombstone
+from .catalog import on_catalog_change
+
+facet_index_items = metrics.gauge("catalog_facet_index_items", "Equipment rows in the in-memory facet index")
+facet_index_refreshes = metrics.counter("catalog_facet_index_refreshes_total", "Facet index updates by kind (full or incremental)")
+facet_index_refresh_seconds = metrics.histogram("catalog_facet_index_refresh_seconds", "Time to bring the facet index up to date")
+
+# Columns the index needs; descriptions and translations are never loaded
+_INDEX_COLUMNS = (Equipment.equipment_id, Equipment.category, Equipment.tags, Equipment.name_en, Equipment.updated_at)
+
+# Counting one result row costs about as much as ANDing and popcounting this
+# many bits, so small result sets are counted row by row instead of per value
+SPARSE_COUNT_BITS = 16384
+
+@dataclass
+class FacetResult:
+    total: int
+    equipment_ids: List[str]
+    categories: List[Tuple[str, int]]
+    tags: List[Tuple[str, int]]
+
+def _bits_to_mask(bits: int, size: int) -> np.ndarray:
+    """Bitset (a Python int, bit i = slot i) as a boolean array of `size` slots"""
+    raw = np.frombuffer(bits.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, count=size, bitorder="little").view(bool)
+
+def _mask_to_bits(mask: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+def _clean_tags(tags) -> Tuple[str, ...]:
+    # JSONEncodedList hands back whatever JSON the column held
+    if not isinstance(tags, list):
+        return ()
+    return tuple(sorted({str(tag) for tag in tags if tag is not None and str(tag) != ""}))
+
+class FacetIndex:
+    """Inverted index of the catalog's categories and tags for faceted browsing
+    
+    Each equipment row gets a slot number, and each category and tag maps to
+    a bitset of slots (a Python int). Filters are ANDs and ORs of bitsets and
+    facet counts are popcounts, so a query touches a few kilobytes however
+    large the catalog is. Rows are reloaded individually when this process
+    changes them (`on_catalog_change`) and by `updated_at` when another worker
+    has, using the catalog version callers already compute for ETags.
+    """
+    
+    def __init__(self):
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        # slot -> (category, tags, sort key) of the row it holds
+        self._docs: List[Optional[Tuple[str, Tuple[str, ...], Tuple[str, str]]]] = []
+        self._free: List[int] = []
+        self._live = 0
+        self._categories: Dict[str, int] = {}
+        self._tags: Dict[str, int] = {}
+        # (sort key, slot) of live rows kept in name order; _order is its slot column
+        self._sorted: List[Tuple[Tuple[str, str], int]] = []
+        self._order: Optional[np.ndarray] = None
+        # Facet counts over the whole catalog, the answer for unfiltered queries
+        self._totals: Optional[Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]] = None
+        
+        self._version: Optional[str] = None
+        self._updated_watermark: Optional[datetime] = None
+        self._deleted_watermark: Optional[datetime] = None
+        self._dirty: Set[str] = set()
+        self._stale = True
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def invalidate(self, equipment_ids: Optional[Iterable[str]] = None):
+        """Reload the given equipment on the next query (or everything, for bulk loads)"""
+        with self._lock:
+            if equipment_ids is None:
+                self._stale = True
+            else:
+                self._dirty.update(str(equipment_id) for equipment_id in equipment_ids)
+    
+    def sync(self, db: Session, version: str):
+        """Bring the index up to date with the catalog `version` (from get_catalog_version)"""
+        if version == self._version and not self._dirty and not self._stale:
+            return
+        with self._sync_lock:
+            if version == self._version and not self._dirty and not self._stale:
+                return
+            started = time.perf_counter()
+            if self._stale or self._version is None:
+                self._rebuild(db)
+                kind = "full"
+            elif self._refresh(db):
+                kind = "incremental"
+            else:
+                # Row count disagrees with the database (e.g. a tombstone was purged)
+                self._rebuild(db)
+                kind = "full"
+            self._version = version
+            facet_index_refreshes.inc(labels={"kind": kind})
+            facet_index_refresh_seconds.observe(time.perf_counter() - started)
+            facet_index_items.set(len(self._slots))
+    
+    def _rebuild(self, db: Session):
+        with self._lock:
+            self._stale = False
+            self._dirty.clear()
+        rows = db.query(*_INDEX_COLUMNS).all()
+        last_deleted = db.query(func.max(EquipmentTombstone.deleted_at)).scalar()
+        self.load((row.equipment_id, row.category, row.tags, row.name_en) for row in rows)
+        self._updated_watermark = max((row.updated_at for row in rows if row.updated_at), default=None)
+        self._deleted_watermark = last_deleted
+    
+    def _refresh(self, db: Session) -> bool:
+        """Apply rows changed since the last sync; False when a full rebuild is needed"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        
+        # `>=` because rows written in the same instant as the watermark may not have been seen yet
+        changed = []
+        if self._updated_watermark is not None:
+            changed.append(Equipment.updated_at >= self._updated_watermark)
+        else:
+            changed.append(Equipment.updated_at.isnot(None))
+        if dirty:
+            changed.append(Equipment.equipment_id.in_(sorted(dirty)))
+        rows = db.query(*_INDEX_COLUMNS).filter(or_(*changed)).all()
+        
+        deleted = db.query(EquipmentTombstone.equipment_id, EquipmentTombstone.deleted_at)
+        if self._deleted_watermark is not None:
+            deleted = deleted.filter(EquipmentTombstone.deleted_at >= self._deleted_watermark)
+        deleted = deleted.all()
+        
+        present = {row.equipment_id for row in rows}
+        for row in rows:
+            self.put(row.equipment_id, row.category, row.tags, row.name_en)
+            if row.updated_at and (self._updated_watermark is None or row.updated_at > self._updated_watermark):
+                self._updated_watermark = row.updated_at
+        # Dirty ids that came back without a row were deleted
+        for equipment_id in (dirty - present) | {row.equipment_id for row in deleted if row.equipment_id not in present}:
+            self.remove(equipment_id)
+        for row in deleted:
+            if self._deleted_watermark is None or row.deleted_at > self._deleted_watermark:
+                self._deleted_watermark = row.deleted_at
+        
+        return db.query(func.count(Equipment.equipment_id)).scalar() == len(self._slots)
+    
+    def load(self, rows: Iterable[Tuple[str, str, Optional[Sequence[str]], str]]):
+        """Replace the whole index with (equipment_id, category, tags, name) rows"""
+        ids, docs = [], []
+        category_slots: Dict[str, List[int]] = {}
+        tag_slots: Dict[str, List[int]] = {}
+        for slot, (equipment_id, category, tags, name) in enumerate(rows):
+            tags = _clean_tags(tags)
+            ids.append(str(equipment_id))
+            docs.append((category, tags, ((name or "").casefold(), str(equipment_id))))
+            category_slots.setdefault(category, []).append(slot)
+            for tag in tags:
+                tag_slots.setdefault(tag, []).append(slot)
+        
+        # One packbits per key instead of an int copy per row
+        def bitset(slots: List[int]) -> int:
+            mask = np.zeros(len(ids), dtype=bool)
+            mask[slots] = True
+            return _mask_to_bits(mask)
+        
+        categories = {category: bitset(slots) for category, slots in category_slots.items()}
+        tags = {tag: bitset(slots) for tag, slots in tag_slots.items()}
+        with self._lock:
+            self._ids = ids
+            self._docs = docs
+            self._slots = {equipment_id: slot for slot, equipment_id in enumerate(ids)}
+            self._free = []
+            self._live = (1 << len(ids)) - 1
+            self._categories = categories
+            self._tags = tags
+            self._sorted = sorted((doc[2], slot) for slot, doc in enumerate(docs))
+            self._changed()
+    
+    def put(self, equipment_id: str, category: str, tags: Optional[Sequence[str]], name: str):
+        """Add or update one row"""
+        equipment_id = str(equipment_id)
+        doc = (category, _clean_tags(tags), ((name or "").casefold(), equipment_id))
+        with self._lock:
+            slot = self._slots.get(equipment_id)
+            if slot is not None:
+                if self._docs[slot] == doc:
+                    return
+                self._clear(slot)
+                self._unsort(slot)
+            elif self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._ids)
+                self._ids.append(None)
+                self._docs.append(None)
+            
+            bit = 1 << slot
+            self._ids[slot] = equipment_id
+            self._docs[slot] = doc
+            self._slots[equipment_id] = slot
+            self._live |= bit
+            self._categories[category] = self._categories.get(category, 0) | bit
+            for tag in doc[1]:
+                self._tags[tag] = self._tags.get(tag, 0) | bit
+            bisect.insort(self._sorted, (doc[2], slot))
+            self._changed()
+    
+    def remove(self, equipment_id: str):
+        with self._lock:
+            slot = self._slots.pop(str(equipment_id), None)
+            if slot is None:
+                return
+            self._clear(slot)
+            self._unsort(slot)
+            self._ids[slot] = None
+            self._docs[slot] = None
+            self._free.append(slot)
+            self._changed()
+    
+    def _unsort(self, slot: int):
+        position = bisect.bisect_left(self._sorted, (self._docs[slot][2], slot))
+        del self._sorted[position]
+    
+    def _changed(self):
+        self._order = None
+        self._totals = None
+    
+    def _clear(self, slot: int):
+        """Unset a slot's bits (caller holds the lock); empty facets are dropped"""
+        category, tags, _ = self._docs[slot]
+        keep = ~(1 << slot)
+        self._live &= keep
+        for facets, key in [(self._categories, category)] + [(self._tags, tag) for tag in tags]:
+            bits = facets[key] & keep
+            if bits:
+                facets[key] = bits
+            else:
+                del facets[key]
+    
+    def categories(self) -> List[str]:
+        return sorted(self._categories)
+    
+    def browse(
+        self,
+        categories: Sequence[str] = (),
+        tags: Sequence[str] = (),
+        match_all: bool = True,
+        offset: int = 0,
+        limit: int = 50,
+        facet_limit: int = 50
+    ) -> FacetResult:
+        """Filter by categories (any of) and tags (all or any of), with facet counts
+        
+        Category counts ignore the category filter, so they show what picking
+        another category would return; tag counts are within the results.
+        """
+        with self._lock:
+            live = self._live
+            if tags:
+                tag_bits = [self._tags.get(tag, 0) for tag in tags]
+                tagged = live
+                if match_all:
+                    for bits in tag_bits:
+                        tagged &= bits
+                else:
+                    tagged = 0
+                    for bits in tag_bits:
+                        tagged |= bits
+            else:
+                tagged = live
+            
+            if categories:
+                in_category = 0
+                for category in categories:
+                    in_category |= self._categories.get(category, 0)
+                result = tagged & in_category
+            else:
+                result = tagged
+            
+            if self._totals is None:
+                self._totals = (self._bitset_counts(self._categories, live), self._bitset_counts(self._tags, live))
+            total = result.bit_count()
+            category_counts = self._totals[0] if tagged == live else self._counts(0, tagged, None)
+            tag_counts = self._totals[1] if result == live else self._counts(1, result, total)
+            page = self._page(result, offset, limit) if total > offset else []
+        
+        return FacetResult(
+            total=total,
+            equipment_ids=page,
+            categories=category_counts[:facet_limit],
+            tags=tag_counts[:facet_limit]
+        )
+    
+    def _counts(self, field: int, within: int, size: Optional[int]) -> List[Tuple[str, int]]:
+        """Counts per category (field 0) or tag (field 1) among the rows in `within`"""
+        facets = self._categories if field == 0 else self._tags
+        if size is None:
+            size = within.bit_count()
+        if size * SPARSE_COUNT_BITS > len(facets) * len(self._ids):
+            return self._bitset_counts(facets, within)
+        
+        counts = Counter()
+        for slot in np.flatnonzero(_bits_to_mask(within, len(self._ids))).tolist():
+            if field == 0:
+                counts[self._docs[slot][0]] += 1
+            else:
+                counts.update(self._docs[slot][1])
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    
+    @staticmethod
+    def _bitset_counts(facets: Dict[str, int], within: int) -> List[Tuple[str, int]]:
+        counts = [(key, (bits & within).bit_count()) for key, bits in facets.items()]
+        counts = [(key, count) for key, count in counts if count]
+        counts.sort(key=lambda item: (-item[1], item[0]))
+        return counts
+    
+    def _page(self, result: int, offset: int, limit: int) -> List[str]:
+        """Equipment ids of one page of results in name order (caller holds the lock)"""
+        if self._order is None:
+            self._order = np.fromiter((slot for _, slot in self._sorted), dtype=np.int64, count=len(self._sorted))
+        if result == self._live:
+            slots = self._order[offset:offset + limit]
+        else:
+            mask = _bits_to_mask(result, len(self._ids))
+            slots = self._order[mask[self._order]][offset:offset + limit]
+        return [self._ids[slot] for slot in slots.tolist()]
+
+facet_index = FacetIndex()
+on_catalog_change(facet_index.invalidate)
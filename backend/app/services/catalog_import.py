@@ -0,0 +1,156 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Tuple
+import asyncio
+import codecs
+import csv
+import io
+import json
+
+from ..core.database import SessionLocal, mark_written, STICKY_GLOBAL
+from .catalog import notify_catalog_changed
+from .catalog_loader import CatalogFormatError, csv_item, to_row, upsert_rows
+
+# A single record longer than this aborts the import instead of growing the buffer
+MAX_RECORD_CHARS = 1_000_000
+
+IMPORT_CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-seq": "ndjson",
+    "text/csv": "csv",
+}
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Decode a byte stream incrementally and yield (line number, line) pairs"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    number = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            number += 1
+            yield number, line + "\n"
+        if len(pending) > MAX_RECORD_CHARS:
+            raise CatalogFormatError(f"Line {number + 1} is longer than {MAX_RECORD_CHARS} characters")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield number + 1, pending
+
+async def _ndjson_items(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, item) for each NDJSON line; bad JSON yields the error instead"""
+    async for number, line in _lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, CatalogFormatError(f"Invalid JSON: {e.msg}")
+
+async def _csv_items(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, item) for each CSV record, keeping quoted newlines inside a record"""
+    header = None
+    record, start = "", 0
+    async for number, line in _lines(chunks):
+        if not record:
+            start = number
+        record += line
+        # Quotes are escaped by doubling, so an odd count means a quoted field continues
+        if record.count('"') % 2:
+            if len(record) > MAX_RECORD_CHARS:
+                raise CatalogFormatError(f"Record at line {start} is longer than {MAX_RECORD_CHARS} characters")
+            continue
+        
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader(io.StringIO(text, newline="")))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, CatalogFormatError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield start, csv_item(dict(zip(header, values)))
+    
+    if record.strip():
+        yield start, CatalogFormatError("Unterminated quoted field")
+
+def _write_chunk(rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Upsert one chunk in its own transaction (runs in a worker thread)"""
+    db = SessionLocal()
+    try:
+        counts = upsert_rows(db, rows)
+        db.commit()
+        return counts
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _progress(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+async def import_catalog(chunks: AsyncIterator[bytes], fmt: str, chunk_size: int = 500) -> AsyncIterator[bytes]:
+    """Validate and upsert a streamed catalog, yielding one NDJSON progress line per chunk
+    
+    Only the current chunk is held in memory. Each chunk commits on its own,
+    so rows from earlier chunks stay imported if a later one fails; the
+    final line reports the totals. Catalog caches are invalidated once, after
+    the last chunk.
+    """
+    items = _csv_items(chunks) if fmt == "csv" else _ndjson_items(chunks)
+    totals = {"rows": 0, "inserted": 0, "updated": 0, "failed": 0}
+    chunk_number = 0
+    now = datetime.utcnow()
+    rows: List[Dict[str, Any]] = []
+    row_lines: List[int] = []
+    errors: List[Dict[str, Any]] = []
+    
+    async def flush() -> bytes:
+        nonlocal chunk_number, rows, row_lines, errors
+        chunk_number += 1
+        report = {"chunk": chunk_number, "rows": len(rows) + len(errors), "inserted": 0, "updated": 0}
+        if rows:
+            try:
+                report["inserted"], report["updated"] = await asyncio.to_thread(_write_chunk, rows)
+            except Exception as e:
+                report["error"] = f"Chunk not saved: {e}"
+                errors.extend({"line": line, "error": "chunk not saved"} for line in row_lines)
+        report["failed"] = len(errors)
+        report["errors"] = errors
+        
+        totals["rows"] += report["rows"]
+        totals["inserted"] += report["inserted"]
+        totals["updated"] += report["updated"]
+        totals["failed"] += report["failed"]
+        rows, row_lines, errors = [], [], []
+        return _progress(report)
+    
+    aborted = None
+    try:
+        async for line, item in items:
+            if isinstance(item, CatalogFormatError):
+                errors.append({"line": line, "error": str(item)})
+            else:
+                try:
+                    rows.append(to_row(item, now))
+                    row_lines.append(line)
+                except CatalogFormatError as e:
+                    errors.append({"line": line, "error": str(e)})
+            if len(rows) + len(errors) >= chunk_size:
+                yield await flush()
+        if rows or errors:
+            yield await flush()
+    except CatalogFormatError as e:
+        aborted = str(e)
+    finally:
+        if totals["inserted"] or totals["updated"]:
+            mark_written(STICKY_GLOBAL)
+            notify_catalog_changed()
+    
+    summary = {"done": aborted is None, **totals}
+    if aborted:
+        summary["error"] = aborted
+    yield _progress(summary)
@@ -0,0 +1,198 @@
+from pydantic import ValidationError
+from sqlalchemy import insert, text, func
+from sqlalchemy.orm import Session
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, TextIO, Tuple
+import csv
+import io
+import json
+import uuid
+
+from ..models.equipment import Equipment
+from ..schemas.equipment import EquipmentCreate
+from .catalog import notify_catalog_changed
+
+CATALOG_FORMATS = ("json", "csv", "ndjson")
+EQUIPMENT_COLUMNS = tuple(column.name for column in Equipment.__table__.columns)
+# Columns an upsert overwrites; the id, creation time and uploaded image of existing rows are kept
+UPDATE_COLUMNS = tuple(
+    c for c in EQUIPMENT_COLUMNS if c not in ("equipment_id", "class_name", "created_at", "image_key")
+)
+
+class CatalogFormatError(ValueError):
+    """Raised for unreadable catalog files or items that fail validation"""
+
+def catalog_format(path: str) -> str:
+    """Infer the catalog format from a file name"""
+    suffix = Path(path).suffix.lower().lstrip(".")
+    if suffix == "jsonl":
+        return "ndjson"
+    if suffix not in CATALOG_FORMATS:
+        raise CatalogFormatError(f"Unsupported catalog file '{path}' (expected .json, .csv or .ndjson)")
+    return suffix
+
+def parse_catalog(stream: TextIO, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Yield raw catalog items from a text stream
+    
+    JSON is a list (or an object with an "items" list) and is read whole;
+    CSV and NDJSON are read one line at a time. CSV tags are JSON lists or
+    "|"-separated values.
+    """
+    if fmt == "json":
+        data = json.load(stream)
+        yield from data["items"] if isinstance(data, dict) else data
+    elif fmt == "ndjson":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield csv_item(row)
+    else:
+        raise CatalogFormatError(f"Unsupported catalog format '{fmt}'")
+
+def csv_item(row: Dict[str, str]) -> Dict[str, Any]:
+    """Turn a CSV record into a raw item (empty cells dropped, tags split)"""
+    item = {key: value for key, value in row.items() if key and value not in (None, "")}
+    tags = item.get("tags")
+    if tags:
+        item["tags"] = json.loads(tags) if tags.startswith("[") else [tag.strip() for tag in tags.split("|")]
+    return item
+
+def read_catalog(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield raw catalog items from a JSON, CSV or NDJSON file"""
+    with open(path, encoding="utf-8", newline="") as stream:
+        yield from parse_catalog(stream, catalog_format(path))
+
+def validation_message(error: ValidationError) -> str:
+    """One-line summary of a pydantic validation error"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'item'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+def to_row(item: Any, now: datetime) -> Dict[str, Any]:
+    """Validate one raw item and turn it into a complete equipment row"""
+    try:
+        row = EquipmentCreate.model_validate(item).model_dump()
+    except ValidationError as e:
+        raise CatalogFormatError(validation_message(e))
+    row["equipment_id"] = str(item.get("equipment_id") or uuid.uuid4())
+    row["created_at"] = row["updated_at"] = now
+    return row
+
+def to_rows(items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Validate raw items and turn them into complete equipment rows"""
+    now = datetime.utcnow()
+    for number, item in enumerate(items, start=1):
+        try:
+            yield to_row(item, now)
+        except CatalogFormatError as e:
+            raise CatalogFormatError(f"Catalog item {number}: {e}")
+
+def _copy_value(value) -> str:
+    """Encode one value for COPY ... FROM STDIN (text format)"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, list):
+        value = json.dumps(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def _copy_batch(db: Session, rows: List[Dict[str, Any]], on_conflict: str = "DO NOTHING") -> int:
+    """Stream a batch into a temp table with COPY, then merge it into equipment (PostgreSQL)"""
+    columns = ", ".join(EQUIPMENT_COLUMNS)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(row.get(column)) for column in EQUIPMENT_COLUMNS) + "\n")
+    buffer.seek(0)
+    
+    db.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS equipment_load "
+        "(LIKE equipment INCLUDING DEFAULTS) ON COMMIT DROP"
+    ))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY equipment_load ({columns}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+    
+    inserted = db.execute(text(
+        f"INSERT INTO equipment ({columns}) SELECT {columns} FROM equipment_load "
+        f"ON CONFLICT (class_name) {on_conflict}"
+    )).rowcount
+    db.execute(text("TRUNCATE equipment_load"))
+    return inserted
+
+def _insert_batch(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """Insert a batch with one executemany, skipping class names that already exist"""
+    bind_dialect = db.get_bind().dialect
+    dialect = bind_dialect.name
+    if dialect == "postgresql":
+        if bind_dialect.driver == "psycopg2":
+            return _copy_batch(db, rows)
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return db.connection().execute(insert(Equipment.__table__), rows).rowcount
+    
+    # Core executemany on the connection; the ORM bulk path would not report rowcount
+    stmt = dialect_insert(Equipment.__table__).on_conflict_do_nothing(index_elements=["class_name"])
+    return db.connection().execute(stmt, rows).rowcount
+
+def upsert_rows(db: Session, rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Insert or update a batch by class_name in one statement; returns (inserted, updated)"""
+    # Last occurrence wins: one ON CONFLICT DO UPDATE statement cannot touch a row twice
+    rows = list({row["class_name"]: row for row in rows}.values())
+    existing = db.query(func.count(Equipment.equipment_id)).filter(
+        Equipment.class_name.in_([row["class_name"] for row in rows])
+    ).scalar()
+    
+    bind_dialect = db.get_bind().dialect
+    if bind_dialect.name == "postgresql" and bind_dialect.driver == "psycopg2":
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in UPDATE_COLUMNS)
+        _copy_batch(db, rows, on_conflict=f"DO UPDATE SET {updates}")
+        return len(rows) - existing, existing
+    
+    if bind_dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif bind_dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"Catalog upserts are not supported on {bind_dialect.name}")
+    
+    stmt = dialect_insert(Equipment.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["class_name"],
+        set_={column: stmt.excluded[column] for column in UPDATE_COLUMNS}
+    )
+    db.connection().execute(stmt, rows)
+    return len(rows) - existing, existing
+
+def load_catalog(db: Session, items: Iterable[Dict[str, Any]], batch_size: int = 5000) -> int:
+    """Bulk-insert catalog items in batches; existing class names are left untouched
+    
+    Everything loads in one transaction, and in-process catalog caches are
+    invalidated once at the end. Returns the number of new equipment rows.
+    """
+    inserted = 0
+    batch = []
+    try:
+        for row in to_rows(items):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                inserted += _insert_batch(db, batch)
+                batch = []
+        if batch:
+            inserted += _insert_batch(db, batch)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    if inserted:
+        notify_catalog_changed()
+    return inserted
@@ -0,0 +1,81 @@
+from typing import Any, Dict, Optional
+import re
+import time
+
+from google.auth import jwt
+
+from ..core.config import settings
+from .upstream import (
+    CircuitBreaker, ResilientClient, http_client, raise_for_status, retry_unless_client_error
+)
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# Audience of tokens minted by the local stub when no real client id is configured
+STUB_CLIENT_ID = "edtech-scanner-stub.apps.googleusercontent.com"
+# Used when the certs response has no max-age
+DEFAULT_CERTS_MAX_AGE = 300.0
+# An unknown key id refetches the certs at most this often (tokens can name any kid)
+MIN_REFETCH_SECONDS = 60.0
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+class GoogleTokenVerifier:
+    """Verifies Google ID tokens against Google's signing certificates
+    
+    The certificates are fetched through a resilient client and kept for as
+    long as their Cache-Control max-age allows, so sign-ins normally cost an
+    RSA signature check and no upstream call. Without a client id (and no
+    stubs) verification is off and sign-in keeps its demo behaviour.
+    """
+    
+    def __init__(self):
+        self.audience = settings.google_client_id or (STUB_CLIENT_ID if settings.UPSTREAM_STUBS_URL else "")
+        self._certs: Optional[Dict[str, str]] = None
+        self._fetched = 0.0
+        self._expires = 0.0
+        self._client = ResilientClient(
+            "google_certs",
+            self._fetch_certs,
+            deadline=settings.GOOGLE_CERTS_DEADLINE_MS / 1000,
+            max_concurrency=4,
+            retries=2,
+            backoff=0.1,
+            breaker=CircuitBreaker("google_certs", failure_threshold=5, reset_timeout=30.0),
+            retryable=retry_unless_client_error
+        )
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.audience)
+    
+    async def _fetch_certs(self):
+        response = await http_client().get(settings.google_certs_url)
+        raise_for_status(response)
+        match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+        return response.json(), float(match.group(1)) if match else DEFAULT_CERTS_MAX_AGE
+    
+    async def certs(self) -> Dict[str, str]:
+        """Current signing certificates by key id; raises UpstreamError when unavailable"""
+        if self._certs is None or time.monotonic() >= self._expires:
+            self._certs, max_age = await self._client()
+            self._fetched = time.monotonic()
+            self._expires = self._fetched + max_age
+        return self._certs
+    
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid ID token; ValueError when the token is not valid"""
+        certs = await self.certs()
+        try:
+            claims = jwt.decode(token, certs=certs, audience=self.audience, clock_skew_in_seconds=10)
+        except ValueError as e:
+            if "Certificate for key id" not in str(e) or time.monotonic() - self._fetched < MIN_REFETCH_SECONDS:
+                raise
+            # Google rotated its keys before our copy expired
+            self._certs = None
+            claims = jwt.decode(token, certs=await self.certs(), audience=self.audience, clock_skew_in_seconds=10)
+        
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+        return claims
+
+google_verifier = GoogleTokenVerifier()
@@ -0,0 +1,318 @@
+"""
+Offline model evaluation over a labelled image tree (ROOT/<class_name>/*.jpg)
+
+Images are decoded, preprocessed and classified by TFLiteModel exactly as
+in /scan/analyze, in a pool of worker processes that each build their own
+interpreters. The report covers top-1/top-3 accuracy, a confusion matrix,
+confidence calibration, per-stage latency and throughput, as JSON, so
+runs of two models or preprocessing versions can be compared.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import hashlib
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from .tflite_inference import TFLiteModel
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"}
+CALIBRATION_BINS = 10
+LATENCY_STAGES = ("decode", "preprocess", "inference", "total")
+# Failed images listed in the report (all are counted)
+MAX_ERROR_SAMPLES = 50
+
+_model: Optional[TFLiteModel] = None
+
+def labelled_images(root: str) -> Iterator[Tuple[str, str]]:
+    """(path, class name) for every image under ROOT/<class_name>/, in a stable order"""
+    for class_dir in sorted(Path(root).iterdir()):
+        if not class_dir.is_dir():
+            continue
+        for path in sorted(class_dir.iterdir()):
+            if path.is_file() and path.suffix.lower() in IMAGE_SUFFIXES:
+                yield str(path), class_dir.name
+
+def _init_worker(models_dir: Optional[str]):
+    """Build the model and its interpreters once per worker, outside the timed path"""
+    global _model
+    _model = TFLiteModel(models_dir)
+    _model.load_interpreters()
+
+def _evaluate_batch(batch: Sequence[Tuple[str, str]]) -> List[Any]:
+    """Classify a batch of images
+    
+    Each outcome is (path, true label, top-3 labels, top-3 confidences,
+    cascade stage, decode/preprocess/inference seconds); failures come back
+    as (path, error) pairs.
+    """
+    outcomes = []
+    for path, label in batch:
+        try:
+            started = time.perf_counter()
+            with Image.open(path) as image:
+                image.load()
+                decoded = time.perf_counter()
+                pixels = _model.preprocess_image(image)
+            preprocessed = time.perf_counter()
+            result = _model.predict_array(pixels)
+            finished = time.perf_counter()
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            outcomes.append((path, f"{type(e).__name__}: {e}"))
+            continue
+        top_3 = result["top_3_predictions"]
+        outcomes.append((
+            path, label,
+            [prediction["class_name"] for prediction in top_3],
+            # The raw score: the response's `confidence` is inflated for mock predictions
+            [prediction["confidence"] for prediction in top_3],
+            result["stage"],
+            decoded - started, preprocessed - decoded, finished - preprocessed
+        ))
+    return outcomes
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+def _rate(numerator: int, denominator: int) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+class EvaluationReport:
+    """Accumulates per-image outcomes into the evaluation summary"""
+    
+    def __init__(self):
+        self.images = 0
+        self.top1 = 0
+        self.top3 = 0
+        self.confusion: Dict[str, Counter] = defaultdict(Counter)
+        self.class_top3 = Counter()
+        self.bin_images = np.zeros(CALIBRATION_BINS, dtype=np.int64)
+        self.bin_correct = np.zeros(CALIBRATION_BINS, dtype=np.int64)
+        self.bin_confidence = np.zeros(CALIBRATION_BINS)
+        self.latencies: Dict[str, List[float]] = {stage: [] for stage in LATENCY_STAGES}
+        self.stages = Counter()
+        self.errors: List[Dict[str, str]] = []
+        self.error_count = 0
+    
+    def add(self, outcomes: Iterable[Any]):
+        for outcome in outcomes:
+            if len(outcome) == 2:
+                self.error_count += 1
+                if len(self.errors) < MAX_ERROR_SAMPLES:
+                    self.errors.append({"path": outcome[0], "error": outcome[1]})
+                continue
+            
+            path, label, top_labels, top_confidences, stage, decode, preprocess, inference = outcome
+            correct = top_labels[0] == label
+            self.images += 1
+            self.top1 += correct
+            if label in top_labels:
+                self.top3 += 1
+                self.class_top3[label] += 1
+            self.confusion[label][top_labels[0]] += 1
+            
+            confidence = top_confidences[0]
+            index = min(int(confidence * CALIBRATION_BINS), CALIBRATION_BINS - 1)
+            self.bin_images[index] += 1
+            self.bin_correct[index] += correct
+            self.bin_confidence[index] += confidence
+            
+            self.stages[stage] += 1
+            for name, seconds in zip(LATENCY_STAGES, (decode, preprocess, inference, decode + preprocess + inference)):
+                self.latencies[name].append(seconds)
+    
+    def calibration(self) -> Dict[str, Any]:
+        """Reliability bins of top-1 confidence and the expected calibration error"""
+        bins, ece = [], 0.0
+        for i in range(CALIBRATION_BINS):
+            count = int(self.bin_images[i])
+            accuracy = self.bin_correct[i] / count if count else 0.0
+            confidence = self.bin_confidence[i] / count if count else 0.0
+            ece += count / max(self.images, 1) * abs(accuracy - confidence)
+            bins.append({
+                "range": [i / CALIBRATION_BINS, (i + 1) / CALIBRATION_BINS],
+                "images": count,
+                "confidence": round(float(confidence), 4) if count else None,
+                "accuracy": round(float(accuracy), 4) if count else None
+            })
+        return {"bins": bins, "ece": round(float(ece), 4)}
+    
+    def latency_ms(self) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        for stage, samples in self.latencies.items():
+            if not samples:
+                continue
+            values = np.asarray(samples) * 1000
+            summary[stage] = {
+                "mean": round(float(values.mean()), 3),
+                "p50": round(float(np.percentile(values, 50)), 3),
+                "p95": round(float(np.percentile(values, 95)), 3),
+                "p99": round(float(np.percentile(values, 99)), 3),
+                "max": round(float(values.max()), 3)
+            }
+        return summary
+    
+    def per_class(self) -> Dict[str, Dict[str, Any]]:
+        predicted = Counter()
+        for row in self.confusion.values():
+            predicted.update(row)
+        return {
+            label: {
+                "images": sum(row.values()),
+                "top1": _rate(row[label], sum(row.values())),
+                "top3": _rate(self.class_top3[label], sum(row.values())),
+                # Recall is the class's top-1 accuracy; precision is over images predicted as it
+                "precision": _rate(row[label], predicted[label])
+            }
+            for label, row in sorted(self.confusion.items())
+        }
+    
+    def summary(self) -> Dict[str, Any]:
+        # Rows are true classes, columns predicted ones; classes never seen or predicted are left out
+        seen = sorted(set(self.confusion) | {label for row in self.confusion.values() for label in row})
+        return {
+            "accuracy": {"top1": _rate(self.top1, self.images), "top3": _rate(self.top3, self.images)},
+            "per_class": self.per_class(),
+            "confusion": {
+                "labels": seen,
+                "matrix": [[self.confusion[true][predicted] for predicted in seen] for true in seen]
+            },
+            "calibration": self.calibration(),
+            "latency_ms": self.latency_ms(),
+            "stages": dict(self.stages),
+            "errors": {"count": self.error_count, "samples": self.errors}
+        }
+
+def model_identity(model: TFLiteModel) -> Dict[str, Any]:
+    """What was evaluated: config name/version and a digest of each cascade model file"""
+    return {
+        "models_dir": str(model.models_dir),
+        "model_name": model.config.get("model_name"),
+        "model_version": model.config.get("model_version"),
+        "input_shape": model.input_shape,
+        "labels": len(model.labels),
+        "stages": {
+            stage.name: hashlib.sha256(stage.model_content).hexdigest()[:16]
+            for stage in model.stages if stage.model_content is not None
+        },
+        "mock": not model.stages
+    }
+
+def evaluate(
+    root: str,
+    models_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    batch_size: int = 16,
+    limit: Optional[int] = None,
+    progress_every: int = 0
+) -> Dict[str, Any]:
+    """Run every labelled image under `root` through the model and summarise the results
+    
+    `workers` processes (default: one per CPU; 0 runs in this process) each
+    take `batch_size` images per task. Interpreters take one image at a
+    time, so the batch size only sets how much work is handed out at once.
+    """
+    model = TFLiteModel(models_dir)
+    if not model.stages:
+        print("No TFLite model could be loaded: predictions are mocked and accuracy is meaningless")
+    report = EvaluationReport()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    images = labelled_images(root)
+    if limit:
+        images = islice(images, limit)
+    
+    def collect(outcomes):
+        before = report.images + report.error_count
+        report.add(outcomes)
+        done = report.images + report.error_count
+        if progress_every and done // progress_every > before // progress_every:
+            print(f"  {done:,} images, {time.perf_counter() - started:.1f}s")
+    
+    started_at = datetime.utcnow()
+    if workers == 0:
+        _init_worker(models_dir)
+        started = time.perf_counter()
+        for batch in _batches(images, batch_size):
+            collect(_evaluate_batch(batch))
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(models_dir,)) as pool:
+            started = time.perf_counter()
+            pending = set()
+            # A bounded number of batches in flight, so the tree is streamed rather than listed up front
+            for batch in _batches(images, batch_size):
+                pending.add(pool.submit(_evaluate_batch, batch))
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        collect(future.result())
+            for future in pending:
+                collect(future.result())
+    wall_seconds = time.perf_counter() - started
+    
+    known = set(model.labels)
+    return {
+        "model": model_identity(model),
+        "dataset": {
+            "root": str(root),
+            "images": report.images,
+            "classes": len(report.confusion),
+            # Directories that are not model labels can never be predicted correctly
+            "unknown_classes": sorted(set(report.confusion) - known)
+        },
+        "run": {
+            "started_at": started_at.isoformat(timespec="seconds") + "Z",
+            "workers": workers,
+            "batch_size": batch_size,
+            "wall_seconds": round(wall_seconds, 3),
+            "images_per_second": round(report.images / wall_seconds, 2) if wall_seconds else None
+        },
+        **report.summary()
+    }
+
+# Headline metrics compared between two reports: (path, higher is better)
+COMPARED_METRICS = [
+    (("accuracy", "top1"), True),
+    (("accuracy", "top3"), True),
+    (("calibration", "ece"), False),
+    (("run", "images_per_second"), True),
+    *((("latency_ms", stage, "p50"), False) for stage in LATENCY_STAGES),
+    (("latency_ms", "total", "p95"), False),
+]
+
+def _lookup(report: Dict[str, Any], path: Sequence[str]):
+    for key in path:
+        report = report.get(key) if isinstance(report, dict) else None
+    return report
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], top_classes: int = 5) -> List[str]:
+    """Lines describing how `current` differs from `baseline` on the headline metrics"""
+    lines = []
+    for path, higher_is_better in COMPARED_METRICS:
+        before, after = _lookup(baseline, path), _lookup(current, path)
+        if before is None or after is None:
+            continue
+        delta = after - before
+        better = delta > 0 if higher_is_better else delta < 0
+        verdict = "" if delta == 0 else (" better" if better else " worse")
+        lines.append(f"{'.'.join(path):28} {before:>10.4g} -> {after:<10.4g} ({delta:+.4g}){verdict}")
+    
+    changes = []
+    for label, after in current.get("per_class", {}).items():
+        before = baseline.get("per_class", {}).get(label)
+        if before and before.get("top1") is not None and after.get("top1") is not None:
+            changes.append((after["top1"] - before["top1"], label, before["top1"], after["top1"]))
+    changes.sort(key=lambda change: abs(change[0]), reverse=True)
+    moved = [change for change in changes[:top_classes] if change[0]]
+    if moved:
+        lines.append("Largest per-class top-1 changes:")
+        lines.extend(f"  {label:26} {before:.3f} -> {after:.3f} ({delta:+.3f})" for delta, label, before, after in moved)
+    return lines
@@ -0,0 +1,76 @@
+import struct
+import numpy as np
+from typing import Dict, Any
+
+# Content type clients use for the image part when sending a pre-resized tensor
+RAW_TENSOR_CONTENT_TYPE = "application/vnd.edtech.tensor"
+
+# Header layout (little-endian, 16 bytes):
+#   magic (4s) | header version (B) | dtype code (B) |
+#   height (H) | width (H) | channels (H) | model spec version (I)
+RAW_TENSOR_MAGIC = b"ETRT"
+RAW_TENSOR_HEADER_VERSION = 1
+RAW_TENSOR_HEADER = struct.Struct("<4sBBHHHI")
+
+DTYPE_CODES = {
+    1: np.uint8,
+}
+DTYPE_NAMES = {
+    "uint8": 1,
+}
+
+class RawTensorError(ValueError):
+    """Raised when a raw tensor payload is malformed"""
+
+class RawTensorSpecMismatch(RawTensorError):
+    """Raised when a raw tensor was built for a different model input spec"""
+
+def encode_raw_tensor(pixels: np.ndarray, spec_version: int) -> bytes:
+    """Build a raw tensor payload from an HxWxC uint8 array (client reference)"""
+    if pixels.ndim != 3 or pixels.dtype != np.uint8:
+        raise RawTensorError("Pixels must be an HxWxC uint8 array")
+    
+    height, width, channels = pixels.shape
+    header = RAW_TENSOR_HEADER.pack(
+        RAW_TENSOR_MAGIC,
+        RAW_TENSOR_HEADER_VERSION,
+        DTYPE_NAMES["uint8"],
+        height,
+        width,
+        channels,
+        spec_version
+    )
+    return header + np.ascontiguousarray(pixels).tobytes()
+
+def decode_raw_tensor(payload: bytes, spec: Dict[str, Any]) -> np.ndarray:
+    """Map a raw tensor payload to an HxWxC array without copying the pixels"""
+    if len(payload) < RAW_TENSOR_HEADER.size:
+        raise RawTensorError("Payload is shorter than the tensor header")
+    
+    magic, header_version, dtype_code, height, width, channels, spec_version = \
+        RAW_TENSOR_HEADER.unpack_from(payload)
+    
+    if magic != RAW_TENSOR_MAGIC:
+        raise RawTensorError("Payload is not a raw tensor (bad magic)")
+    
+    if header_version != RAW_TENSOR_HEADER_VERSION:
+        raise RawTensorError(f"Unsupported tensor header version {header_version}")
+    
+    dtype = DTYPE_CODES.get(dtype_code)
+    if dtype is None or np.dtype(dtype).name != spec["dtype"]:
+        raise RawTensorSpecMismatch(f"Expected dtype {spec['dtype']}")
+    
+    if spec_version != spec["spec_version"] or [height, width, channels] != spec["shape"]:
+        raise RawTensorSpecMismatch(
+            f"Tensor built for spec v{spec_version} {height}x{width}x{channels}, "
+            f"model expects spec v{spec['spec_version']} "
+            f"{'x'.join(str(dim) for dim in spec['shape'])}"
+        )
+    
+    count = height * width * channels
+    if len(payload) != RAW_TENSOR_HEADER.size + count * np.dtype(dtype).itemsize:
+        raise RawTensorError("Payload size does not match the header shape")
+    
+    # np.frombuffer returns a read-only view over the request body
+    pixels = np.frombuffer(payload, dtype=dtype, count=count, offset=RAW_TENSOR_HEADER.size)
+    return pixels.reshape(height, width, channels)
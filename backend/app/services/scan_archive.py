@@ -0,0 +1,174 @@
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+import json
+import os
+import time
+
+from ..core.config import settings
+from ..models.scan import ScanMetadata
+from .scan_partitions import month_start, add_months, is_partitioned, list_partitions, drop_partition
+
+ARCHIVE_COLUMNS = ("scan_id", "user_id", "equipment_id", "confidence_score", "device_info", "scanned_at", "synced_at")
+
+def _pyarrow():
+    """Import pyarrow lazily; it is only needed where archives are written or read"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Scan archival requires pyarrow: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+def _schema(pa):
+    return pa.schema([
+        ("scan_id", pa.string()),
+        ("user_id", pa.string()),
+        ("equipment_id", pa.string()),
+        ("confidence_score", pa.float64()),
+        ("device_info", pa.string()),
+        ("scanned_at", pa.timestamp("us")),
+        ("synced_at", pa.timestamp("us")),
+    ])
+
+def archive_root() -> Path:
+    return Path(settings.SCAN_ARCHIVE_DIR) / "scan_metadata"
+
+def month_dir(month: date) -> Path:
+    return archive_root() / f"month={month:%Y-%m}"
+
+def archive_cutoff(today: Optional[date] = None) -> date:
+    """First month that stays in the live database; everything before it is cold"""
+    today = today or datetime.utcnow().date()
+    return add_months(month_start(today), -settings.SCAN_ARCHIVE_AFTER_MONTHS)
+
+def archived_months() -> List[date]:
+    """Months with archive files, oldest first"""
+    if not archive_root().exists():
+        return []
+    months = []
+    for path in archive_root().glob("month=*"):
+        year, month = path.name[len("month="):].split("-")
+        months.append(date(int(year), int(month), 1))
+    return sorted(months)
+
+def cold_months(db: Session, cutoff: date) -> List[date]:
+    """Months before `cutoff` that still hold rows (or empty partitions) in the database"""
+    months = set()
+    
+    oldest = db.query(func.min(ScanMetadata.scanned_at)).filter(ScanMetadata.scanned_at < cutoff).scalar()
+    if oldest:
+        month = month_start(oldest.date())
+        while month < cutoff:
+            months.add(month)
+            month = add_months(month, 1)
+    
+    if is_partitioned(db):
+        months.update(month for _, month in list_partitions(db) if month < cutoff)
+    
+    return sorted(months)
+
+def archive_month(db: Session, month: date, batch_size: int = 50_000) -> int:
+    """Export one month of scans to a compressed Parquet file, then remove them from the database
+    
+    Rows are streamed through a server-side cursor in `batch_size` chunks, so
+    memory stays flat regardless of month size. The file is fsync'd and
+    renamed into place before any row is deleted.
+    """
+    pa, pq = _pyarrow()
+    schema = _schema(pa)
+    start, end = month, add_months(month, 1)
+    in_month = (ScanMetadata.scanned_at >= start, ScanMetadata.scanned_at < end)
+    
+    stmt = select(*(getattr(ScanMetadata, column) for column in ARCHIVE_COLUMNS)) \
+        .where(*in_month).order_by(ScanMetadata.scanned_at)
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    
+    target_dir = month_dir(month)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    # A month can be archived more than once (late syncs); each run adds a part file
+    target = target_dir / f"part-{time.time_ns()}.parquet"
+    # Dot-prefixed so dataset readers skip it until it is complete
+    partial = target_dir / f".{target.name}.tmp"
+    
+    written = 0
+    writer = None
+    try:
+        for rows in result.partitions():
+            columns = list(zip(*rows))
+            data = {name: list(values) for name, values in zip(ARCHIVE_COLUMNS, columns)}
+            data["device_info"] = [json.dumps(value) if value else None for value in data["device_info"]]
+            batch = pa.RecordBatch.from_pydict(data, schema=schema)
+            if writer is None:
+                writer = pq.ParquetWriter(partial, schema, compression="zstd")
+            writer.write_batch(batch)
+            written += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    if written:
+        with open(partial, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(partial, target)
+    
+    # Refuse to delete rows that arrived while the month was being exported
+    remaining = db.query(func.count(ScanMetadata.scan_id)).filter(*in_month).scalar()
+    if remaining != written:
+        db.rollback()
+        if written:
+            os.remove(target)
+        raise RuntimeError(
+            f"{month:%Y-%m} changed during archival ({written} exported, {remaining} now present); "
+            f"nothing was removed, rerun to archive it"
+        )
+    
+    if is_partitioned(db) and any(m == month for _, m in list_partitions(db)):
+        drop_partition(db, month)
+    # Rows outside a monthly partition (default partition, SQLite)
+    db.execute(delete(ScanMetadata).where(*in_month))
+    db.commit()
+    
+    return written
+
+def _decode(row: Dict[str, Any]) -> Dict[str, Any]:
+    if row.get("device_info"):
+        row["device_info"] = json.loads(row["device_info"])
+    return row
+
+def read_archived_scans(
+    user_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    newest_first: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """Stream archived scan rows month by month (used by history and export)"""
+    months = archived_months()
+    if newest_first:
+        months.reverse()
+    
+    filters = []
+    if user_id:
+        filters.append(("user_id", "==", str(user_id)))
+    if start:
+        filters.append(("scanned_at", ">=", start))
+    if end:
+        filters.append(("scanned_at", "<", end))
+    
+    for month in months:
+        month_end = add_months(month, 1)
+        if start and datetime(month_end.year, month_end.month, 1) <= start:
+            continue
+        if end and datetime(month.year, month.month, 1) >= end:
+            continue
+        
+        pa, pq = _pyarrow()
+        table = pq.read_table(month_dir(month), filters=filters or None, schema=_schema(pa))
+        if table.num_rows == 0:
+            continue
+        table = table.sort_by([("scanned_at", "descending" if newest_first else "ascending")])
+        for batch in table.to_batches():
+            for row in batch.to_pylist():
+                yield _decode(row)
@@ -0,0 +1,93 @@
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Sequence, Tuple
+
+from ..models.scan import ScanMetadata, ScanChangeCounter, ScanTombstone
+from .analytics import _dialect_insert, unrecord_scans
+
+def _allocate(db: Session, user_id: str, count: int) -> int:
+    """Reserve `count` sequence numbers for a user and return the last one
+    
+    One upsert on the user's counter row. On Postgres the row stays locked
+    until the transaction commits, so a user's changes commit in sequence
+    order and a reader never sees seq N+1 before seq N.
+    """
+    table = ScanChangeCounter.__table__
+    stmt = _dialect_insert(db)(table).values(user_id=user_id, last_seq=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"last_seq": table.c.last_seq + stmt.excluded.last_seq}
+    ).returning(table.c.last_seq)
+    return db.execute(stmt).scalar_one()
+
+def assign_change_seqs(db: Session, rows: Sequence[Dict[str, Any]]):
+    """Give new scan rows (dicts about to be inserted) their change_seq
+    
+    Must run in the transaction that inserts the rows. Rows without a user
+    are not part of any feed and are left alone.
+    """
+    by_user = defaultdict(list)
+    for row in rows:
+        if row.get("user_id"):
+            by_user[str(row["user_id"])].append(row)
+    
+    # A fixed lock order keeps concurrent multi-user batches from deadlocking
+    for user_id in sorted(by_user):
+        user_rows = by_user[user_id]
+        last = _allocate(db, user_id, len(user_rows))
+        for seq, row in enumerate(user_rows, start=last - len(user_rows) + 1):
+            row["change_seq"] = seq
+
+def delete_scan(db: Session, scan: ScanMetadata):
+    """Delete a scan, leaving a tombstone at the next position of its user's feed
+    
+    The scan is also taken out of the analytics rollups, in the same transaction.
+    """
+    seq = _allocate(db, scan.user_id, 1)
+    db.add(ScanTombstone(
+        user_id=scan.user_id,
+        change_seq=seq,
+        scan_id=scan.scan_id,
+        deleted_at=datetime.utcnow()
+    ))
+    unrecord_scans(db, [{
+        "scanned_at": scan.scanned_at,
+        "equipment_id": scan.equipment_id,
+        "user_id": scan.user_id,
+        "confidence_score": scan.confidence_score
+    }])
+    db.delete(scan)
+
+def read_changes(
+    db: Session,
+    user_id: str,
+    since: int,
+    limit: int
+) -> Tuple[List[ScanMetadata], List[ScanTombstone], int, bool]:
+    """Scans added and deleted after `since`, in feed order
+    
+    Returns (scans, tombstones, next_since, has_more). Both queries are
+    range scans on (user_id, change_seq) indexes, so a page costs the same
+    however long the history is.
+    """
+    scans = db.query(ScanMetadata).filter(
+        ScanMetadata.user_id == user_id,
+        ScanMetadata.change_seq > since
+    ).order_by(ScanMetadata.change_seq).limit(limit + 1).all()
+    tombstones = db.query(ScanTombstone).filter(
+        ScanTombstone.user_id == user_id,
+        ScanTombstone.change_seq > since
+    ).order_by(ScanTombstone.change_seq).limit(limit + 1).all()
+    
+    changes = sorted(scans + tombstones, key=lambda change: change.change_seq)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    next_since = changes[-1].change_seq if changes else since
+    
+    return (
+        [change for change in changes if isinstance(change, ScanMetadata)],
+        [change for change in changes if isinstance(change, ScanTombstone)],
+        next_since,
+        has_more
+    )
@@ -0,0 +1,178 @@
+from sqlalchemy import Text, select, type_coerce
+from sqlalchemy.exc import OperationalError
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+import csv
+import io
+import json
+
+import orjson
+
+from ..core.config import settings
+from ..core.database import engine, engine_name, replica_router
+from ..core.metrics import metrics
+from ..models.equipment import Equipment
+from ..models.scan import ScanMetadata
+from ..models.user import User
+from .scan_archive import read_archived_scans
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = (
+    "scan_id", "user_id", "equipment_id", "class_name", "confidence_score", "scanned_at", "synced_at", "device_info"
+)
+
+exported_rows = metrics.counter("scan_export_rows_total", "Scan rows written by streaming exports, by format")
+
+class ScanExportFilter:
+    """Which scans an export covers; every field is optional (all scans)"""
+    
+    def __init__(
+        self,
+        user_id: Optional[str] = None,
+        email_domain: Optional[str] = None,
+        equipment_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ):
+        self.user_id = user_id
+        self.email_domain = email_domain.lower().lstrip("@") if email_domain else None
+        self.equipment_id = equipment_id
+        self.start = _naive_utc(start)
+        self.end = _naive_utc(end)
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def export_statement(filters: ScanExportFilter):
+    """Core SELECT of plain export rows, oldest first (no ORM objects are built)"""
+    scans = ScanMetadata.__table__
+    stmt = select(
+        scans.c.scan_id,
+        scans.c.user_id,
+        scans.c.equipment_id,
+        Equipment.class_name,
+        scans.c.confidence_score,
+        scans.c.scanned_at,
+        scans.c.synced_at,
+        # The stored JSON text, passed through without decoding
+        type_coerce(scans.c.device_info, Text)
+    ).select_from(
+        scans.outerjoin(Equipment.__table__, Equipment.equipment_id == scans.c.equipment_id)
+    )
+    
+    if filters.user_id:
+        stmt = stmt.where(scans.c.user_id == filters.user_id)
+    if filters.email_domain:
+        stmt = stmt.where(scans.c.user_id.in_(_domain_users(filters.email_domain)))
+    if filters.equipment_id:
+        stmt = stmt.where(scans.c.equipment_id == filters.equipment_id)
+    if filters.start:
+        stmt = stmt.where(scans.c.scanned_at >= filters.start)
+    if filters.end:
+        stmt = stmt.where(scans.c.scanned_at < filters.end)
+    return stmt.order_by(scans.c.scanned_at, scans.c.scan_id)
+
+def _domain_users(domain: str):
+    """Users signed in with an address at this domain (e.g. a school's Google Workspace)"""
+    return select(User.user_id).where(User.email.ilike(f"%@{domain}"))
+
+def _connect():
+    """A connection for a long read: a replica when one is configured and reachable"""
+    target = replica_router.choose()
+    if target is not None:
+        try:
+            return target.connect()
+        except OperationalError as e:
+            print(f"Replica {engine_name(target)} unavailable, exporting from primary: {e}")
+    return engine.connect()
+
+def stream_live_rows(filters: ScanExportFilter, batch_rows: Optional[int] = None) -> Iterator[Sequence[tuple]]:
+    """Matching rows in batches, read through a server-side cursor where the database has them
+    
+    `yield_per` makes PostgreSQL use a named cursor (stream_results) and
+    fetch `batch_rows` at a time, so memory stays flat however many rows
+    match; SQLite already steps through results lazily.
+    """
+    batch_rows = batch_rows or settings.SCAN_EXPORT_BATCH_ROWS
+    with _connect() as connection:
+        result = connection.execution_options(yield_per=batch_rows).execute(export_statement(filters))
+        for partition in result.partitions():
+            yield partition
+
+def stream_archived_rows(filters: ScanExportFilter, batch_rows: Optional[int] = None) -> Iterator[List[tuple]]:
+    """Matching rows from the Parquet archive, oldest month first, in the live rows' shape"""
+    batch_rows = batch_rows or settings.SCAN_EXPORT_BATCH_ROWS
+    with _connect() as connection:
+        class_names = dict(connection.execute(select(Equipment.equipment_id, Equipment.class_name)).all())
+        domain_users = None
+        if filters.email_domain:
+            domain_users = set(connection.execute(_domain_users(filters.email_domain)).scalars())
+    
+    batch = []
+    for row in read_archived_scans(user_id=filters.user_id, start=filters.start, end=filters.end, newest_first=False):
+        if filters.equipment_id and row["equipment_id"] != filters.equipment_id:
+            continue
+        if domain_users is not None and row["user_id"] not in domain_users:
+            continue
+        batch.append((
+            row["scan_id"], row["user_id"], row["equipment_id"], class_names.get(row["equipment_id"]),
+            row["confidence_score"], row["scanned_at"], row["synced_at"],
+            json.dumps(row["device_info"]) if row.get("device_info") else None
+        ))
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    # Stored timestamps are naive UTC
+    return value.replace(tzinfo=timezone.utc).isoformat() if value else None
+
+def encode_csv(batches: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """A header line, then one encoded piece per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode("utf-8")
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            (scan_id, user_id, equipment_id, class_name, confidence, _timestamp(scanned_at), _timestamp(synced_at), device_info)
+            for scan_id, user_id, equipment_id, class_name, confidence, scanned_at, synced_at, device_info in batch
+        )
+        exported_rows.inc(len(batch), labels={"format": "csv"})
+        yield buffer.getvalue().encode("utf-8")
+
+def encode_ndjson(batches: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """One JSON object per line, one encoded piece per batch of rows"""
+    dumps = orjson.dumps
+    for batch in batches:
+        lines = []
+        for scan_id, user_id, equipment_id, class_name, confidence, scanned_at, synced_at, device_info in batch:
+            line: Dict[str, Any] = {
+                "scan_id": scan_id,
+                "user_id": user_id,
+                "equipment_id": equipment_id,
+                "class_name": class_name,
+                "confidence_score": confidence,
+                "scanned_at": _timestamp(scanned_at),
+                "synced_at": _timestamp(synced_at),
+            }
+            # device_info is already JSON text; splice it in rather than decoding and re-encoding it
+            lines.append(dumps(line)[:-1] + b',"device_info":' + (device_info.encode("utf-8") if device_info else b"null") + b"}\n")
+        exported_rows.inc(len(batch), labels={"format": "ndjson"})
+        yield b"".join(lines)
+
+def export_pieces(export_format: str, filters: ScanExportFilter, include_archived: bool = False) -> Iterator[bytes]:
+    """Encoded export body: live rows, then archived months when asked for"""
+    def batches():
+        yield from stream_live_rows(filters)
+        if include_archived:
+            yield from stream_archived_rows(filters)
+    
+    encode = encode_csv if export_format == "csv" else encode_ndjson
+    return encode(batches())
@@ -0,0 +1,304 @@
+from sqlalchemy import insert
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import time
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.metrics import metrics
+from ..core.tracing import trace
+from ..models.scan import ScanMetadata
+from .analytics import record_scans
+from .scan_changes import assign_change_seqs
+
+queue_depth = metrics.gauge("scan_log_queue_depth", "Scan records waiting to be written")
+enqueue_wait = metrics.histogram("scan_log_enqueue_wait_seconds", "Time analyze waited for queue space")
+flush_latency = metrics.histogram("scan_log_flush_seconds", "Time to write one batch of scan records")
+rows_written = metrics.counter("scan_log_rows_written_total", "Scan records written to the database")
+rows_dropped = metrics.counter("scan_log_rows_dropped_total", "Scan records dropped (queue full or rejected by the database)")
+
+# Queued after the last record on shutdown so the flusher drains and exits
+_STOP = object()
+
+class ScanLogFull(Exception):
+    """Raised when the write-behind queue stays full past the enqueue timeout"""
+
+def _lock_file(path: str, create: bool) -> Optional[int]:
+    """An fd holding an exclusive flock on `path`, or None if another process holds it
+    
+    Creating waits for the lock; otherwise the lock is only tried. A lock
+    file can be unlinked by whoever held it before us, so the lock only
+    counts while the path still names the inode we locked.
+    """
+    while True:
+        try:
+            fd = os.open(path, os.O_RDWR | (os.O_CREAT if create else 0), 0o644)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if create else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if os.path.samestat(os.fstat(fd), os.stat(path)):
+                return fd
+        except (BlockingIOError, FileNotFoundError):
+            pass
+        os.close(fd)
+        if not create:
+            return None
+
+class ScanLogger:
+    """Write-behind logger that batches scan records into multi-row inserts
+    
+    Records are queued in memory and written every `flush_interval_ms` or
+    every `batch_size` rows, whichever comes first. A full queue makes
+    callers wait (backpressure) up to `enqueue_timeout_ms`. With a spool
+    path set, each record is appended to a local NDJSON file before it is
+    acknowledged and replayed on the next start if the process dies first.
+    
+    Each process spools to `<spool_path>.<pid>` and holds an flock on
+    `<spool_path>.<pid>.lock` while it runs, so workers sharing a spool
+    path never touch each other's files: a starting worker only replays
+    the files of processes whose lock is free, i.e. that have exited.
+    """
+    
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        flush_interval_ms: int = settings.SCAN_LOG_FLUSH_INTERVAL_MS,
+        batch_size: int = settings.SCAN_LOG_BATCH_SIZE,
+        queue_size: int = settings.SCAN_LOG_QUEUE_SIZE,
+        enqueue_timeout_ms: int = settings.SCAN_LOG_ENQUEUE_TIMEOUT_MS,
+        spool_path: str = settings.SCAN_LOG_SPOOL_PATH
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.spool_path = spool_path
+        
+        # This process's own spool file and lock (set in start(), after any fork)
+        self._own_spool_path: Optional[str] = None
+        self._spool_lock: Optional[int] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._spool = None
+        self._keep_spool = False
+    
+    async def start(self):
+        """Replay any spooled records and start the background flusher"""
+        if self._task:
+            return
+        
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.spool_path:
+            Path(self.spool_path).parent.mkdir(parents=True, exist_ok=True)
+            self._own_spool_path = f"{self.spool_path}.{os.getpid()}"
+            self._spool_lock = _lock_file(f"{self._own_spool_path}.lock", create=True)
+            await asyncio.to_thread(self._replay_spool)
+            self._spool = open(self._own_spool_path, "a", encoding="utf-8")
+        
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Flush everything still queued and stop the flusher"""
+        if not self._task:
+            return
+        
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        
+        if self._spool:
+            self._spool.close()
+            self._spool = None
+            if self._keep_spool:
+                # Left for whichever process starts next (the lock is released below)
+                os.replace(self._own_spool_path, f"{self._own_spool_path}.{time.time_ns()}.pending")
+            else:
+                # Everything queued has been written; the spool is no longer needed
+                os.remove(self._own_spool_path)
+                # Rotated spools kept after a failed write still need the lock file to be found
+                if not glob.glob(f"{glob.escape(self._own_spool_path)}.*.pending"):
+                    os.remove(f"{self._own_spool_path}.lock")
+            os.close(self._spool_lock)
+            self._spool_lock = None
+    
+    async def enqueue(self, row: Dict[str, Any]):
+        """Queue one scan_metadata row, waiting for space if the queue is full"""
+        if not self._task:
+            await self.start()
+        
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._queue.put(row), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            rows_dropped.inc()
+            raise ScanLogFull(f"Scan log queue full ({self.queue_size} records)")
+        enqueue_wait.observe(time.perf_counter() - started)
+        queue_depth.set(self._queue.qsize())
+        
+        # Flushed to the OS per record (survives a process crash); fsync'd per batch
+        if self._spool:
+            self._spool.write(json.dumps(row, default=str) + "\n")
+            self._spool.flush()
+    
+    async def _run(self):
+        """Collect batches by size or age and write them off the event loop"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            
+            queue_depth.set(self._queue.qsize())
+            pending_spool = self._rotate_spool() if self._queue.empty() else None
+            keep_spool = self._keep_spool
+            if pending_spool:
+                self._keep_spool = False
+            
+            written = await asyncio.to_thread(self._write_batch, batch)
+            
+            # Keep spooled records for replay if the database was unreachable
+            if not written:
+                if pending_spool:
+                    keep_spool = True
+                else:
+                    self._keep_spool = True
+            if pending_spool and not keep_spool:
+                os.remove(pending_spool)
+    
+    def _rotate_spool(self) -> Optional[str]:
+        """Move the current spool aside once every record in it has been dequeued"""
+        if not self._spool:
+            return None
+        
+        self._spool.flush()
+        os.fsync(self._spool.fileno())
+        self._spool.close()
+        
+        pending = f"{self._own_spool_path}.{time.time_ns()}.pending"
+        os.replace(self._own_spool_path, pending)
+        self._spool = open(self._own_spool_path, "a", encoding="utf-8")
+        return pending
+    
+    def _write_batch(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert a batch (one multi-row INSERT plus rollups); isolate bad rows on failure"""
+        # Each flush is its own trace; the requests that queued the rows have long finished
+        with trace("scan_log.flush", rows=len(rows)) as flush_span:
+            written = self._insert(rows)
+            flush_span.set("written", written)
+        return written
+    
+    def _insert(self, rows: List[Dict[str, Any]]) -> int:
+        started = time.perf_counter()
+        written = 0
+        db = self.session_factory()
+        try:
+            try:
+                assign_change_seqs(db, rows)
+                db.execute(insert(ScanMetadata), rows)
+                record_scans(db, rows)
+                db.commit()
+                written = len(rows)
+            except Exception as e:
+                db.rollback()
+                print(f"Scan log batch of {len(rows)} failed ({e}), retrying row by row")
+                for row in rows:
+                    try:
+                        assign_change_seqs(db, [row])
+                        db.execute(insert(ScanMetadata), [row])
+                        record_scans(db, [row])
+                        db.commit()
+                        written += 1
+                    except Exception as row_error:
+                        db.rollback()
+                        print(f"Dropping scan {row.get('scan_id')}: {row_error}")
+        finally:
+            db.close()
+        
+        flush_latency.observe(time.perf_counter() - started)
+        rows_written.inc(written)
+        rows_dropped.inc(len(rows) - written)
+        return written
+    
+    def _replay_spool(self):
+        """Write records left in spool files by processes that have exited"""
+        # Files under our own pid belong to an exited process that had the same pid
+        self._replay_files(self._own_spool_path)
+        for lock_path in glob.glob(f"{glob.escape(self.spool_path)}.*.lock"):
+            owner = lock_path[:-len(".lock")]
+            if owner == self._own_spool_path:
+                continue
+            # Held while the owner runs; gone once another worker has replayed it
+            lock = _lock_file(lock_path, create=False)
+            if lock is None:
+                continue
+            try:
+                self._replay_files(owner)
+                os.remove(lock_path)
+            finally:
+                os.close(lock)
+    
+    def _replay_files(self, owner: str):
+        """Write the records in one exited process's spool and rotated spools, then delete them"""
+        paths = sorted(glob.glob(f"{glob.escape(owner)}.*.pending"))
+        if os.path.exists(owner):
+            paths.append(owner)
+        if not paths:
+            return
+        
+        rows = {}
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final line from a crash
+                    if row.get("scanned_at"):
+                        row["scanned_at"] = datetime.fromisoformat(row["scanned_at"])
+                    rows[row["scan_id"]] = row
+        
+        # Rotated spools can overlap records that were already written
+        db = self.session_factory()
+        try:
+            scan_ids = list(rows)
+            for i in range(0, len(scan_ids), 500):
+                chunk = scan_ids[i:i + 500]
+                for (scan_id,) in db.query(ScanMetadata.scan_id).filter(ScanMetadata.scan_id.in_(chunk)):
+                    rows.pop(scan_id, None)
+        finally:
+            db.close()
+        
+        pending = list(rows.values())
+        for i in range(0, len(pending), self.batch_size):
+            self._write_batch(pending[i:i + self.batch_size])
+        
+        for path in paths:
+            os.remove(path)
+        print(f"Replayed {len(pending)} spooled scan records from {Path(owner).name}")
+
+scan_logger = ScanLogger()
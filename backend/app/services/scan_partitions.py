@@ -0,0 +1,94 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+from typing import List, Tuple
+
+from ..core.config import settings
+
+PARENT_TABLE = "scan_metadata"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+
+# Serializes partition DDL across workers (arbitrary constant key)
+PARTITION_LOCK_KEY = 7_031_001
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+def is_partitioned(db: Session) -> bool:
+    """True when scan_metadata is a Postgres range-partitioned table"""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table"
+    ), {"table": PARENT_TABLE}).scalar())
+
+def list_partitions(db: Session) -> List[Tuple[str, date]]:
+    """Monthly partitions of scan_metadata as (table name, month), oldest first"""
+    rows = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": PARENT_TABLE}).scalars()
+    
+    partitions = []
+    prefix = f"{PARENT_TABLE}_y"
+    for name in rows:
+        if name.startswith(prefix):
+            year, month = name[len(prefix):].split("m")
+            partitions.append((name, date(int(year), int(month), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def ensure_partitions(db: Session, months_ahead: int = settings.SCAN_PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Create monthly partitions from the current month up to `months_ahead` months out
+    
+    Idempotent and cheap; runs from `manage.py migrate` and `manage.py ensure-partitions`.
+    No-op unless scan_metadata is partitioned (Postgres only).
+    """
+    if not is_partitioned(db):
+        return []
+    
+    # Workers start together; only one of them should run the DDL
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    has_default = db.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar()
+    
+    created = []
+    first = month_start(datetime.utcnow().date())
+    for offset in range(months_ahead + 1):
+        month = add_months(first, offset)
+        name = partition_name(month)
+        exists = db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+        if exists:
+            continue
+        
+        bounds = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        db.execute(text(
+            f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        # Rows that landed in the default partition would block ATTACH; move them first
+        if has_default:
+            db.execute(text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE scanned_at >= :start AND scanned_at < :end RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ), {"start": month, "end": add_months(month, 1)})
+        db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+        created.append(name)
+    
+    db.commit()
+    return created
+
+def drop_partition(db: Session, month: date):
+    """Detach and drop one monthly partition (after it has been archived)"""
+    name = partition_name(month)
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+    db.execute(text(f"DROP TABLE {name}"))
+    db.commit()
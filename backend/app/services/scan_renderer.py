@@ -0,0 +1,139 @@
+from typing import Dict, Optional, Tuple, Iterable, Sequence
+from uuid import UUID
+import threading
+
+from ..models.equipment import Equipment
+from ..schemas.scan import ScanAnalysisResponse
+from .asset_store import equipment_image_url
+from .catalog import on_catalog_change
+
+try:
+    import orjson
+    
+    def _dumps(value) -> bytes:
+        return orjson.dumps(value)
+except ImportError:
+    import json
+    
+    def _dumps(value) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+SUPPORTED_LANGUAGES = ("en", "km")
+DEFAULT_LANGUAGE = "en"
+
+# Placeholders swapped for per-scan values when splitting a rendered body
+_SCAN_ID_MARK = "__scan_id__"
+_CONFIDENCE_MARK = "__confidence_score__"
+
+def select_language(language_preference: Optional[str], accept_language: Optional[str]) -> str:
+    """Pick the response language from the user's preference, then Accept-Language"""
+    if language_preference:
+        code = language_preference.strip().lower()[:2]
+        if code in SUPPORTED_LANGUAGES:
+            return code
+    
+    if accept_language:
+        ranked = []
+        for position, part in enumerate(accept_language.split(",")):
+            tag, _, params = part.strip().partition(";")
+            quality = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    quality = 0.0
+            ranked.append((-quality, position, tag.strip().lower()[:2]))
+        for neg_quality, _, code in sorted(ranked):
+            if neg_quality < 0 and code in SUPPORTED_LANGUAGES:
+                return code
+    
+    return DEFAULT_LANGUAGE
+
+def _localized(equipment: Equipment, field: str, language: str):
+    """Read `<field>_<language>`, falling back to English when untranslated"""
+    if language != DEFAULT_LANGUAGE:
+        value = getattr(equipment, f"{field}_{language}", None)
+        if value:
+            return value
+    return getattr(equipment, f"{field}_{DEFAULT_LANGUAGE}")
+
+class ScanResponseRenderer:
+    """Caches pre-serialized ScanAnalysisResponse bodies per equipment and language
+    
+    Everything except `scan_id` and `confidence_score` is identical for every
+    scan of a class, so the body is validated and encoded once and the two
+    per-scan values are spliced into the cached bytes.
+    """
+    
+    def __init__(self):
+        # (equipment_id, language, cascade stage) -> (updated_at, body fragments)
+        self._templates: Dict[Tuple[str, str, Optional[str]], Tuple[object, Tuple[bytes, bytes, bytes]]] = {}
+        self._lock = threading.Lock()
+    
+    def render(
+        self, equipment: Equipment, language: str, scan_id: UUID, confidence: float, stage: Optional[str] = None
+    ) -> bytes:
+        """Return the JSON body for one scan result"""
+        head, middle, tail = self._template(equipment, language, stage)
+        return b"".join((head, str(scan_id).encode("ascii"), middle, _dumps(confidence), tail))
+    
+    def warm(self, equipment: Iterable[Equipment], stages: Sequence[Optional[str]]) -> int:
+        """Build bodies for every language and cascade stage ahead of the first scan; returns how many"""
+        built = 0
+        for item in equipment:
+            for language in SUPPORTED_LANGUAGES:
+                for stage in stages:
+                    self._template(item, language, stage)
+                    built += 1
+        return built
+    
+    def invalidate(self, equipment_ids: Optional[Iterable[str]] = None):
+        """Drop cached bodies for the given equipment (or all of them)"""
+        with self._lock:
+            if equipment_ids is None:
+                self._templates.clear()
+                return
+            ids = {str(equipment_id) for equipment_id in equipment_ids}
+            for key in [key for key in self._templates if key[0] in ids]:
+                del self._templates[key]
+    
+    def _template(self, equipment: Equipment, language: str, stage: Optional[str]) -> Tuple[bytes, bytes, bytes]:
+        key = (str(equipment.equipment_id), language, stage)
+        cached = self._templates.get(key)
+        
+        # updated_at in the key keeps other workers' edits from serving stale bodies
+        if cached and cached[0] == equipment.updated_at:
+            return cached[1]
+        
+        fragments = self._build(equipment, language, stage)
+        with self._lock:
+            self._templates[key] = (equipment.updated_at, fragments)
+        return fragments
+    
+    def _build(self, equipment: Equipment, language: str, stage: Optional[str]) -> Tuple[bytes, bytes, bytes]:
+        """Validate once through the response schema, then split around the per-scan fields"""
+        response = ScanAnalysisResponse(
+            scan_id=UUID(int=0),
+            equipment_id=equipment.equipment_id,
+            equipment_name=_localized(equipment, "name", language),
+            class_name=equipment.class_name,
+            confidence_score=0.0,
+            category=equipment.category,
+            description=_localized(equipment, "description", language),
+            usage=_localized(equipment, "usage", language),
+            safety_info=_localized(equipment, "safety_info", language),
+            image_url=equipment_image_url(equipment),
+            tags=equipment.tags or [],
+            inference_stage=stage
+        )
+        body = response.model_dump(mode="json")
+        body["scan_id"] = _SCAN_ID_MARK
+        body["confidence_score"] = _CONFIDENCE_MARK
+        
+        encoded = _dumps(body)
+        head, rest = encoded.split(f'"{_SCAN_ID_MARK}"'.encode("ascii"))
+        middle, tail = rest.split(f'"{_CONFIDENCE_MARK}"'.encode("ascii"))
+        return head + b'"', b'"' + middle, tail
+
+scan_renderer = ScanResponseRenderer()
+on_catalog_change(scan_renderer.invalidate)
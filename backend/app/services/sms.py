@@ -0,0 +1,56 @@
+from typing import Optional
+
+from ..core.config import settings
+from .upstream import (
+    CircuitBreaker, ResilientClient, http_client, raise_for_status, retry_unless_client_error
+)
+
+# Account used against the local stub when no Twilio credentials are configured
+STUB_ACCOUNT_SID = "AC00000000000000000000000000000000"
+
+class SmsSender:
+    """Sends text messages through Twilio's Messages REST API
+    
+    Without Twilio credentials (and no stubs) messages are only printed, as
+    in development. Sends are never retried, since a retried request may
+    deliver the same code twice.
+    """
+    
+    def __init__(self):
+        self.account_sid = settings.twilio_account_sid or (STUB_ACCOUNT_SID if settings.UPSTREAM_STUBS_URL else "")
+        self.auth_token = settings.TWILIO_AUTH_TOKEN or "stub"
+        self.sender = settings.TWILIO_PHONE_NUMBER or "+15005550006"
+        self._client = ResilientClient(
+            "twilio",
+            self._send,
+            deadline=settings.SMS_DEADLINE_MS / 1000,
+            max_concurrency=16,
+            retries=0,
+            breaker=CircuitBreaker("twilio", failure_threshold=5, reset_timeout=30.0),
+            retryable=retry_unless_client_error
+        )
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.account_sid)
+    
+    async def _send(self, to: str, body: str) -> str:
+        response = await http_client().post(
+            f"{settings.twilio_api_base_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json",
+            data={"To": to, "From": self.sender, "Body": body},
+            auth=(self.account_sid, self.auth_token)
+        )
+        raise_for_status(response)
+        return response.json()["sid"]
+    
+    async def send(self, to: str, body: str) -> Optional[str]:
+        """Send one message; returns its Twilio sid (None when only printed)
+        
+        Raises UpstreamError when the message could not be handed to Twilio.
+        """
+        if not self.enabled:
+            print(f"SMS to {to}: {body}")
+            return None
+        return await self._client(to, body)
+
+sms_sender = SmsSender()
@@ -0,0 +1,44 @@
+"""
+Canned Gemini answers for the stubs, importable without the stub server
+
+GeminiChat's GEMINI_FAULT_INJECTION mode answers in-process with these,
+and the stub server (upstream_stubs.py) serves the same answers over HTTP.
+"""
+from typing import AsyncIterator, List, Tuple
+import asyncio
+
+from .upstream import FaultInjectingUpstream
+
+# Words per streamed chunk, roughly what Gemini sends per event
+STREAM_CHUNK_WORDS = 8
+
+def stub_reply(prompt: str) -> str:
+    question = prompt.rsplit("User: ", 1)[-1].removesuffix("\nAssistant:")
+    return (
+        f"(stub answer) You asked: {question} This is a stand-in answer from the local stub, "
+        "long enough to arrive in several chunks when streamed, so the streaming path sees "
+        "the same pacing a real model produces while it writes."
+    )
+
+def stream_chunks(text: str) -> List[str]:
+    words = text.split(" ")
+    return [
+        " ".join(words[i:i + STREAM_CHUNK_WORDS]) + (" " if i + STREAM_CHUNK_WORDS < len(words) else "")
+        for i in range(0, len(words), STREAM_CHUNK_WORDS)
+    ]
+
+async def paced(stub: FaultInjectingUpstream, chunks: List[str]) -> AsyncIterator[str]:
+    """Chunks after the first, `chunk_latency` apart; a stalled stream stops halfway and hangs"""
+    stall_at = len(chunks) // 2 if stub.stalls() else None
+    for i, chunk in enumerate(chunks):
+        if i == stall_at:
+            await asyncio.Event().wait()
+        if i:
+            await asyncio.sleep(stub.chunk_latency)
+        yield chunk
+
+async def stub_stream(stub: FaultInjectingUpstream, prompt: str) -> Tuple[str, AsyncIterator[str]]:
+    """In-process streamed answer, shaped like GeminiChat._open_stream's result"""
+    await stub.fault()
+    chunks = paced(stub, stream_chunks(stub_reply(prompt)))
+    return await chunks.__anext__(), chunks
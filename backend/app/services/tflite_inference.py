@@ -2,38 +2,194 @@ import numpy as np
 from PIL import Image
 import json
 import os
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import random
 
+from ..core.metrics import metrics
+from ..core.tracing import span
+
+stage_latency = metrics.histogram("scan_inference_stage_seconds", "Interpreter time per cascade stage")
+stage_answers = metrics.counter("scan_inference_answers_total", "Scans answered by each cascade stage")
+stage_escalations = metrics.counter(
+    "scan_inference_escalations_total", "Scans a cascade stage was not confident enough to answer"
+)
+
+def dequantize(values: np.ndarray, detail: Dict[str, Any]) -> np.ndarray:
+    """Real values of a tensor read from the interpreter, as a float32 copy
+    
+    Quantized (uint8/int8) tensors hold q with real = (q - zero_point) * scale;
+    float tensors have a scale of 0 and pass through.
+    """
+    scale, zero_point = detail.get('quantization', (0.0, 0))
+    real = values.astype(np.float32)
+    if scale:
+        real = (real - zero_point) * scale
+    return real
+
+class ModelStage:
+    """One TFLite model in the inference cascade
+    
+    A stage answers when its top confidence reaches the threshold for the
+    predicted class; the last stage always answers.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        model_path: Path,
+        threshold: Optional[float] = None,
+        class_thresholds: Optional[Dict[str, float]] = None
+    ):
+        self.name = name
+        self.model_path = model_path
+        self.threshold = threshold
+        self.class_thresholds = class_thresholds or {}
+        self.model_content: Optional[bytes] = None
+        self.interpreter = None
+        # An interpreter is not thread-safe; requests run inference in worker threads
+        self._invoke_lock = threading.Lock()
+        self.embedding_detail: Optional[Dict[str, Any]] = None
+        self.embedding_dim = None
+    
+    def read(self):
+        """Read the model file into memory (shared with forked workers)"""
+        self.model_content = self.model_path.read_bytes()
+    
+    def load(self, embedding_tensor: Optional[str] = None):
+        """Build this process's interpreter from the model bytes (raises ImportError without TensorFlow)"""
+        import tensorflow as tf
+        if self.model_content is None:
+            self.read()
+        # Intermediate tensors (the penultimate layer) are only readable when preserved
+        self.interpreter = tf.lite.Interpreter(
+            model_content=self.model_content,
+            experimental_preserve_all_tensors=bool(embedding_tensor)
+        )
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.input_dtype = np.dtype(self.input_details[0]['dtype'])
+        
+        detail = self._find_tensor(embedding_tensor)
+        if detail:
+            self.embedding_detail = detail
+            self.embedding_dim = int(np.prod(detail['shape'][1:]))
+    
+    def _find_tensor(self, name: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Details of the tensor with this name: an extra model output, or an intermediate layer"""
+        if not name:
+            return None
+        for detail in [*self.output_details, *self.interpreter.get_tensor_details()]:
+            if detail['name'] == name:
+                return detail
+        print(f"Embedding tensor '{name}' not found in {self.model_path.name}; embeddings disabled")
+        return None
+    
+    def threshold_for(self, class_name: str) -> Optional[float]:
+        return self.class_thresholds.get(class_name, self.threshold)
+    
+    def invoke(self, input_data: np.ndarray):
+        """Run the interpreter; returns (class scores in [0, 1], embedding or None)
+        
+        Outputs are dequantized here, before any threshold sees them, and
+        copied out of the interpreter's buffers, which the next invoke reuses.
+        """
+        with self._invoke_lock:
+            self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
+            self.interpreter.invoke()
+            output = self.output_details[0]
+            predictions = dequantize(self.interpreter.get_tensor(output['index'])[0], output)
+            embedding = None
+            if self.embedding_detail is not None:
+                detail = self.embedding_detail
+                embedding = dequantize(self.interpreter.get_tensor(detail['index'])[0].reshape(-1), detail)
+        return predictions, embedding
+
 class TFLiteModel:
     """TensorFlow Lite model wrapper for equipment recognition"""
     
-    def __init__(self):
-        self.model_path = Path(__file__).parent.parent.parent / "models" / "model.tflite"
-        self.labels_path = Path(__file__).parent.parent.parent / "models" / "labels.txt"
-        self.config_path = Path(__file__).parent.parent.parent / "models" / "model_config.json"
+    def __init__(self, models_dir: Optional[Path] = None):
+        # Another directory with the same layout evaluates a candidate model side by side
+        self.models_dir = Path(models_dir) if models_dir else Path(__file__).parent.parent.parent / "models"
+        self.model_path = self.models_dir / "model.tflite"
+        self.labels_path = self.models_dir / "labels.txt"
+        self.config_path = self.models_dir / "model_config.json"
         
         self.labels = self._load_labels()
         self.config = self._load_config()
         self.input_shape = self.config.get("input_shape", [1, 224, 224, 3])
-        self.interpreter = None
+        self.input_dtype = np.dtype(self.config.get("input_dtype", "float32"))
+        
+        # Without a configured tensor there are no embeddings (no open-set check or similarity)
+        self.embedding_tensor: Optional[str] = self.config.get("embedding", {}).get("tensor") or None
+        self.embedding_dim: Optional[int] = None
+        self.stages = self._read_stages()
+        # Interpreters are per process: built on first use, or at worker startup via load_interpreters()
+        self._interpreters_pid: Optional[int] = None
+        self._interpreters_lock = threading.Lock()
+    
+    def _read_stages(self) -> List[ModelStage]:
+        """Read the cascade's model files from config (a single full-model stage by default)
+        
+        Returns no stages when TensorFlow or the model is unavailable, in
+        which case predictions are mocked.
+        """
+        declared = self.config.get("cascade", {}).get("stages") or [{"name": "full", "model": "model.tflite"}]
+        stages = []
+        for spec in declared:
+            stage = ModelStage(
+                spec["name"],
+                self.models_dir / spec["model"],
+                threshold=spec.get("threshold"),
+                class_thresholds=spec.get("class_thresholds")
+            )
+            if not stage.model_path.exists():
+                print(f"Cascade stage '{stage.name}' skipped: {stage.model_path.name} not found")
+                continue
+            stage.read()
+            stages.append(stage)
         
-        # Try to load TFLite model if available
-        if self.model_path.exists():
+        if stages:
             try:
-                import tensorflow as tf
-                self.interpreter = tf.lite.Interpreter(model_path=str(self.model_path))
-                self.interpreter.allocate_tensors()
-                self.input_details = self.interpreter.get_input_details()
-                self.output_details = self.interpreter.get_output_details()
-                print("TFLite model loaded successfully")
+                import tensorflow  # noqa: F401
             except ImportError:
                 print("TensorFlow not installed. Using mock predictions.")
                 print("For real ML inference, install: pip install tensorflow==2.15.0")
-            except Exception as e:
-                print(f"Could not load TFLite model: {e}")
+                return []
+        else:
+            print("Using mock predictions")
+        return stages
+    
+    def load_interpreters(self):
+        """Build this process's interpreters (once per process; forked workers build their own)"""
+        if self._interpreters_pid == os.getpid():
+            return
+        with self._interpreters_lock:
+            if self._interpreters_pid == os.getpid():
+                return
+            loaded = []
+            for stage in self.stages:
+                try:
+                    stage.load(self.embedding_tensor if not loaded else None)
+                except Exception as e:
+                    print(f"Could not load TFLite model {stage.model_path.name}: {e}")
+                    continue
+                loaded.append(stage)
+            
+            if loaded:
+                # Whatever stage ends up last has nothing to escalate to
+                loaded[-1].threshold, loaded[-1].class_thresholds = None, {}
+                self.input_dtype = loaded[0].input_dtype
+                # Embeddings come from the first stage, which runs for every image
+                self.embedding_dim = loaded[0].embedding_dim
+                print(f"TFLite model loaded successfully ({' -> '.join(stage.name for stage in loaded)})")
+            elif self.stages:
                 print("Using mock predictions")
+            self.stages = loaded
+            self._interpreters_pid = os.getpid()
     
     def _load_labels(self) -> list:
         """Load class labels from file"""
@@ -58,55 +214,116 @@ class TFLiteModel:
         else:
             return {
                 "model_name": "science_equipment_classifier_v1",
+                "input_spec_version": 1,
                 "input_shape": [1, 224, 224, 3],
                 "num_classes": 20,
                 "preprocessing": {
                     "resize": [224, 224],
                     "normalize": True
+                },
+                "postprocessing": {
+                    "confidence_threshold": 0.5,
+                    "top_k": 3,
+                    "open_set_max_distance": None
                 }
             }
     
+    def input_spec(self) -> Dict[str, Any]:
+        """Describe the pre-resized tensor layout clients may upload instead of an image"""
+        height, width = self.config["preprocessing"]["resize"]
+        return {
+            "model_name": self.config.get("model_name"),
+            "model_version": self.config.get("model_version"),
+            "spec_version": self.config.get("input_spec_version", 1),
+            "shape": [height, width, self.input_shape[-1]],
+            "dtype": "uint8",
+            "layout": "HWC",
+            "color_space": "RGB"
+        }
+    
     def preprocess_image(self, image: Image.Image) -> np.ndarray:
-        """Preprocess image for model input"""
+        """Resize an image to the model input size as an HxWxC uint8 array"""
+        # Image.open only reads the header; the pixels are decoded here
+        with span("image.decode", format=image.format or "", size=f"{image.width}x{image.height}"):
+            image.load()
+        
         # Resize image
         target_size = tuple(self.config["preprocessing"]["resize"])
-        image = image.convert('RGB')
-        image = image.resize(target_size, Image.LANCZOS)
+        with span("image.preprocess", mode=image.mode):
+            image = image.convert('RGB')
+            image = image.resize(target_size, Image.LANCZOS)
+            
+            # Each stage converts the pixels to its own input dtype
+            return np.asarray(image, dtype=np.uint8)
+    
+    def _to_input(self, pixels: np.ndarray, dtype: Optional[np.dtype] = None) -> np.ndarray:
+        """Turn an HxWxC uint8 array into a batched interpreter input"""
+        # Add batch dimension (a view, no copy)
+        batch = pixels[np.newaxis, ...]
+        
+        # Quantized models take the raw pixels as-is
+        if (dtype or self.input_dtype) == np.uint8:
+            return batch
         
-        # Convert to numpy array
-        img_array = np.array(image, dtype=np.float32)
+        img_array = batch.astype(np.float32)
         
         # Normalize if configured
         if self.config["preprocessing"].get("normalize"):
-            img_array = img_array / 255.0
-        
-        # Add batch dimension
-        img_array = np.expand_dims(img_array, axis=0)
+            img_array /= 255.0
         
         return img_array
     
     def predict(self, image: Image.Image) -> Dict[str, Any]:
-        """Run inference on image"""
-        # Preprocess
-        input_data = self.preprocess_image(image)
-        
-        if self.interpreter:
+        """Run inference on image (blocking; async callers run it in a thread)"""
+        return self._run(self.preprocess_image(image))
+    
+    def predict_array(self, pixels: np.ndarray) -> Dict[str, Any]:
+        """Run inference on an already-resized HxWxC uint8 array"""
+        return self._run(pixels)
+    
+    def _cascade(self, pixels: np.ndarray):
+        """Run stages in order until one is confident; returns (scores, embedding, stage name)"""
+        embedding = None
+        inputs = {}
+        for stage in self.stages:
+            # Stages sharing an input dtype share the converted tensor
+            if stage.input_dtype not in inputs:
+                inputs[stage.input_dtype] = self._to_input(pixels, stage.input_dtype)
+            
+            started = time.perf_counter()
+            with span("inference.invoke", stage=stage.name):
+                predictions, stage_embedding = stage.invoke(inputs[stage.input_dtype])
+            stage_latency.observe(time.perf_counter() - started, {"stage": stage.name})
+            if embedding is None:
+                embedding = stage_embedding
+            
+            threshold = stage.threshold_for(self.labels[int(np.argmax(predictions))])
+            if threshold is None or float(np.max(predictions)) >= threshold:
+                return predictions, embedding, stage.name
+            stage_escalations.inc(labels={"stage": stage.name})
+    
+    def _run(self, pixels: np.ndarray) -> Dict[str, Any]:
+        """Run the cascade (or mock predictions) on an HxWxC uint8 array"""
+        self.load_interpreters()
+        if self.stages:
             # Run actual TFLite inference
-            self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
-            self.interpreter.invoke()
-            output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
-            predictions = output_data[0]
+            predictions, embedding, stage_name = self._cascade(pixels)
         else:
             # Mock predictions for demo
-            predictions = np.random.rand(len(self.labels))
-            predictions = predictions / predictions.sum()  # Normalize to sum to 1
+            started = time.perf_counter()
+            with span("inference.invoke", stage="mock"):
+                predictions = np.random.rand(len(self.labels))
+                predictions = predictions / predictions.sum()  # Normalize to sum to 1
+            embedding, stage_name = None, "mock"
+            stage_latency.observe(time.perf_counter() - started, {"stage": stage_name})
+        stage_answers.inc(labels={"stage": stage_name})
         
         # Get top prediction
         top_idx = np.argmax(predictions)
         confidence = float(predictions[top_idx])
         
-        # Ensure reasonable confidence for demo
-        if confidence < 0.7:
+        # Ensure reasonable confidence for demo (mock predictions only)
+        if not self.stages and confidence < 0.7:
             confidence = random.uniform(0.75, 0.95)
         
         class_name = self.labels[top_idx]
@@ -124,5 +341,20 @@ class TFLiteModel:
         return {
             "class_name": class_name,
             "confidence": confidence,
-            "top_3_predictions": top_3
+            "top_3_predictions": top_3,
+            "stage": stage_name,
+            # None unless the model's embedding tensor is configured and found
+            "embedding": embedding.astype(np.float32) if embedding is not None else None
         }
+    
+    @property
+    def has_embeddings(self) -> bool:
+        """Whether predictions carry an embedding from the configured model tensor"""
+        self.load_interpreters()
+        return bool(self.stages) and self.stages[0].embedding_detail is not None
+    
+    def embed(self, image: Image.Image) -> np.ndarray:
+        """Embedding of an image, as stored for reference images in the vector index"""
+        if not self.has_embeddings:
+            raise RuntimeError("No embedding tensor is configured (embedding.tensor in model_config.json)")
+        return self.predict(image)["embedding"]
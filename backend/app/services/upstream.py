@@ -0,0 +1,350 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import math
+import random
+import time
+import weakref
+
+import httpx
+
+from ..core.metrics import metrics
+
+upstream_calls = metrics.counter("upstream_calls_total", "Calls to upstream APIs by upstream and outcome")
+upstream_attempts = metrics.counter(
+    "upstream_attempts_total", "Requests sent to upstream APIs by upstream and kind (primary, retry, hedge)"
+)
+upstream_latency = metrics.histogram("upstream_call_seconds", "Time until an upstream call answered or gave up")
+upstream_circuit_open = metrics.gauge("upstream_circuit_open", "1 while an upstream's circuit breaker is open")
+
+# One connection pool per event loop (httpx pools cannot be shared across loops)
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def http_client() -> httpx.AsyncClient:
+    """Shared HTTP client for upstream APIs; timeouts come from ResilientClient"""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=100))
+        _http_clients[loop] = client
+    return client
+
+class UpstreamHTTPError(Exception):
+    """An upstream answered with an error status; `code` drives retry decisions"""
+    
+    def __init__(self, code: int, message: str = ""):
+        super().__init__(f"HTTP {code}" + (f": {message}" if message else ""))
+        self.code = code
+
+def raise_for_status(response: httpx.Response):
+    if response.status_code >= 400:
+        raise UpstreamHTTPError(response.status_code, response.text[:200])
+
+def retry_unless_client_error(error: BaseException) -> bool:
+    """4xx answers other than 429 fail the same way again"""
+    code = getattr(error, "code", None)
+    return not (isinstance(code, int) and 400 <= code < 500 and code != 429)
+
+class UpstreamError(Exception):
+    """An upstream call produced no answer
+    
+    `reason` is circuit_open, busy, deadline, error, or rejected when the
+    upstream answered with an error that retrying will not fix.
+    """
+    
+    def __init__(self, reason: str, cause: Optional[BaseException] = None):
+        super().__init__(f"{reason}: {cause}" if cause and str(cause) else reason)
+        self.reason = reason
+        self.cause = cause
+
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures
+    
+    Opens after `failure_threshold` consecutive failed calls. Once
+    `reset_timeout` seconds have passed a single trial call is let through;
+    its success closes the circuit, its failure opens it again.
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        if self.opened_at is None:
+            return True
+        if self._trial or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self._trial = True
+        return True
+    
+    def record_success(self):
+        if self.opened_at is not None:
+            print(f"Upstream {self.name} recovered, circuit closed")
+            upstream_circuit_open.set(0, {"upstream": self.name})
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+    
+    def record_failure(self):
+        self.failures += 1
+        if self._trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+            if not self._trial:
+                print(f"Upstream {self.name} failing, circuit opened for {self.reset_timeout:g}s")
+            upstream_circuit_open.set(1, {"upstream": self.name})
+            self.opened_at = time.monotonic()
+            self._trial = False
+    
+    def cancel_trial(self):
+        """Let another call be the trial after one was abandoned by its caller"""
+        self._trial = False
+
+def _always_retry(error: BaseException) -> bool:
+    return True
+
+class ResilientClient:
+    """Deadlines, bounded concurrency, retries, hedging and a circuit breaker around an async upstream call
+    
+    `call` is any coroutine function. Each call to the client has `deadline`
+    seconds in total, including the wait for one of `max_concurrency` slots;
+    each attempt gets at most `attempt_timeout` of it. Failed attempts for
+    which `retryable(error)` holds are retried up to `retries` times after a
+    full-jitter exponential backoff. With `hedge_after` set, an attempt still
+    running after that many seconds is raced against a second request when a
+    slot is free. Anything short of an answer raises UpstreamError, so
+    callers fall back immediately instead of holding a worker on a hung
+    upstream.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        call: Callable[..., Awaitable[Any]],
+        deadline: float = 10.0,
+        attempt_timeout: Optional[float] = None,
+        max_concurrency: int = 8,
+        retries: int = 2,
+        backoff: float = 0.2,
+        max_backoff: float = 2.0,
+        hedge_after: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retryable: Callable[[BaseException], bool] = _always_retry
+    ):
+        self.name = name
+        self.call = call
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout or deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker(name)
+        self.retryable = retryable
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._labels = {"upstream": name}
+    
+    async def __call__(self, *args, **kwargs) -> Any:
+        if not self.breaker.allow():
+            self._count("circuit_open")
+            raise UpstreamError("circuit_open")
+        
+        started = time.monotonic()
+        deadline = started + self.deadline
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.deadline)
+            except asyncio.TimeoutError:
+                # Every slot is held by a call that has not come back: the upstream is stuck
+                raise UpstreamError("busy")
+            try:
+                result = await self._attempts(deadline, args, kwargs)
+            finally:
+                self._slots.release()
+        except UpstreamError as e:
+            if e.reason == "rejected":
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            self._count(e.reason, started)
+            raise
+        except BaseException:
+            # Our caller went away; that says nothing about the upstream's health
+            self.breaker.cancel_trial()
+            raise
+        
+        self.breaker.record_success()
+        self._count("ok", started)
+        return result
+    
+    def _count(self, outcome: str, started: Optional[float] = None):
+        upstream_calls.inc(labels={**self._labels, "outcome": outcome})
+        if started is not None:
+            upstream_latency.observe(time.monotonic() - started, self._labels)
+    
+    async def _attempts(self, deadline: float, args, kwargs) -> Any:
+        error: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            kind = "primary" if attempt == 0 else "retry"
+            try:
+                return await asyncio.wait_for(
+                    self._attempt(kind, args, kwargs), min(remaining, self.attempt_timeout)
+                )
+            except asyncio.TimeoutError as e:
+                error = e
+            except Exception as e:
+                if not self.retryable(e):
+                    # The upstream answered; the request itself is at fault
+                    raise UpstreamError("rejected", e)
+                error = e
+            
+            if attempt < self.retries:
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    break
+                await asyncio.sleep(delay)
+        
+        if error is None or isinstance(error, asyncio.TimeoutError):
+            raise UpstreamError("deadline", error)
+        raise UpstreamError("error", error)
+    
+    async def _attempt(self, kind: str, args, kwargs) -> Any:
+        """One attempt, hedged with a second request if it is slow to answer"""
+        upstream_attempts.inc(labels={**self._labels, "kind": kind})
+        primary = asyncio.ensure_future(self.call(*args, **kwargs))
+        if self.hedge_after is None:
+            return await primary
+        
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+            # Hedges only use spare capacity, never wait for it
+            if not done and not self._slots.locked():
+                await self._slots.acquire()
+                upstream_attempts.inc(labels={**self._labels, "kind": "hedge"})
+                hedge = asyncio.ensure_future(self.call(*args, **kwargs))
+                hedge.add_done_callback(lambda _: self._slots.release())
+                pending.add(hedge)
+            
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+class UpstreamFault(Exception):
+    """Failure raised on purpose by FaultInjectingUpstream"""
+
+# z-score of the 99th percentile of a normal distribution
+_Z99 = 2.326
+
+FAULT_OPTIONS = (
+    "latency", "jitter", "p50", "p99", "slow_rate", "slow_latency", "error_rate", "hang_rate",
+    "chunk_latency", "stall_rate", "seed"
+)
+
+class FaultInjectingUpstream:
+    """Local stand-in for a misbehaving upstream API
+    
+    Every call takes `latency` seconds plus up to `jitter` more, or, with
+    `p50` and `p99` set, a log-normal latency with those percentiles. With
+    probability `slow_rate` it takes `slow_latency` instead (a latency tail).
+    A fraction `error_rate` of calls then fail with UpstreamFault and a
+    fraction `hang_rate` never return. Otherwise `respond(*args, **kwargs)`
+    is the answer. Streamed answers wait `chunk_latency` between chunks, and
+    a fraction `stall_rate` of streams stop halfway without finishing.
+    """
+    
+    def __init__(
+        self,
+        respond: Callable[..., Any] = lambda *args, **kwargs: "ok",
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 1.0,
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        p50: Optional[float] = None,
+        p99: Optional[float] = None,
+        chunk_latency: float = 0.0,
+        stall_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        if (p50 is None) != (p99 is None) or (p50 is not None and not 0 < p50 <= p99):
+            raise ValueError("p50 and p99 go together, with 0 < p50 <= p99")
+        self.respond = respond
+        self.latency = latency
+        self.jitter = jitter
+        self.p50 = p50
+        self.p99 = p99
+        self.chunk_latency = chunk_latency
+        self.stall_rate = stall_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+    
+    @classmethod
+    def from_spec(cls, spec: str, respond: Callable[..., Any]) -> "FaultInjectingUpstream":
+        """Build from a settings string such as "latency=0.5,error_rate=0.2,hang_rate=0.05" """
+        options: Dict[str, float] = {}
+        for part in spec.split(","):
+            if not part.strip():
+                continue
+            key, _, value = part.partition("=")
+            key = key.strip()
+            if key not in FAULT_OPTIONS:
+                raise ValueError(f"Unknown fault injection option '{key}'")
+            options[key] = float(value)
+        if "seed" in options:
+            options["seed"] = int(options["seed"])
+        return cls(respond, **options)
+    
+    def delay(self) -> float:
+        """Sample one call's latency"""
+        if self._rng.random() < self.slow_rate:
+            return self.slow_latency
+        if self.p50 is not None:
+            sigma = (math.log(self.p99) - math.log(self.p50)) / _Z99
+            return self._rng.lognormvariate(math.log(self.p50), sigma)
+        return self.latency + self._rng.uniform(0, self.jitter)
+    
+    async def fault(self):
+        """Wait out one call's latency, then hang or fail as configured"""
+        self.calls += 1
+        roll = self._rng.random()
+        if roll < self.hang_rate:
+            # Held until the caller gives up and cancels
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delay())
+        if roll < self.hang_rate + self.error_rate:
+            raise UpstreamFault("Injected upstream failure")
+    
+    def stalls(self) -> bool:
+        """Whether the stream about to be sent should stop halfway"""
+        return self._rng.random() < self.stall_rate
+    
+    async def __call__(self, *args, **kwargs) -> Any:
+        await self.fault()
+        return self.respond(*args, **kwargs)
@@ -0,0 +1,209 @@
+"""
+Local stand-ins for the upstream APIs: Gemini, Google sign-in and Twilio SMS
+
+Each speaks enough of the real wire protocol for the app's own clients
+(and the same requests sent by curl or a load tool):
+
+    POST /v1beta/models/{model}:generateContent           Gemini
+    POST /v1beta/models/{model}:streamGenerateContent     Gemini, SSE with ?alt=sse
+    GET  /oauth2/v1/certs                                 Google ID token signing certificates
+    POST /2010-04-01/Accounts/{sid}/Messages.json         Twilio SMS
+
+plus two helpers for tests that have no real phone or Google account:
+
+    POST /stub/google/id-token    mint a signed ID token ({"sub", "email", "name", "aud"}, all optional)
+    GET  /stub/sms/messages       messages sent so far (?to= filters), newest last, to read OTP codes
+
+Latency, errors, hangs and streaming are shaped per upstream by the
+STUB_*_FAULTS settings, in the FaultInjectingUpstream option syntax.
+Run with `python run_stubs.py`.
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+import json
+import time
+import uuid
+
+from ..core.config import settings
+from .google_auth import STUB_CLIENT_ID
+from .stub_answers import paced, stream_chunks, stub_reply
+from .upstream import FaultInjectingUpstream, UpstreamFault
+
+SMS_HISTORY = 1000
+CERTS_MAX_AGE_SECONDS = 3600
+TOKEN_LIFETIME_SECONDS = 3600
+
+gemini = FaultInjectingUpstream.from_spec(settings.STUB_GEMINI_FAULTS, respond=stub_reply)
+google = FaultInjectingUpstream.from_spec(settings.STUB_GOOGLE_FAULTS, respond=lambda: None)
+twilio = FaultInjectingUpstream.from_spec(settings.STUB_SMS_FAULTS, respond=lambda: None)
+sent_messages: deque = deque(maxlen=SMS_HISTORY)
+
+stub_app = FastAPI(title="Upstream stubs", description="Local stand-ins for Gemini, Google sign-in and Twilio")
+
+@lru_cache(maxsize=1)
+def _signing_key() -> Tuple[str, str, str]:
+    """(key id, private key PEM, self-signed certificate PEM), made once per stub process"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "stub.accounts.google.com")])
+    now = datetime.now(timezone.utc)
+    cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(
+        key.public_key()
+    ).serial_number(x509.random_serial_number()).not_valid_before(now - timedelta(days=1)).not_valid_after(
+        now + timedelta(days=30)
+    ).sign(key, hashes.SHA256())
+    
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode("ascii")
+    return uuid.uuid4().hex, private_pem, cert.public_bytes(serialization.Encoding.PEM).decode("ascii")
+
+async def _faults(stub: FaultInjectingUpstream, error: JSONResponse) -> Optional[JSONResponse]:
+    """Apply one request's latency; the error response when this request should fail"""
+    try:
+        await stub.fault()
+    except UpstreamFault:
+        return error
+    return None
+
+def _gemini_error(code: int, status: str, message: str) -> JSONResponse:
+    return JSONResponse({"error": {"code": code, "message": message, "status": status}}, status_code=code)
+
+def _gemini_chunk(text: str, finished: bool) -> Dict[str, Any]:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate]}
+
+@stub_app.post("/v1beta/models/{model_method}")
+async def gemini_generate(model_method: str, request: Request):
+    """Gemini generateContent / streamGenerateContent"""
+    model, _, method = model_method.partition(":")
+    if method not in ("generateContent", "streamGenerateContent"):
+        return _gemini_error(404, "NOT_FOUND", f"Method {method or '(none)'} not found for model {model}")
+    try:
+        contents = (await request.json())["contents"]
+        prompt = "".join(part.get("text", "") for part in contents[-1]["parts"])
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return _gemini_error(400, "INVALID_ARGUMENT", "Request must contain contents with text parts")
+    
+    failed = await _faults(gemini, _gemini_error(503, "UNAVAILABLE", "The model is overloaded. Please try again later."))
+    if failed:
+        return failed
+    reply = gemini.respond(prompt)
+    if method == "generateContent":
+        return _gemini_chunk(reply, True)
+    
+    chunks = stream_chunks(reply)
+    sse = request.query_params.get("alt") == "sse"
+    
+    async def body():
+        position = 0
+        async for chunk in paced(gemini, chunks):
+            position += 1
+            event = json.dumps(_gemini_chunk(chunk, position == len(chunks)))
+            if sse:
+                yield f"data: {event}\r\n\r\n"
+            else:
+                # Without alt=sse the answer is one JSON array sent piece by piece
+                yield ("[" if position == 1 else ",\r\n") + event + ("]" if position == len(chunks) else "")
+    
+    return StreamingResponse(body(), media_type="text/event-stream" if sse else "application/json")
+
+@stub_app.get("/oauth2/v1/certs")
+async def google_certs():
+    """Google's ID token signing certificates, by key id"""
+    failed = await _faults(google, JSONResponse({"error": "backend_error"}, status_code=503))
+    if failed:
+        return failed
+    key_id, _, cert_pem = _signing_key()
+    return JSONResponse(
+        {key_id: cert_pem},
+        headers={"Cache-Control": f"public, max-age={CERTS_MAX_AGE_SECONDS}, must-revalidate, no-transform"}
+    )
+
+@stub_app.post("/stub/google/id-token")
+async def mint_id_token(request: Request):
+    """Sign an ID token the app accepts while its certs come from this stub"""
+    from google.auth import crypt, jwt
+    
+    claims = await request.json() if await request.body() else {}
+    key_id, private_pem, _ = _signing_key()
+    now = int(time.time())
+    sub = str(claims.get("sub") or uuid.uuid4().int % 10**21)
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": claims.get("aud") or settings.google_client_id or STUB_CLIENT_ID,
+        "sub": sub,
+        "email": claims.get("email") or f"stub-{sub}@example.com",
+        "email_verified": True,
+        "name": claims.get("name") or "Stub User",
+        "iat": now,
+        "exp": now + TOKEN_LIFETIME_SECONDS,
+    }
+    token = jwt.encode(crypt.RSASigner.from_string(private_pem, key_id), payload)
+    return {"id_token": token.decode("ascii"), "claims": payload}
+
+def _twilio_error(status: int, code: int, message: str) -> JSONResponse:
+    return JSONResponse(
+        {"code": code, "message": message, "more_info": f"https://www.twilio.com/docs/errors/{code}", "status": status},
+        status_code=status
+    )
+
+@stub_app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+async def twilio_send(account_sid: str, request: Request):
+    """Twilio Messages resource: queue one SMS"""
+    if not request.headers.get("authorization", "").startswith("Basic "):
+        return _twilio_error(401, 20003, "Authenticate")
+    form = await request.form()
+    to, sender, body = form.get("To", ""), form.get("From", ""), form.get("Body", "")
+    if not str(to).startswith("+"):
+        return _twilio_error(400, 21211, f"The 'To' number {to} is not a valid phone number.")
+    if not body:
+        return _twilio_error(400, 21602, "Message body is required.")
+    
+    failed = await _faults(twilio, _twilio_error(500, 20500, "Internal Server Error"))
+    if failed:
+        return failed
+    
+    now = format_datetime(datetime.now(timezone.utc), usegmt=False)
+    message = {
+        "sid": f"SM{uuid.uuid4().hex}",
+        "account_sid": account_sid,
+        "to": to,
+        "from": sender,
+        "body": body,
+        "status": "queued",
+        "num_segments": "1",
+        "direction": "outbound-api",
+        "date_created": now,
+        "date_updated": now,
+        "uri": f"/2010-04-01/Accounts/{account_sid}/Messages/{{sid}}.json",
+    }
+    message["uri"] = message["uri"].format(sid=message["sid"])
+    sent_messages.append(message)
+    return JSONResponse(message, status_code=201)
+
+@stub_app.get("/stub/sms/messages")
+async def list_sent_messages(to: Optional[str] = None, limit: int = 50):
+    """Messages the stub has accepted, newest last"""
+    messages = [message for message in sent_messages if to is None or message["to"] == to]
+    return {"messages": messages[-limit:]}
+
+@stub_app.get("/stub/health")
+async def stub_health():
+    """Fault settings in effect and calls served per upstream"""
+    return {
+        "gemini": {"faults": settings.STUB_GEMINI_FAULTS, "calls": gemini.calls},
+        "google": {"faults": settings.STUB_GOOGLE_FAULTS, "calls": google.calls},
+        "twilio": {"faults": settings.STUB_SMS_FAULTS, "calls": twilio.calls},
+    }
@@ -0,0 +1,192 @@
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import threading
+
+import numpy as np
+
+from ..core.config import settings
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise rows so a dot product is the cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k smallest distances per row, nearest first"""
+    if k < distances.shape[1]:
+        part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+    order = np.take_along_axis(distances, part, axis=1).argsort(axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+def _kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the vectors; returns normalised centroids"""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), n_lists * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        # Lists that lost every point keep their previous centroid
+        filled = np.bincount(assign, minlength=n_lists) > 0
+        centroids[filled] = normalize(sums[filled])
+    return centroids
+
+class VectorIndex:
+    """In-memory nearest-neighbour index over reference embeddings (cosine distance)
+    
+    The references live in one normalised float32 matrix and a batch of
+    queries is answered with one matrix product per block of references.
+    From `ivf_threshold` vectors on, an inverted file (k-means coarse
+    quantiser) is built as well and each query only scans its `n_probe`
+    closest lists.
+    """
+    
+    block_size = 32768
+    
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        labels: Sequence[str],
+        ivf_threshold: int = 50_000,
+        n_probe: int = 8,
+        n_lists: Optional[int] = None,
+        tensor: Optional[str] = None,
+    ):
+        if len(vectors) != len(labels):
+            raise ValueError(f"{len(vectors)} vectors but {len(labels)} labels")
+        if not len(vectors):
+            raise ValueError("A vector index needs at least one reference vector")
+        
+        self.vectors = normalize(vectors)
+        self.classes, self.codes = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+        self.dim = self.vectors.shape[1]
+        self.n_probe = n_probe
+        # The model tensor the references were embedded with
+        self.tensor = tensor
+        
+        # Mean embedding per class, for class-to-class similarity
+        sums = np.zeros((len(self.classes), self.dim), dtype=np.float32)
+        np.add.at(sums, self.codes, self.vectors)
+        self.class_centroids = normalize(sums)
+        
+        self.centroids = None
+        if len(self.vectors) >= ivf_threshold:
+            self._build_ivf(n_lists or int(np.sqrt(len(self.vectors))))
+    
+    def __len__(self) -> int:
+        return len(self.vectors)
+    
+    def _build_ivf(self, n_lists: int):
+        self.centroids = _kmeans(self.vectors, n_lists)
+        assign = np.concatenate([
+            np.argmax(self.vectors[start:start + self.block_size] @ self.centroids.T, axis=1)
+            for start in range(0, len(self.vectors), self.block_size)
+        ])
+        # Store each list contiguously: list l is rows offsets[l]:offsets[l + 1] of list_vectors
+        self.list_order = np.argsort(assign, kind="stable")
+        self.list_vectors = self.vectors[self.list_order]
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=n_lists))))
+    
+    def _search_exact(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_d = np.empty((len(queries), 0), dtype=np.float32)
+        best_i = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.vectors), self.block_size):
+            block = 1.0 - queries @ self.vectors[start:start + self.block_size].T
+            cols = _top_k(block, min(k, block.shape[1]))
+            # Merge this block's best with the running best
+            best_d = np.concatenate((best_d, np.take_along_axis(block, cols, axis=1)), axis=1)
+            best_i = np.concatenate((best_i, cols + start), axis=1)
+            keep = _top_k(best_d, min(k, best_d.shape[1]))
+            best_d = np.take_along_axis(best_d, keep, axis=1)
+            best_i = np.take_along_axis(best_i, keep, axis=1)
+        return best_d, best_i
+    
+    def _search_ivf(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = _top_k(1.0 - queries @ self.centroids.T, n_probe)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        starts, ends = self.list_offsets[probes], self.list_offsets[probes + 1]
+        for row, query in enumerate(queries):
+            rows = np.concatenate([np.arange(s, e) for s, e in zip(starts[row], ends[row])])
+            if not len(rows):
+                continue
+            found = 1.0 - self.list_vectors[rows] @ query
+            best = _top_k(found[np.newaxis, :], min(k, len(rows)))[0]
+            distances[row, :len(best)] = found[best]
+            indices[row, :len(best)] = self.list_order[rows[best]]
+        return distances, indices
+    
+    def search(self, queries: np.ndarray, k: int = 10, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """k nearest references for each query row: (cosine distances, reference indices)
+        
+        Rows with fewer than k candidates (IVF only) are padded with inf / -1.
+        """
+        queries = normalize(np.atleast_2d(queries))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query has {queries.shape[1]} dimensions, index has {self.dim}")
+        k = min(k, len(self.vectors))
+        if self.centroids is None or exact:
+            distances, indices = self._search_exact(queries, k)
+        else:
+            distances, indices = self._search_ivf(queries, k)
+        # float32 rounding can push identical vectors just below zero
+        return np.maximum(distances, 0.0), indices
+    
+    def nearest(self, queries: np.ndarray, k: int = 10) -> List[List[Tuple[str, float]]]:
+        """(class name, distance) of the k nearest references for each query"""
+        distances, indices = self.search(queries, k)
+        return [
+            [(str(self.classes[self.codes[i]]), float(d)) for d, i in zip(row_d, row_i) if i >= 0]
+            for row_d, row_i in zip(distances, indices)
+        ]
+    
+    def similar_classes(self, class_name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Other classes ranked by the distance between their mean embeddings"""
+        matches = np.flatnonzero(self.classes == class_name)
+        if not len(matches):
+            return []
+        distances = 1.0 - self.class_centroids @ self.class_centroids[matches[0]]
+        order = [i for i in np.argsort(distances, kind="stable") if i != matches[0]]
+        return [(str(self.classes[i]), float(distances[i])) for i in order[:limit]]
+
+def save_reference_embeddings(path: str, vectors: np.ndarray, labels: Sequence[str], tensor: str):
+    """Write reference embeddings for the index to an .npz file, with the model tensor they came from"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(path, vectors=normalize(vectors), labels=np.asarray(labels, dtype=str), tensor=np.asarray(tensor))
+
+_index: Optional[VectorIndex] = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+def reference_index() -> Optional[VectorIndex]:
+    """The process-wide index of reference embeddings, or None if none have been built
+    
+    Loaded from REFERENCE_EMBEDDINGS_PATH on first use; rebuild the file with
+    `python manage.py build-embeddings` and restart workers to pick it up.
+    """
+    global _index, _index_loaded
+    if _index_loaded:
+        return _index
+    with _index_lock:
+        if not _index_loaded:
+            path = Path(settings.REFERENCE_EMBEDDINGS_PATH)
+            data = np.load(path) if path.exists() else None
+            if data is not None and "tensor" not in data:
+                # Files from before embeddings required a model tensor hold pooled-pixel vectors
+                print(f"Ignoring {path}: not built from a model embedding tensor; rerun build-embeddings")
+            elif data is not None:
+                _index = VectorIndex(
+                    data["vectors"],
+                    data["labels"],
+                    ivf_threshold=settings.VECTOR_INDEX_IVF_THRESHOLD,
+                    n_probe=settings.VECTOR_INDEX_IVF_PROBES,
+                    tensor=str(data["tensor"]),
+                )
+                print(f"Loaded {len(_index)} reference embeddings ({len(_index.classes)} classes, tensor {_index.tensor})")
+            _index_loaded = True
+    return _index
@@ -0,0 +1,174 @@
+"""
+Benchmark: /api/scan/analyze traffic at twice the inference capacity
+Drives the real analyze route in-process (httpx over ASGI, so uploads are
+parsed, decoded, resized and classified exactly as in production) with
+scans arriving faster than this machine can serve them. Capacity is
+measured first with a fixed number of clients scanning back to back. Compares the app without
+admission control (every request queues for an inference thread) against
+the same app wrapped in AdmissionMiddleware. Reports goodput (responses the
+client still waited for), latency of served requests and the peak number
+of requests in flight at once.
+
+Run from the backend directory:
+    python benchmarks/bench_admission.py
+"""
+import asyncio
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+BENCH_DIR = tempfile.mkdtemp(prefix="edtech_admission_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DIR}/app.db")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+os.environ.setdefault("TRACING_SLOW_REQUEST_MS", "0")
+# The middleware is applied below, so the two runs share one app
+os.environ["ADMISSION_ENABLED"] = "False"
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx
+from PIL import Image
+
+from app.core.admission import AdmissionController, AdmissionMiddleware
+from app.core.database import Base, SessionLocal, engine
+from app.core.security import create_access_token
+from app.main import app
+from app.api.scan import tflite_model
+from app.services.catalog_loader import load_catalog, read_catalog
+
+OVERLOAD = 2.0              # offered rate as a multiple of measured capacity
+DURATION_SECONDS = 10
+CLIENT_TIMEOUT_SECONDS = 3  # clients give up after this
+CALIBRATION_SECONDS = 2
+CALIBRATION_CLIENTS = 8
+IMAGE_SIZE = (1280, 960)    # a phone photo after the client's own downscale
+AUTHENTICATED_SHARE = 0.3
+
+def setup() -> bytes:
+    """Schema, sample catalog and one JPEG upload"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        load_catalog(db, read_catalog(str(BACKEND_DIR / "data" / "catalog" / "sample_equipment.json")))
+    finally:
+        db.close()
+    
+    width, height = IMAGE_SIZE
+    image = Image.linear_gradient("L").resize(IMAGE_SIZE).convert("RGB")
+    image.paste((40, 120, 200), (width // 4, height // 4, width // 2, height // 2))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+class Run:
+    def __init__(self, asgi_app, upload: bytes, token: str):
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=asgi_app), base_url="http://bench", timeout=None
+        )
+        self.upload = upload
+        self.token = token
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.served = {"authenticated": [], "anonymous": []}
+        self.statuses = Counter()
+        self.late = 0
+    
+    async def scan(self, authenticated: bool) -> int:
+        headers = {"Authorization": f"Bearer {self.token}"} if authenticated else {}
+        response = await self.client.post(
+            "/api/scan/analyze", files={"image": ("scan.jpg", self.upload, "image/jpeg")}, headers=headers
+        )
+        return response.status_code
+    
+    async def request(self, authenticated: bool):
+        started = time.monotonic()
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            status = await self.scan(authenticated)
+        finally:
+            self.in_flight -= 1
+        elapsed = time.monotonic() - started
+        self.statuses[status] += 1
+        if status == 503:
+            return
+        if elapsed > CLIENT_TIMEOUT_SECONDS:
+            self.late += 1
+        else:
+            self.served["authenticated" if authenticated else "anonymous"].append(elapsed)
+    
+    async def drive(self, arrival_rate: float):
+        """Offer scans for DURATION_SECONDS; returns (requests sent, seconds until the last finished)"""
+        rng = random.Random(1)
+        tasks = []
+        started = arrival = time.monotonic()
+        deadline = arrival + DURATION_SECONDS
+        while arrival < deadline:
+            tasks.append(asyncio.create_task(self.request(rng.random() < AUTHENTICATED_SHARE)))
+            # Arrivals keep to schedule even when the shared event loop falls behind
+            arrival += rng.expovariate(arrival_rate)
+            await asyncio.sleep(max(0.0, arrival - time.monotonic()))
+        await asyncio.gather(*tasks)
+        await self.client.aclose()
+        return len(tasks), time.monotonic() - started
+
+async def capacity(upload: bytes, token: str) -> float:
+    """Scans per second with the route saturated by clients scanning back to back"""
+    run = Run(app, upload, token)
+    await run.scan(False)  # builds the interpreters
+    started = time.monotonic()
+    
+    async def client():
+        scans = 0
+        while time.monotonic() - started < CALIBRATION_SECONDS:
+            await run.scan(False)
+            scans += 1
+        return scans
+    
+    scans = sum(await asyncio.gather(*(client() for _ in range(CALIBRATION_CLIENTS))))
+    elapsed = time.monotonic() - started
+    await run.client.aclose()
+    return scans / elapsed
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+def report(name, run, result):
+    total, elapsed = result
+    served = run.served["authenticated"] + run.served["anonymous"]
+    print(f"{name}")
+    print(f"  goodput {len(served) / elapsed:5.1f}/s of {total / DURATION_SECONDS:.0f}/s offered, "
+          f"{run.late} timed out on the client, {run.statuses[503]} shed with 503")
+    print(f"  served latency p50 {percentile(served, 0.5) * 1000:6.0f} ms, p99 {percentile(served, 0.99) * 1000:6.0f} ms")
+    for label, latencies in run.served.items():
+        print(f"  {label:<14} served {len(latencies):5d}")
+    print(f"  statuses {dict(sorted(run.statuses.items()))}")
+    print(f"  peak requests in flight {run.peak_in_flight}\n")
+
+async def main():
+    upload = setup()
+    token = create_access_token({"sub": "bench-user"})
+    stages = " -> ".join(stage.name for stage in tflite_model.stages) or "mock predictions"
+    rate = await capacity(upload, token)
+    print(f"Model: {stages}; capacity {rate:.0f} scans/s with {CALIBRATION_CLIENTS} clients")
+    print(f"{rate * OVERLOAD:.0f}/s offered for {DURATION_SECONDS}s ({BENCH_DIR})\n")
+    
+    unbounded = Run(app, upload, token)
+    report("unbounded queue", unbounded, await unbounded.drive(rate * OVERLOAD))
+    admitted = AdmissionMiddleware(
+        app, paths=["/api/scan/analyze"],
+        controller=AdmissionController(initial_limit=4, max_queue=32, queue_timeout=2.0)
+    )
+    controlled = Run(admitted, upload, token)
+    report("admission control", controlled, await controlled.drive(rate * OVERLOAD))
+
+if __name__ == "__main__":
+    asyncio.run(main())
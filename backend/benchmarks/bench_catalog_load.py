@@ -0,0 +1,103 @@
+"""
+Benchmark: seeding the equipment catalog
+Compares the old seeding path (one ORM `db.add` per item, as run_dev.py
+used to do) against the bulk catalog loader reading NDJSON and CSV files.
+
+Run from the backend directory:
+    python benchmarks/bench_catalog_load.py [rows]
+"""
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = tempfile.mkdtemp(prefix="edtech_catalog_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DIR}/app.db")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.core.sqlite import configure_sqlite_engine, sqlite_connect_args
+from app.models.equipment import Equipment
+from app.services.catalog_loader import read_catalog, load_catalog
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+# The per-row ORM path is timed on a slice and reported as a rate
+ORM_ROWS = min(ROWS, 10_000)
+
+def item(i):
+    return {
+        "class_name": f"item-{i:06d}",
+        "name_en": f"Equipment {i}",
+        "name_km": f"ឧបករណ៍ {i}",
+        "category": f"Category {i % 40}",
+        "description_en": "A piece of laboratory equipment used in school science lessons " * 2,
+        "usage_en": "Used during practical experiments under teacher supervision",
+        "safety_info_en": "Wear goggles and follow the teacher's instructions",
+        "tags": ["lab", f"group-{i % 12}"],
+    }
+
+def write_files():
+    ndjson_path = os.path.join(BENCH_DIR, "catalog.ndjson")
+    with open(ndjson_path, "w", encoding="utf-8") as f:
+        for i in range(ROWS):
+            f.write(json.dumps(item(i), ensure_ascii=False) + "\n")
+    
+    csv_path = os.path.join(BENCH_DIR, "catalog.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(item(0)))
+        writer.writeheader()
+        for i in range(ROWS):
+            row = item(i)
+            row["tags"] = "|".join(row["tags"])
+            writer.writerow(row)
+    return ndjson_path, csv_path
+
+def fresh_session(name):
+    engine = configure_sqlite_engine(create_engine(
+        f"sqlite:///{BENCH_DIR}/{name}.db", connect_args=sqlite_connect_args()
+    ))
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+def orm_path():
+    db = fresh_session("orm")
+    started = time.perf_counter()
+    for i in range(ORM_ROWS):
+        db.add(Equipment(**item(i)))
+    db.commit()
+    db.close()
+    return time.perf_counter() - started
+
+def loader_path(name, path):
+    db = fresh_session(name)
+    started = time.perf_counter()
+    inserted = load_catalog(db, read_catalog(path))
+    elapsed = time.perf_counter() - started
+    db.close()
+    assert inserted == ROWS, f"expected {ROWS} rows, loaded {inserted}"
+    return elapsed
+
+def main():
+    ndjson_path, csv_path = write_files()
+    print(f"Seeding {ROWS:,} equipment rows into SQLite\n")
+    
+    orm_elapsed = orm_path()
+    orm_rate = ORM_ROWS / orm_elapsed
+    print(f"{'ORM db.add per item':<28} {orm_rate:10,.0f} rows/s  (~{ROWS / orm_rate:6.1f}s for {ROWS:,})")
+    
+    for name, path in (("bulk loader (NDJSON)", ndjson_path), ("bulk loader (CSV)", csv_path)):
+        elapsed = loader_path(name.split("(")[1].rstrip(")").lower(), path)
+        rate = ROWS / elapsed
+        print(f"{name:<28} {rate:10,.0f} rows/s  ({elapsed:6.1f}s, {rate / orm_rate:4.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Benchmark: bytes on the wire and server CPU per request by encoding
+Fills a database with the sample catalog and a long scan history, then
+calls the app in-process (no sockets, one request at a time, so process
+CPU time is the server's) for each format and content coding:
+GET /api/scan/history (long enough to be streamed), GET /api/equipment/list
+and POST /api/scan/sync with a batch of scans in the request body. Formats
+whose library (msgpack, cbor2, zstandard) is missing are skipped.
+
+Run from the backend directory:
+    python benchmarks/bench_encoding.py
+"""
+import asyncio
+import gzip
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlencode
+from uuid import UUID, uuid4
+
+BENCH_DIR = tempfile.mkdtemp(prefix="edtech_encoding_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DIR}/app.db")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import orjson
+from pydantic import TypeAdapter
+
+from app.core import negotiation
+from app.core.database import Base, SessionLocal, engine
+from app.main import app
+from app.models.equipment import Equipment
+from app.schemas.scan import ScanMetadataCreate
+from app.services.catalog_loader import load_catalog, read_catalog
+
+HISTORY_ROWS = 1000
+SYNC_BATCH = 100
+REPEATS = 50
+USER_ID = uuid4()
+
+def setup():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        load_catalog(db, read_catalog(str(BACKEND_DIR / "data" / "catalog" / "sample_equipment.json")))
+        equipment_ids = [UUID(row.equipment_id) for row in db.query(Equipment.equipment_id)]
+    finally:
+        db.close()
+    return equipment_ids
+
+def scan_batch(equipment_ids, count, start):
+    return [
+        {
+            "user_id": USER_ID,
+            "equipment_id": equipment_ids[i % len(equipment_ids)],
+            "confidence_score": 0.5 + (i % 50) / 100,
+            "device_info": {"platform": "android", "model": "SM-A125F", "app_version": "1.4.2"},
+            "scanned_at": start + timedelta(seconds=37 * i),
+        }
+        for i in range(count)
+    ]
+
+def encode_request(rows, media_type):
+    """Client side of a sync upload in the given format"""
+    if media_type == negotiation.MSGPACK:
+        return negotiation.msgpack.packb(rows, default=negotiation._msgpack_default, datetime=True)
+    if media_type == negotiation.CBOR:
+        return negotiation.cbor2.dumps(rows, datetime_as_timestamp=True, timezone=timezone.utc)
+    return orjson.dumps(rows)
+
+def compress(body, encoding):
+    if encoding == "zstd":
+        return negotiation.zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, 6)
+    return body
+
+async def call(method, path, query=None, headers=None, body=b""):
+    """One request straight into the ASGI app; returns (status, body bytes as sent)"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(query or {}).encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status, chunks = None, []
+    
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+    
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+    
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+async def measure(method, path, query=None, headers=None, body_for=None):
+    """Median server CPU per request and the size of the last response"""
+    cpu, size = [], 0
+    for repeat in range(REPEATS):
+        body = body_for(repeat) if body_for else b""
+        started = time.process_time()
+        status, response = await call(method, path, query, headers, body)
+        cpu.append(time.process_time() - started)
+        if status != 200:
+            raise RuntimeError(f"{method} {path} returned {status}: {response[:200]!r}")
+        size = len(response)
+    return statistics.median(cpu) * 1000, size
+
+def encode_cpu(media_type, encoding, run):
+    """Mean CPU the server spent encoding and compressing responses during `run`"""
+    labels = {"format": media_type, "encoding": encoding}
+    before = negotiation.encode_seconds.total(labels), negotiation.encode_seconds.count(labels)
+    result = run()
+    spent = negotiation.encode_seconds.total(labels) - before[0]
+    count = negotiation.encode_seconds.count(labels) - before[1]
+    return result, spent / max(count, 1) * 1000
+
+def decode_cpu(body, media_type, encoding):
+    """Mean CPU to undo a request body's coding and format and validate the scans"""
+    adapter = TypeAdapter(list[ScanMetadataCreate])
+    started = time.thread_time()
+    for _ in range(REPEATS):
+        data = negotiation._decompress(body, encoding) if encoding != "identity" else body
+        adapter.validate_python(
+            negotiation._decode(data, media_type) if media_type != negotiation.JSON else orjson.loads(data)
+        )
+    return (time.thread_time() - started) / REPEATS * 1000
+
+def representations():
+    for media_type in negotiation.formats():
+        for encoding in ["identity"] + negotiation.encodings():
+            yield media_type, encoding
+
+def report(title, codec, rows):
+    print(title)
+    baseline_bytes = rows[0][2]
+    for media_type, encoding, size, cpu, codec_cpu in rows:
+        print(
+            f"  {media_type:20} {encoding:8} {size:9,} bytes ({size / baseline_bytes:6.1%})  "
+            f"request {cpu:6.2f} ms CPU, {codec} {codec_cpu:5.2f} ms"
+        )
+    print()
+
+def main():
+    equipment_ids = setup()
+    start = datetime(2026, 1, 1)
+    # Populate the history through the endpoint itself
+    asyncio.run(call(
+        "POST", "/api/scan/sync", headers={"Content-Type": "application/json"},
+        body=encode_request(scan_batch(equipment_ids, HISTORY_ROWS, start), negotiation.JSON)
+    ))
+    print(f"{HISTORY_ROWS} history rows, {len(equipment_ids)} catalog items, sync batches of {SYNC_BATCH}, "
+          f"median of {REPEATS} requests\n")
+    
+    for title, path, query in [
+        (f"GET /api/scan/history ({HISTORY_ROWS} scans, streamed)", "/api/scan/history",
+         {"user_id": str(USER_ID), "limit": HISTORY_ROWS}),
+        ("GET /api/equipment/list (whole sample catalog)", "/api/equipment/list", {"limit": 100}),
+    ]:
+        rows = []
+        for media_type, encoding in representations():
+            headers = {"Accept": media_type, "Accept-Encoding": encoding}
+            (cpu, size), codec_cpu = encode_cpu(
+                media_type, encoding, lambda: asyncio.run(measure("GET", path, query, headers))
+            )
+            rows.append((media_type, encoding, size, cpu, codec_cpu))
+        report(title, "encoding", rows)
+    
+    rows = []
+    batch_start = [start + timedelta(days=400)]
+    for media_type, encoding in representations():
+        def body_for(repeat):
+            # Fresh scans every time so each request inserts a full batch
+            batch_start[0] += timedelta(days=1)
+            rows = scan_batch(equipment_ids, SYNC_BATCH, batch_start[0])
+            return compress(encode_request(rows, media_type), encoding)
+        headers = {"Content-Type": media_type, "Accept": media_type}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        body = body_for(0)
+        cpu, _ = asyncio.run(measure("POST", "/api/scan/sync", headers=headers, body_for=body_for))
+        rows.append((media_type, encoding, len(body), cpu, decode_cpu(body, media_type, encoding)))
+    report(f"POST /api/scan/sync ({SYNC_BATCH} scans, request body bytes)", "decoding", rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: faceted catalog queries against the in-memory inverted index
+Builds a synthetic catalog (skewed category and tag frequencies, a few tags
+per item) and times browse queries with facet counts against the same
+filtering done row by row over already-deserialized tag lists, which is
+the best a query that decodes the JSON `tags` column could do.
+
+Run from the backend directory:
+    python benchmarks/bench_facets.py [items]
+"""
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.services.catalog_facets import FacetIndex
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+CATEGORIES = 40
+TAGS = 500
+TAGS_PER_ITEM = 4
+REPEATS = 200
+
+QUERIES = [
+    ("no filter", [], [], True),
+    ("one category", ["category-1"], [], True),
+    ("two tags, all", [], ["tag-0", "tag-1"], True),
+    ("three tags, any", [], ["tag-2", "tag-10", "tag-40"], False),
+    ("category + two tags, all", ["category-0", "category-3"], ["tag-0", "tag-5"], True),
+]
+
+def catalog(rng):
+    # Zipf-like popularity, so a few categories and tags cover most items
+    categories = rng.zipf(1.5, ITEMS) % CATEGORIES
+    tags = rng.zipf(1.3, (ITEMS, TAGS_PER_ITEM)) % TAGS
+    return [
+        (f"{i:08d}-0000-0000-0000-000000000000", f"category-{categories[i]}",
+         [f"tag-{tag}" for tag in tags[i]], f"Item {rng.integers(1_000_000)}")
+        for i in range(ITEMS)
+    ]
+
+def row_scan(rows, categories, tags, match_all, limit=50):
+    """Filter and count facets one row at a time"""
+    wanted_categories, wanted_tags = set(categories), set(tags)
+    tagged = []
+    for row in rows:
+        row_tags = set(row[2])
+        if wanted_tags and not (wanted_tags <= row_tags if match_all else wanted_tags & row_tags):
+            continue
+        tagged.append(row)
+    category_counts = Counter(row[1] for row in tagged)
+    result = [row for row in tagged if not wanted_categories or row[1] in wanted_categories]
+    tag_counts = Counter(tag for row in result for tag in set(row[2]))
+    page = sorted(result, key=lambda row: (row[3].casefold(), row[0]))[:limit]
+    return len(result), [row[0] for row in page], category_counts, tag_counts
+
+def timed(fn, repeat=REPEATS):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+def main():
+    rng = np.random.default_rng(11)
+    rows = catalog(rng)
+    index = FacetIndex()
+    
+    started = time.perf_counter()
+    index.load(rows)
+    print(f"{ITEMS:,} items, {CATEGORIES} categories, {TAGS} tags: full build {time.perf_counter() - started:.3f} s\n")
+    
+    print(f"{'query':28} {'matches':>8} {'index':>10} {'row scan':>10}")
+    for name, categories, tags, match_all in QUERIES:
+        index_time, result = timed(lambda: index.browse(categories, tags, match_all, facet_limit=TAGS))
+        scan_time, (total, page, _, _) = timed(lambda: row_scan(rows, categories, tags, match_all), repeat=5)
+        # Both paths must agree on the results and their order
+        assert result.total == total and result.equipment_ids == page, name
+        print(f"{name:28} {total:8,} {index_time * 1e6:8.0f} us {scan_time * 1e3:7.1f} ms")
+    
+    # Incremental updates, as applied after a catalog write
+    started = time.perf_counter()
+    for i in range(1000):
+        equipment_id, category, tags, item_name = rows[i]
+        index.put(equipment_id, category, tags[:-1] + ["tag-new"], item_name)
+    print(f"\n1000 single-row updates: {(time.perf_counter() - started) / 1000 * 1e6:.0f} us each")
+    
+    # The first page read after a change re-sorts the name order once
+    first, _ = timed(lambda: index.browse([], ["tag-new"], True), repeat=1)
+    after, _ = timed(lambda: index.browse([], ["tag-new"], True))
+    print(f"Query after updates: first {first * 1e3:.1f} ms, then {after * 1e6:.0f} us median")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmark: worker memory and startup, independent processes vs preforked
+Starts N workers the way `uvicorn --workers N` does (each a fresh
+interpreter that imports the app and loads its own reference embeddings
+and catalog responses) and the way run_prod.py does (one master preloads,
+freezes the heap and forks). Each worker then serves a few scans. Reports
+RSS, PSS (shared pages divided between the processes sharing them) and
+private memory per worker, total PSS and the time until every worker was
+ready. Linux only (reads /proc/<pid>/smaps_rollup).
+
+Run from the backend directory:
+    python benchmarks/bench_prefork.py [workers]
+"""
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = tempfile.mkdtemp(prefix="edtech_prefork_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DIR}/app.db")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+os.environ.setdefault("REFERENCE_EMBEDDINGS_PATH", f"{BENCH_DIR}/reference_embeddings.npz")
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+ARGS = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+WORKERS = int(ARGS[0]) if ARGS else 4
+REFERENCE_VECTORS = 200_000
+SCANS_PER_WORKER = 20
+
+def setup():
+    """Schema, sample catalog and a synthetic reference embedding file shared by both runs"""
+    import numpy as np
+    from app.core.database import Base, SessionLocal, engine
+    from app.services.catalog_loader import load_catalog, read_catalog
+    from app.services.vector_index import save_reference_embeddings
+    
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        load_catalog(db, read_catalog(str(BACKEND_DIR / "data" / "catalog" / "sample_equipment.json")))
+    finally:
+        db.close()
+    engine.dispose()
+    rng = np.random.default_rng(0)
+    labels = [f"class-{i % 40}" for i in range(REFERENCE_VECTORS)]
+    save_reference_embeddings(os.environ["REFERENCE_EMBEDDINGS_PATH"], rng.standard_normal((REFERENCE_VECTORS, 64)), labels, "bench")
+
+def preload():
+    """What run_prod.py loads in the master (and what every independent worker loads itself)"""
+    from app.api.scan import tflite_model
+    from app.core.database import SessionLocal, engine
+    from app.models.equipment import Equipment
+    from app.services.scan_renderer import scan_renderer
+    from app.services.vector_index import reference_index
+    
+    reference_index()
+    db = SessionLocal()
+    try:
+        scan_renderer.warm(db.query(Equipment).all(), [stage.name for stage in tflite_model.stages] or ["mock"])
+    finally:
+        db.close()
+    engine.dispose()
+
+def serve_scans():
+    """Per-worker work after startup: interpreters, a few scans and similarity lookups"""
+    import numpy as np
+    from uuid import uuid4
+    from app.api.scan import tflite_model
+    from app.core.database import SessionLocal
+    from app.models.equipment import Equipment
+    from app.services.scan_renderer import scan_renderer
+    from app.services.vector_index import reference_index
+    
+    tflite_model.load_interpreters()
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 255, (224, 224, 3), dtype=np.uint8)
+    # The mock model has no embedding tensor, so similarity queries use synthetic vectors
+    queries = rng.standard_normal((SCANS_PER_WORKER, 64)).astype(np.float32)
+    db = SessionLocal()
+    try:
+        equipment = db.query(Equipment).all()
+        for i in range(SCANS_PER_WORKER):
+            prediction = tflite_model.predict_array(pixels)
+            reference_index().nearest(queries[i], k=5)
+            scan_renderer.render(equipment[i % len(equipment)], "en", uuid4(), prediction["confidence"], prediction["stage"])
+    finally:
+        db.close()
+
+def worker_main():
+    """Entry point of an independently started worker"""
+    import app.main  # noqa: F401
+    preload()
+    serve_scans()
+    print("ready", flush=True)
+    sys.stdin.read()
+
+def master_main():
+    """Entry point of a preforking master: preload, freeze, fork the workers"""
+    gc.disable()
+    started = time.monotonic()
+    import app.main  # noqa: F401
+    preload()
+    gc.collect()
+    children = []
+    for _ in range(WORKERS):
+        ready_r, ready_w = os.pipe()
+        gc.freeze()
+        pid = os.fork()
+        if pid == 0:
+            gc.enable()
+            serve_scans()
+            os.write(ready_w, b"1")
+            sys.stdin.read()
+            os._exit(0)
+        children.append((pid, ready_r))
+    for _, ready_r in children:
+        os.read(ready_r, 1)
+    print(f"ready {time.monotonic() - started} {' '.join(str(pid) for pid, _ in children)}", flush=True)
+    sys.stdin.read()
+    for pid, _ in children:
+        os.waitpid(pid, 0)
+
+def start(mode):
+    return subprocess.Popen(
+        [sys.executable, __file__, mode, str(WORKERS)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=str(BACKEND_DIR)
+    )
+
+def wait_ready(process):
+    """Skip startup output up to the worker's ready line"""
+    for line in process.stdout:
+        if line.startswith("ready"):
+            return line.split()[1:]
+    raise RuntimeError(f"Process {process.pid} exited before it was ready")
+
+def measure(pids):
+    from app.core.prefork import memory_usage
+    return {pid: memory_usage(pid) for pid in pids}
+
+def report(name, usage, workers, elapsed):
+    print(name)
+    for pid in workers:
+        u = usage[pid]
+        print(f"  worker {pid}: RSS {u['rss']:6.0f} MiB  PSS {u['pss']:6.0f} MiB  private {u['private']:6.0f} MiB")
+    total = sum(u["pss"] for u in usage.values())
+    print(f"  total PSS {total:.0f} MiB across {len(usage)} processes, all workers ready in {elapsed:.2f}s\n")
+    return total
+
+def independent():
+    started = time.monotonic()
+    processes = [start("--worker") for _ in range(WORKERS)]
+    for process in processes:
+        wait_ready(process)
+    elapsed = time.monotonic() - started
+    pids = [process.pid for process in processes]
+    usage = measure(pids)
+    for process in processes:
+        process.stdin.close()
+        process.wait()
+    return report("independent workers (uvicorn --workers)", usage, pids, elapsed)
+
+def preforked():
+    master = start("--master")
+    elapsed, *pids = wait_ready(master)
+    pids = [int(pid) for pid in pids]
+    usage = measure([master.pid] + pids)
+    master.stdin.close()
+    master.wait()
+    return report("preforked from a preloaded master (run_prod.py)", usage, pids, float(elapsed))
+
+def main():
+    setup()
+    print(f"{WORKERS} workers, {REFERENCE_VECTORS:,} reference embeddings, {SCANS_PER_WORKER} scans each\n")
+    before = independent()
+    after = preforked()
+    print(f"total PSS {before:.0f} MiB -> {after:.0f} MiB ({1 - after / before:.0%} less)")
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        worker_main()
+    elif "--master" in sys.argv:
+        master_main()
+    else:
+        main()
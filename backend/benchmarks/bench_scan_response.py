@@ -0,0 +1,86 @@
+"""
+Benchmark: scan analysis response serialization
+Compares building ScanAnalysisResponse through pydantic + JSONResponse on every
+scan against the pre-rendered per-equipment body with spliced per-scan fields.
+
+Run from the backend directory:
+    python benchmarks/bench_scan_response.py
+"""
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/edtech_bench.db")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.responses import JSONResponse
+
+from app.models.equipment import Equipment
+from app.schemas.scan import ScanAnalysisResponse
+from app.services.scan_renderer import ScanResponseRenderer
+
+ITERATIONS = 50_000
+
+equipment = Equipment(
+    equipment_id=str(uuid4()),
+    class_name="microscope",
+    name_en="Compound Microscope",
+    name_km="មីក្រូទស្សន៍",
+    category="Microscopy",
+    description_en="An optical instrument with multiple lenses for magnifying small objects " * 3,
+    description_km="ឧបករណ៍អុបទិកដែលមានកញ្ចក់ច្រើនសម្រាប់ពង្រីកវត្ថុតូចៗ " * 3,
+    usage_en="Used to observe cells, microorganisms, and other tiny specimens in detail " * 3,
+    usage_km="ប្រើសម្រាប់សង្កេតកោសិកា និងអតិសុខុមប្រាណ " * 3,
+    safety_info_en="Handle with care, avoid touching lenses, use proper lighting",
+    image_url="https://example.com/microscope.jpg",
+    tags=["optical", "magnification", "biology"],
+    updated_at=datetime.utcnow()
+)
+
+def pydantic_path():
+    """What analyze_image did before: validate the model, then let FastAPI encode it"""
+    response = ScanAnalysisResponse(
+        scan_id=uuid4(),
+        equipment_id=equipment.equipment_id,
+        equipment_name=equipment.name_en,
+        class_name=equipment.class_name,
+        confidence_score=0.9132,
+        category=equipment.category,
+        description=equipment.description_en,
+        usage=equipment.usage_en,
+        safety_info=equipment.safety_info_en,
+        image_url=equipment.image_url,
+        tags=equipment.tags or []
+    )
+    # FastAPI re-validates against response_model and dumps through JSONResponse
+    validated = ScanAnalysisResponse.model_validate(response.model_dump())
+    return JSONResponse(validated.model_dump(mode="json")).body
+
+renderer = ScanResponseRenderer()
+
+def renderer_path(language="en"):
+    return renderer.render(equipment, language, uuid4(), 0.9132)
+
+def main():
+    print(f"Serializing {ITERATIONS:,} scan responses\n")
+    
+    results = {
+        "pydantic + JSONResponse": timeit.timeit(pydantic_path, number=ITERATIONS),
+        "pre-rendered (en)": timeit.timeit(renderer_path, number=ITERATIONS),
+        "pre-rendered (km)": timeit.timeit(lambda: renderer_path("km"), number=ITERATIONS),
+    }
+    
+    baseline = results["pydantic + JSONResponse"]
+    for name, elapsed in results.items():
+        per_call_us = elapsed / ITERATIONS * 1e6
+        print(f"{name:<26} {per_call_us:8.2f} us/response  ({baseline / elapsed:5.1f}x)")
+
+if __name__ == "__main__":
+    main()
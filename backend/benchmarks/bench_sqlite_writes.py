@@ -0,0 +1,190 @@
+"""
+Benchmark: concurrent analyze + sync writes on SQLite
+Runs the same mixed workload against the previous engine setup (default
+rollback journal, synchronous=FULL, Postgres-style pool) and the SQLite
+profile (WAL, synchronous=NORMAL, mmap/cache pragmas, serialized writer).
+
+- analyze threads write small scan batches the way the write-behind logger does
+- sync threads check for duplicates, insert and commit like /api/scan/sync
+- reader threads page through scan history
+
+Run from the backend directory:
+    python benchmarks/bench_sqlite_writes.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+BENCH_DIR = tempfile.mkdtemp(prefix="edtech_sqlite_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DIR}/app.db")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.core.sqlite import configure_sqlite_engine, sqlite_connect_args
+from app.models.equipment import Equipment
+from app.models.scan import ScanMetadata
+from app.services.analytics import record_scans
+
+DURATION_SECONDS = 5
+ANALYZE_THREADS = 4
+SYNC_THREADS = 4
+READER_THREADS = 4
+ANALYZE_BATCH = 20
+SYNC_BATCH = 10
+
+def baseline_engine(url):
+    """The engine run_dev.py used to get: Postgres pool settings, no SQLite tuning"""
+    return create_engine(url, pool_pre_ping=True, pool_size=10, max_overflow=20)
+
+def profiled_engine(url):
+    return configure_sqlite_engine(create_engine(
+        url, connect_args=sqlite_connect_args(), pool_size=10, max_overflow=20
+    ))
+
+def setup(engine):
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    equipment_ids = []
+    for i in range(20):
+        equipment = Equipment(
+            class_name=f"bench-{i}", name_en=f"Bench {i}", category="Bench",
+            description_en="Benchmark item", usage_en="Benchmark item"
+        )
+        db.add(equipment)
+        db.flush()
+        equipment_ids.append(equipment.equipment_id)
+    db.commit()
+    db.close()
+    return Session, equipment_ids
+
+def scan_row(user_id, equipment_id, scanned_at=None):
+    return {
+        "scan_id": str(uuid4()),
+        "user_id": user_id,
+        "equipment_id": equipment_id,
+        "confidence_score": 0.87,
+        "scanned_at": scanned_at or datetime.utcnow(),
+    }
+
+def run(name, engine):
+    Session, equipment_ids = setup(engine)
+    users = [str(uuid4()) for _ in range(50)]
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"analyze": [], "sync": [], "read": [], "errors": 0}
+    
+    def record(kind, started):
+        with lock:
+            stats[kind].append(time.perf_counter() - started)
+    
+    def failed():
+        with lock:
+            stats["errors"] += 1
+    
+    def analyze_worker(seed):
+        i = seed
+        while not stop.is_set():
+            rows = [scan_row(users[(i + n) % len(users)], equipment_ids[(i + n) % len(equipment_ids)])
+                    for n in range(ANALYZE_BATCH)]
+            i += ANALYZE_BATCH
+            started = time.perf_counter()
+            db = Session()
+            try:
+                db.execute(insert(ScanMetadata), rows)
+                record_scans(db, rows)
+                db.commit()
+                record("analyze", started)
+            except Exception:
+                db.rollback()
+                failed()
+            finally:
+                db.close()
+    
+    def sync_worker(seed):
+        i = seed
+        while not stop.is_set():
+            user_id = users[i % len(users)]
+            base = datetime.utcnow() - timedelta(days=1)
+            rows = [scan_row(user_id, equipment_ids[(i + n) % len(equipment_ids)], base + timedelta(seconds=n))
+                    for n in range(SYNC_BATCH)]
+            i += 1
+            started = time.perf_counter()
+            db = Session()
+            try:
+                for row in rows:
+                    db.query(ScanMetadata).filter(
+                        ScanMetadata.user_id == row["user_id"],
+                        ScanMetadata.equipment_id == row["equipment_id"],
+                        ScanMetadata.scanned_at == row["scanned_at"]
+                    ).first()
+                    db.add(ScanMetadata(**row))
+                record_scans(db, rows)
+                db.commit()
+                record("sync", started)
+            except Exception:
+                db.rollback()
+                failed()
+            finally:
+                db.close()
+    
+    def reader_worker(seed):
+        i = seed
+        while not stop.is_set():
+            started = time.perf_counter()
+            db = Session()
+            try:
+                db.query(ScanMetadata).filter(ScanMetadata.user_id == users[i % len(users)]) \
+                    .order_by(ScanMetadata.scanned_at.desc()).limit(50).all()
+                record("read", started)
+            except Exception:
+                failed()
+            finally:
+                db.close()
+            i += 1
+    
+    threads = (
+        [threading.Thread(target=analyze_worker, args=(n,)) for n in range(ANALYZE_THREADS)]
+        + [threading.Thread(target=sync_worker, args=(n,)) for n in range(SYNC_THREADS)]
+        + [threading.Thread(target=reader_worker, args=(n,)) for n in range(READER_THREADS)]
+    )
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION_SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    
+    print(f"{name}")
+    for kind, rows_per_op in (("analyze", ANALYZE_BATCH), ("sync", SYNC_BATCH), ("read", 0)):
+        latencies = sorted(stats[kind])
+        if not latencies:
+            print(f"  {kind:<8} no successful operations")
+            continue
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        rate = len(latencies) / DURATION_SECONDS
+        rows = f"{rate * rows_per_op:8.0f} rows/s" if rows_per_op else " " * 15
+        print(f"  {kind:<8} {rate:8.1f} ops/s {rows}  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms")
+    print(f"  errors   {stats['errors']} (database is locked / write queue timeouts)\n")
+
+def main():
+    print(f"{ANALYZE_THREADS} analyze + {SYNC_THREADS} sync writers, {READER_THREADS} readers, "
+          f"{DURATION_SECONDS}s each\n")
+    run("previous engine (rollback journal, synchronous=FULL)", baseline_engine(f"sqlite:///{BENCH_DIR}/baseline.db"))
+    run("SQLite profile (WAL, synchronous=NORMAL, serialized writer)", profiled_engine(f"sqlite:///{BENCH_DIR}/profile.db"))
+
+if __name__ == "__main__":
+    main()
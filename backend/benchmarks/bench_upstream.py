@@ -0,0 +1,101 @@
+"""
+Benchmark: chat calls against a slow, flaky or hung upstream LLM
+Drives the fault-injecting stub with a steady stream of chat messages and
+compares calling it directly (as chat did before: no timeout, fallback
+only after a failure) with the resilient client. Reports how long each
+message held its worker, latency percentiles and how many messages got a
+real answer rather than the mock fallback.
+
+Run from the backend directory:
+    python benchmarks/bench_upstream.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.upstream import CircuitBreaker, FaultInjectingUpstream, ResilientClient
+
+ARRIVAL_RATE = 50   # chat messages/s
+MESSAGES = 300
+
+SCENARIOS = {
+    # 5% of calls take a second instead of ~60 ms
+    "latency tail": dict(latency=0.05, jitter=0.02, slow_rate=0.05, slow_latency=1.0),
+    # 30% of calls fail fast
+    "flaky": dict(latency=0.05, jitter=0.02, error_rate=0.3),
+    # The upstream stops answering altogether
+    "hung": dict(latency=0.05, hang_rate=1.0),
+}
+
+def resilient(upstream):
+    return ResilientClient(
+        "bench",
+        upstream,
+        deadline=1.5,
+        attempt_timeout=0.5,
+        max_concurrency=32,
+        retries=2,
+        backoff=0.05,
+        hedge_after=0.15,
+        breaker=CircuitBreaker("bench", failure_threshold=5, reset_timeout=5.0)
+    )
+
+async def drive(call):
+    rng = random.Random(1)
+    held, answered = [], 0
+    
+    async def message():
+        nonlocal answered
+        started = time.monotonic()
+        try:
+            await call()
+            answered += 1
+        except Exception:
+            pass  # the mock fallback answers instantly
+        held.append(time.monotonic() - started)
+    
+    tasks = []
+    for _ in range(MESSAGES):
+        tasks.append(asyncio.create_task(message()))
+        await asyncio.sleep(rng.expovariate(ARRIVAL_RATE))
+    # A hung upstream never returns to direct callers; stop waiting after 10s
+    done, pending = await asyncio.wait(tasks, timeout=10)
+    for task in pending:
+        task.cancel()
+    held.extend([10.0] * len(pending))
+    return held, answered, len(pending)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def report(name, held, answered, stuck):
+    print(
+        f"  {name:<10} answered {answered / MESSAGES:6.1%}  p50 {percentile(held, 0.5) * 1000:6.0f} ms  "
+        f"p99 {percentile(held, 0.99) * 1000:6.0f} ms  worker-seconds held {sum(held):7.1f}"
+        + (f"  ({stuck} still waiting after 10s)" if stuck else "")
+    )
+
+async def main():
+    print(f"{MESSAGES} chat messages at {ARRIVAL_RATE}/s\n")
+    for scenario, faults in SCENARIOS.items():
+        print(scenario)
+        direct = FaultInjectingUpstream(seed=2, **faults)
+        report("direct", *await drive(direct))
+        stub = FaultInjectingUpstream(seed=2, **faults)
+        client = resilient(stub)
+        held, answered, stuck = await drive(client)
+        report("resilient", held, answered, stuck)
+        print(f"  {'':<10} {stub.calls} upstream requests for {MESSAGES} messages, circuit {client.breaker.state}\n")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,297 @@
+"""
+Management commands for the EdTech Scanner backend
+
+Usage:
+    python manage.py migrate [--revision REV]
+    python manage.py load-catalog FILE [FILE ...] [--batch-size N]
+    python manage.py ingest-images DIR
+    python manage.py build-embeddings [DIR ...] [--output FILE]
+    python manage.py rebuild-rollups
+    python manage.py ensure-partitions
+    python manage.py archive-scans [--dry-run]
+    python manage.py trace TRACE_ID [--file FILE]
+    python manage.py evaluate-model DIR [--models-dir DIR] [--workers N] [--batch-size N]
+                                        [--limit N] [--output FILE] [--compare FILE]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+def migrate(args):
+    """Create or upgrade the database schema (run once per deploy, before starting workers)"""
+    from alembic import command
+    from alembic.config import Config
+    from app.core.database import SessionLocal
+    from app.services.scan_partitions import ensure_partitions as ensure
+    
+    command.upgrade(Config(str(BACKEND_DIR / "alembic.ini")), args.revision)
+    
+    # Monthly scan partitions are DDL too, so they are created here rather than by workers
+    db = SessionLocal()
+    try:
+        created = ensure(db)
+    finally:
+        db.close()
+    
+    print(f"✓ Schema at {args.revision}" + (f", created partitions: {', '.join(created)}" if created else ""))
+
+def load_catalog(args):
+    """Bulk-load equipment from JSON, CSV or NDJSON catalog files (existing class names are skipped)"""
+    from app.core.database import SessionLocal
+    from app.services.catalog_loader import CatalogFormatError, read_catalog, load_catalog as load
+    
+    for path in args.paths:
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            inserted = load(db, read_catalog(path), batch_size=args.batch_size)
+        except (CatalogFormatError, OSError) as e:
+            sys.exit(f"✗ {path}: {e}")
+        finally:
+            db.close()
+        print(f"✓ {path}: {inserted} equipment items added in {time.perf_counter() - started:.1f}s")
+
+def ingest_images(args):
+    """Store equipment images named <class_name>.<ext> and generate their thumbnails"""
+    from app.core.database import SessionLocal
+    from app.models.equipment import Equipment
+    from app.services.asset_store import AssetError, ingest_image
+    from app.services.catalog import notify_catalog_changed
+    
+    db = SessionLocal()
+    try:
+        equipment = {eq.class_name: eq for eq in db.query(Equipment)}
+        changed = []
+        for path in sorted(Path(args.directory).iterdir()):
+            item = equipment.get(path.stem)
+            if not path.is_file() or item is None:
+                continue
+            try:
+                key = ingest_image(path.read_bytes())
+            except AssetError as e:
+                print(f"✗ {path.name}: {e}")
+                continue
+            if item.image_key != key:
+                item.image_key = key
+                changed.append(item.equipment_id)
+            print(f"✓ {path.name} -> {key[:12]}")
+        db.commit()
+    finally:
+        db.close()
+    
+    if changed:
+        notify_catalog_changed(changed)
+    print(f"✓ {len(changed)} equipment images updated")
+
+def build_embeddings(args):
+    """Embed reference images (uploaded equipment images and DIR/<class_name>/*) for the vector index"""
+    import numpy as np
+    from PIL import Image
+    from app.core.config import settings
+    from app.core.database import SessionLocal
+    from app.models.equipment import Equipment
+    from app.services.asset_store import asset_dir
+    from app.services.tflite_inference import TFLiteModel
+    from app.services.vector_index import save_reference_embeddings
+    
+    sources = []
+    db = SessionLocal()
+    try:
+        uploaded = db.query(Equipment.class_name, Equipment.image_key).filter(Equipment.image_key.isnot(None))
+        for class_name, key in uploaded:
+            sources.extend((class_name, path) for path in asset_dir(key).glob("original.*"))
+    finally:
+        db.close()
+    for directory in args.directories:
+        for class_dir in sorted(Path(directory).iterdir()):
+            if class_dir.is_dir():
+                sources.extend((class_dir.name, path) for path in sorted(class_dir.iterdir()) if path.is_file())
+    
+    model = TFLiteModel()
+    if not model.has_embeddings:
+        sys.exit(
+            "✗ The model has no embedding tensor: set embedding.tensor in models/model_config.json "
+            "to an output or penultimate layer of the model"
+        )
+    vectors, labels = [], []
+    for class_name, path in sources:
+        try:
+            with Image.open(path) as image:
+                vectors.append(model.embed(image))
+        except OSError as e:
+            print(f"✗ {path}: {e}")
+            continue
+        labels.append(class_name)
+    if not vectors:
+        sys.exit("✗ No reference images found")
+    
+    output = args.output or settings.REFERENCE_EMBEDDINGS_PATH
+    save_reference_embeddings(output, np.stack(vectors), labels, model.embedding_tensor)
+    print(f"✓ {len(vectors)} reference embeddings for {len(set(labels))} classes written to {output}")
+
+def rebuild_rollups(args):
+    """Recompute the scan analytics rollups for the days still in scan_metadata"""
+    from app.core.database import SessionLocal
+    from app.services.analytics import rebuild_rollups as rebuild
+    
+    db = SessionLocal()
+    try:
+        counts = rebuild(db)
+    finally:
+        db.close()
+    
+    for table, rows in counts.items():
+        print(f"✓ {table}: {rows} rows")
+
+def ensure_partitions(args):
+    """Create upcoming monthly scan_metadata partitions (Postgres)"""
+    from app.core.database import SessionLocal
+    from app.services.scan_partitions import ensure_partitions as ensure
+    
+    db = SessionLocal()
+    try:
+        created = ensure(db, months_ahead=args.months_ahead)
+    finally:
+        db.close()
+    
+    print(f"✓ Created {len(created)} partitions" + (f": {', '.join(created)}" if created else ""))
+
+def archive_scans(args):
+    """Export cold months of scan_metadata to Parquet and remove them from the database.
+    Their analytics rollups are kept: rebuild-rollups only recomputes days
+    that still have scans in scan_metadata.
+    """
+    from app.core.database import SessionLocal
+    from app.services.scan_archive import archive_cutoff, cold_months, archive_month
+    
+    db = SessionLocal()
+    try:
+        cutoff = archive_cutoff()
+        months = cold_months(db, cutoff)
+        print(f"Archiving scans before {cutoff:%Y-%m}: {len(months)} months")
+        for month in months:
+            if args.dry_run:
+                print(f"  would archive {month:%Y-%m}")
+                continue
+            rows = archive_month(db, month)
+            print(f"✓ {month:%Y-%m}: {rows} scans archived")
+    finally:
+        db.close()
+
+def show_trace(args):
+    """Print the span tree of one trace from the OTLP/JSON export file"""
+    from app.core.config import settings
+    from app.core.tracing import format_tree, read_exported_spans
+    
+    path = args.file or settings.TRACING_EXPORT_PATH
+    if not path:
+        sys.exit("No export file: pass --file or set TRACING_EXPORT_PATH")
+    
+    records = read_exported_spans(path, args.trace_id.strip().lower().replace("-", ""))
+    if not records:
+        sys.exit(f"Trace {args.trace_id} not found in {path}")
+    print(f"Trace {args.trace_id} ({len(records)} spans):")
+    print("\n".join(format_tree(records)))
+
+def evaluate_model(args):
+    """Measure accuracy, calibration and throughput on a labelled image tree (DIR/<class_name>/*)"""
+    import json
+    from app.services.model_eval import compare_reports, evaluate
+    
+    if not Path(args.directory).is_dir():
+        sys.exit(f"✗ {args.directory} is not a directory")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    
+    report = evaluate(
+        args.directory,
+        models_dir=args.models_dir,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        limit=args.limit,
+        progress_every=1000
+    )
+    if not report["dataset"]["images"]:
+        sys.exit(f"✗ No images evaluated under {args.directory} ({report['errors']['count']} failed)")
+    
+    accuracy, run, latency = report["accuracy"], report["run"], report["latency_ms"]
+    print(f"✓ {report['dataset']['images']:,} images, {report['dataset']['classes']} classes, "
+          f"{report['errors']['count']} failed")
+    print(f"  top-1 {accuracy['top1']:.4f}  top-3 {accuracy['top3']:.4f}  ECE {report['calibration']['ece']:.4f}")
+    print(f"  {run['images_per_second']:.1f} images/s with {run['workers']} workers, batches of {run['batch_size']}")
+    for stage, summary in latency.items():
+        print(f"  {stage:10} p50 {summary['p50']:8.2f} ms  p95 {summary['p95']:8.2f} ms  p99 {summary['p99']:8.2f} ms")
+    if report["dataset"]["unknown_classes"]:
+        print(f"  not model labels: {', '.join(report['dataset']['unknown_classes'])}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+    if baseline:
+        print(f"Compared with {args.compare}:")
+        print("\n".join(compare_reports(baseline, report)))
+
+COMMANDS = {
+    "migrate": migrate,
+    "load-catalog": load_catalog,
+    "ingest-images": ingest_images,
+    "build-embeddings": build_embeddings,
+    "rebuild-rollups": rebuild_rollups,
+    "ensure-partitions": ensure_partitions,
+    "archive-scans": archive_scans,
+    "trace": show_trace,
+    "evaluate-model": evaluate_model,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="EdTech Scanner management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    migrate_parser = subparsers.add_parser("migrate", help=migrate.__doc__)
+    migrate_parser.add_argument("--revision", default="head")
+    
+    catalog = subparsers.add_parser("load-catalog", help=load_catalog.__doc__)
+    catalog.add_argument("paths", nargs="+", metavar="FILE")
+    catalog.add_argument("--batch-size", type=int, default=5000)
+    
+    images = subparsers.add_parser("ingest-images", help=ingest_images.__doc__)
+    images.add_argument("directory", metavar="DIR")
+    
+    embeddings = subparsers.add_parser("build-embeddings", help=build_embeddings.__doc__)
+    embeddings.add_argument("directories", nargs="*", metavar="DIR")
+    embeddings.add_argument("--output")
+    
+    subparsers.add_parser("rebuild-rollups", help=rebuild_rollups.__doc__)
+    
+    partitions = subparsers.add_parser("ensure-partitions", help=ensure_partitions.__doc__)
+    partitions.add_argument("--months-ahead", type=int, default=2)
+    
+    archive_help = " ".join(archive_scans.__doc__.split())
+    archive = subparsers.add_parser("archive-scans", help=archive_help, description=archive_help)
+    archive.add_argument("--dry-run", action="store_true")
+    
+    trace = subparsers.add_parser("trace", help=show_trace.__doc__)
+    trace.add_argument("trace_id", metavar="TRACE_ID")
+    trace.add_argument("--file", help="defaults to TRACING_EXPORT_PATH")
+    
+    evaluation = subparsers.add_parser("evaluate-model", help=evaluate_model.__doc__)
+    evaluation.add_argument("directory", metavar="DIR")
+    evaluation.add_argument("--models-dir", help="model.tflite, labels.txt and model_config.json to evaluate (default: models/)")
+    evaluation.add_argument("--workers", type=int, help="worker processes (default: one per CPU; 0 runs in-process)")
+    evaluation.add_argument("--batch-size", type=int, default=16, help="images handed to a worker at a time")
+    evaluation.add_argument("--limit", type=int, help="evaluate at most this many images")
+    evaluation.add_argument("--output", metavar="FILE", help="write the full JSON report here")
+    evaluation.add_argument("--compare", metavar="FILE", help="a previous report to print differences against")
+    
+    args = parser.parse_args()
+    COMMANDS[args.command](args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from alembic import context
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import Base, engine
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+config = context.config
+target_metadata = Base.metadata
+
+# Serializes concurrent `migrate` runs (several containers starting at once) on Postgres
+MIGRATION_LOCK_KEY = 7_034_001
+
+def run_migrations_offline():
+    """Emit the migration SQL without connecting (alembic upgrade --sql)"""
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite cannot ALTER most constraints in place; batch mode rebuilds the table
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
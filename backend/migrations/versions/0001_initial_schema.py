@@ -0,0 +1,156 @@
+"""Initial schema
+
+Creates every table the API used before migrations existed. Tables that are
+already present (databases built by `create_all` or the former init_db.sql) are left
+alone, so existing deployments upgrade in place. On PostgreSQL scan_metadata
+is range-partitioned by month on scanned_at with a DEFAULT partition.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _missing(table: str) -> bool:
+    # Offline (--sql) runs cannot inspect the database and emit the full schema
+    if context.is_offline_mode():
+        return True
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+
+def _create_scan_metadata() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        # Partitioned tables need the partition key in the primary key
+        op.execute("""
+            CREATE TABLE scan_metadata (
+                scan_id VARCHAR(36) NOT NULL,
+                user_id VARCHAR(36) NOT NULL REFERENCES users (user_id),
+                equipment_id VARCHAR(36) NOT NULL REFERENCES equipment (equipment_id),
+                confidence_score FLOAT NOT NULL,
+                device_info TEXT,
+                scanned_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (scan_id, scanned_at)
+            ) PARTITION BY RANGE (scanned_at)
+        """)
+        op.execute("CREATE TABLE scan_metadata_default PARTITION OF scan_metadata DEFAULT")
+    else:
+        op.create_table(
+            "scan_metadata",
+            sa.Column("scan_id", sa.String(36), primary_key=True),
+            sa.Column("user_id", sa.String(36), sa.ForeignKey("users.user_id"), nullable=False),
+            sa.Column("equipment_id", sa.String(36), sa.ForeignKey("equipment.equipment_id"), nullable=False),
+            sa.Column("confidence_score", sa.Float, nullable=False),
+            sa.Column("device_info", sa.Text, nullable=True),
+            sa.Column("scanned_at", sa.DateTime),
+            sa.Column("synced_at", sa.DateTime),
+        )
+    op.create_index("ix_scan_metadata_user_id", "scan_metadata", ["user_id"])
+    op.create_index("ix_scan_metadata_equipment_id", "scan_metadata", ["equipment_id"])
+    op.create_index("ix_scan_metadata_scanned_at", "scan_metadata", ["scanned_at"])
+
+
+def upgrade() -> None:
+    if _missing("users"):
+        op.create_table(
+            "users",
+            sa.Column("user_id", sa.String(36), primary_key=True),
+            sa.Column("auth_method", sa.Enum("GOOGLE", "PHONE", "GUEST", name="authmethod"), nullable=False),
+            sa.Column("google_id", sa.String(255), unique=True, nullable=True),
+            sa.Column("phone_number", sa.String(20), unique=True, nullable=True),
+            sa.Column("email", sa.String(255), unique=True, nullable=True),
+            sa.Column("full_name", sa.String(255), nullable=True),
+            sa.Column("profile_picture", sa.String(512), nullable=True),
+            sa.Column("language_preference", sa.String(5)),
+            sa.Column("is_active", sa.Boolean),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+            sa.Column("last_login_at", sa.DateTime, nullable=True),
+            sa.Column("deleted_at", sa.DateTime, nullable=True),
+        )
+    
+    if _missing("equipment"):
+        op.create_table(
+            "equipment",
+            sa.Column("equipment_id", sa.String(36), primary_key=True),
+            sa.Column("class_name", sa.String(100), nullable=False),
+            sa.Column("name_en", sa.String(255), nullable=False),
+            sa.Column("name_km", sa.String(255), nullable=True),
+            sa.Column("category", sa.String(100), nullable=False),
+            sa.Column("description_en", sa.Text, nullable=False),
+            sa.Column("description_km", sa.Text, nullable=True),
+            sa.Column("usage_en", sa.Text, nullable=False),
+            sa.Column("usage_km", sa.Text, nullable=True),
+            sa.Column("safety_info_en", sa.Text, nullable=True),
+            sa.Column("safety_info_km", sa.Text, nullable=True),
+            sa.Column("image_url", sa.String(512), nullable=True),
+            sa.Column("tags", sa.Text, nullable=True),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+        op.create_index("ix_equipment_class_name", "equipment", ["class_name"], unique=True)
+        op.create_index("ix_equipment_category", "equipment", ["category"])
+        op.create_index("ix_equipment_updated_at", "equipment", ["updated_at"])
+    
+    if _missing("equipment_tombstones"):
+        op.create_table(
+            "equipment_tombstones",
+            sa.Column("equipment_id", sa.String(36), primary_key=True),
+            sa.Column("class_name", sa.String(100), nullable=False),
+            sa.Column("deleted_at", sa.DateTime, nullable=False),
+        )
+        op.create_index("ix_equipment_tombstones_deleted_at", "equipment_tombstones", ["deleted_at"])
+    
+    if _missing("scan_metadata"):
+        _create_scan_metadata()
+    
+    if _missing("scan_daily_equipment"):
+        op.create_table(
+            "scan_daily_equipment",
+            sa.Column("day", sa.Date, primary_key=True),
+            sa.Column("equipment_id", sa.String(36), primary_key=True),
+            sa.Column("scan_count", sa.Integer, nullable=False),
+        )
+        op.create_index("ix_scan_daily_equipment_equipment_id", "scan_daily_equipment", ["equipment_id"])
+    
+    if _missing("scan_daily_user"):
+        op.create_table(
+            "scan_daily_user",
+            sa.Column("user_id", sa.String(36), primary_key=True),
+            sa.Column("day", sa.Date, primary_key=True),
+            sa.Column("scan_count", sa.Integer, nullable=False),
+        )
+    
+    if _missing("scan_confidence_histogram"):
+        op.create_table(
+            "scan_confidence_histogram",
+            sa.Column("day", sa.Date, primary_key=True),
+            sa.Column("equipment_id", sa.String(36), primary_key=True),
+            sa.Column("bucket", sa.Integer, primary_key=True),
+            sa.Column("scan_count", sa.Integer, nullable=False),
+        )
+        op.create_index(
+            "ix_scan_confidence_histogram_equipment_day", "scan_confidence_histogram", ["equipment_id", "day"]
+        )
+
+
+def downgrade() -> None:
+    for table in (
+        "scan_confidence_histogram", "scan_daily_user", "scan_daily_equipment",
+        "scan_metadata", "equipment_tombstones", "equipment", "users",
+    ):
+        op.execute(f"DROP TABLE IF EXISTS {table}")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP TYPE IF EXISTS authmethod")
@@ -0,0 +1,37 @@
+"""Equipment image key
+
+Adds equipment.image_key, the content hash of an image uploaded to the
+asset store.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if not _has_column("equipment", "image_key"):
+        op.add_column("equipment", sa.Column("image_key", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("equipment") as batch_op:
+        batch_op.drop_column("image_key")
@@ -0,0 +1,79 @@
+"""Scan change feed
+
+Adds scan_metadata.change_seq (a per-user sequence number for incremental
+history sync), the per-user counters that hand them out and tombstones
+for deleted scans. Existing scans are numbered per user in sync order.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _missing(table: str) -> bool:
+    if context.is_offline_mode():
+        return True
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_column(table: str, column: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if not _has_column("scan_metadata", "change_seq"):
+        op.add_column("scan_metadata", sa.Column("change_seq", sa.BigInteger, nullable=True))
+        # Number existing scans per user in the order they reached the server
+        op.execute("""
+            UPDATE scan_metadata SET change_seq = numbered.seq
+            FROM (
+                SELECT scan_id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id ORDER BY synced_at, scan_id
+                ) AS seq
+                FROM scan_metadata
+            ) AS numbered
+            WHERE scan_metadata.scan_id = numbered.scan_id
+        """)
+        op.create_index("ix_scan_metadata_user_change_seq", "scan_metadata", ["user_id", "change_seq"])
+
+    if _missing("scan_change_counters"):
+        op.create_table(
+            "scan_change_counters",
+            sa.Column("user_id", sa.String(36), primary_key=True),
+            sa.Column("last_seq", sa.BigInteger, nullable=False),
+        )
+        op.execute("""
+            INSERT INTO scan_change_counters (user_id, last_seq)
+            SELECT user_id, MAX(change_seq) FROM scan_metadata GROUP BY user_id
+        """)
+
+    if _missing("scan_tombstones"):
+        op.create_table(
+            "scan_tombstones",
+            sa.Column("user_id", sa.String(36), primary_key=True),
+            sa.Column("change_seq", sa.BigInteger, primary_key=True),
+            sa.Column("scan_id", sa.String(36), nullable=False),
+            sa.Column("deleted_at", sa.DateTime, nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("scan_tombstones")
+    op.drop_table("scan_change_counters")
+    op.drop_index("ix_scan_metadata_user_change_seq", table_name="scan_metadata")
+    with op.batch_alter_table("scan_metadata") as batch_op:
+        batch_op.drop_column("change_seq")
@@ -0,0 +1,87 @@
+"""
+Production server runner - preforking master with copy-on-write sharing
+Loads the app, model bytes, labels, reference embeddings and pre-rendered
+catalog responses once, then forks workers that share them. Run migrations
+first (`python manage.py migrate`).
+
+Usage:
+    python run_prod.py [--host HOST] [--port PORT] [--workers N] [--graceful-timeout SECONDS]
+
+Signals (to the master):
+    SIGHUP          replace workers one at a time (new worker ready before the old one stops)
+    SIGTERM/SIGINT  finish in-flight requests and exit
+"""
+import gc
+
+# Keep the collector from moving preloaded objects around before they are frozen
+gc.disable()
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.main import app
+from app.api.scan import tflite_model
+from app.core.config import settings
+from app.core.database import SessionLocal, engine, replica_engines
+from app.core.prefork import PreforkServer, memory_usage
+from app.core.redis import MemoryRedis, get_redis
+from app.models.equipment import Equipment
+from app.services.scan_renderer import scan_renderer
+from app.services.vector_index import reference_index
+
+def preload():
+    """Load everything workers can share before they are forked"""
+    started = time.perf_counter()
+    index = reference_index()
+    
+    db = SessionLocal()
+    try:
+        equipment = db.query(Equipment).all()
+        stages = [stage.name for stage in tflite_model.stages] or ["mock"]
+        rendered = scan_renderer.warm(equipment, stages)
+    finally:
+        db.close()
+    # Workers open their own database connections; none may be inherited
+    for target in [engine, *replica_engines]:
+        target.dispose()
+    
+    model_bytes = sum(len(stage.model_content) for stage in tflite_model.stages)
+    print(
+        f"Preloaded {len(tflite_model.labels)} labels, {model_bytes / 2**20:.1f} MiB of model, "
+        f"{len(index) if index else 0} reference embeddings and {rendered} scan responses "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    # One collection now, then everything left is frozen at fork
+    gc.collect()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with preforked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--graceful-timeout", type=float, default=settings.WEB_GRACEFUL_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+    
+    if args.workers > 1 and isinstance(get_redis(), MemoryRedis):
+        print("Warning: REDIS_URL=memory:// keeps OTPs and rate limits per worker; use redis:// or sqlite:///")
+    
+    preload()
+    usage = memory_usage(os.getpid())
+    if usage:
+        print(f"Master RSS after preload: {usage['rss']:.0f} MiB")
+    
+    PreforkServer(
+        app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        graceful_timeout=args.graceful_timeout
+    ).run()
+
+if __name__ == "__main__":
+    main()
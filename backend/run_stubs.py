@@ -0,0 +1,45 @@
+"""
+Upstream stubs runner - local stand-ins for Gemini, Google sign-in and Twilio
+Serves app/services/upstream_stubs.py so the backend can run end to end,
+and under load, without real credentials or provider quotas. Point the
+backend at it with UPSTREAM_STUBS_URL; shape latency and errors with the
+STUB_*_FAULTS settings.
+
+Usage:
+    python run_stubs.py [--host HOST] [--port PORT]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# The stub needs no database or cache of its own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "stub-secret-key")
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    
+    import uvicorn
+    from app.core.config import settings
+    from app.services.upstream_stubs import stub_app
+    
+    print("=" * 60)
+    print("Upstream stubs")
+    print("=" * 60)
+    print(f"Gemini faults: {settings.STUB_GEMINI_FAULTS}")
+    print(f"Google faults: {settings.STUB_GOOGLE_FAULTS}")
+    print(f"SMS faults:    {settings.STUB_SMS_FAULTS}")
+    print(f"Backend setting: UPSTREAM_STUBS_URL=http://{args.host}:{args.port}")
+    print("=" * 60)
+    
+    uvicorn.run(stub_app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
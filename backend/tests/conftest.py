@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+TEST_DIR = tempfile.mkdtemp(prefix="edtech_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DIR}/app.db")
+os.environ.setdefault("REDIS_URL", "memory://")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+from app.core.database import Base, SessionLocal, engine
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
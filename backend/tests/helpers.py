@@ -0,0 +1,17 @@
+"""Scan rows and rollup counts shared by the tests"""
+from app.models.scan import ScanMetadata
+from app.services.analytics import record_scans
+from app.services.scan_changes import assign_change_seqs
+
+def insert_scans(db, rows):
+    """Insert scan rows the way /scan/sync does: change seqs, rows and rollups in one transaction"""
+    assign_change_seqs(db, rows)
+    db.add_all(ScanMetadata(**row) for row in rows)
+    record_scans(db, rows)
+    db.commit()
+
+def counts(db, model):
+    return {
+        tuple(getattr(row, column.name) for column in model.__table__.primary_key): row.scan_count
+        for row in db.query(model)
+    }
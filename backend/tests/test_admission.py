@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from app.core.admission import AdmissionController, AdmissionMiddleware
+
+INFERENCE_SECONDS = 0.05
+
+def analyze_app():
+    app = FastAPI()
+    
+    @app.post("/analyze")
+    async def analyze(image: UploadFile = File(...)):
+        await asyncio.sleep(INFERENCE_SECONDS)
+        return {"bytes": len(await image.read())}
+    
+    return app
+
+def upload_request():
+    request = httpx.Request("POST", "http://test/analyze", files={"image": ("scan.jpg", b"x" * 4096, "image/jpeg")})
+    return [(name.lower().encode(), value.encode()) for name, value in request.headers.items()], request.read()
+
+async def call(middleware, upload_delay=0.0):
+    """Send one upload in two chunks, the second after `upload_delay`; returns (status, seconds)"""
+    headers, body = upload_request()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/analyze", "raw_path": b"/analyze", "query_string": b"", "headers": headers,
+        "server": ("test", 80), "client": ("127.0.0.1", 1234), "root_path": "",
+    }
+    chunks = [
+        {"type": "http.request", "body": body[:100], "more_body": True},
+        {"type": "http.request", "body": body[100:], "more_body": False},
+    ]
+    sent = []
+    
+    async def receive():
+        if not chunks:
+            await asyncio.Event().wait()
+        if len(chunks) == 1:
+            await asyncio.sleep(upload_delay)
+        return chunks.pop(0)
+    
+    async def send(message):
+        sent.append(message)
+    
+    started = asyncio.get_running_loop().time()
+    await middleware(scope, receive, send)
+    starts = [message for message in sent if message["type"] == "http.response.start"]
+    assert len(starts) == 1
+    return starts[0]["status"], asyncio.get_running_loop().time() - started
+
+def test_slow_upload_neither_holds_a_slot_nor_counts_as_latency():
+    controller = AdmissionController(initial_limit=1, max_queue=0)
+    middleware = AdmissionMiddleware(analyze_app(), paths=["/analyze"], controller=controller)
+    
+    async def scenario():
+        # The slow upload starts first, but the fast one gets the only slot while it is still arriving
+        slow = asyncio.create_task(call(middleware, upload_delay=0.3))
+        await asyncio.sleep(0.01)
+        fast_status, _ = await call(middleware)
+        slow_status, slow_seconds = await slow
+        return fast_status, slow_status, slow_seconds
+    
+    fast_status, slow_status, slow_seconds = asyncio.run(scenario())
+    
+    assert (fast_status, slow_status) == (200, 200)
+    assert slow_seconds >= 0.3
+    # The latency baseline is inference time, not upload time
+    assert controller._min_latency < 0.2
+    assert controller.in_flight == 0
+
+def test_request_shed_after_its_body_arrives_gets_only_the_503():
+    controller = AdmissionController(initial_limit=1, max_queue=0)
+    middleware = AdmissionMiddleware(analyze_app(), paths=["/analyze"], controller=controller)
+    
+    async def scenario():
+        first = asyncio.create_task(call(middleware))
+        await asyncio.sleep(0.01)
+        second = await call(middleware)
+        return (await first)[0], second[0]
+    
+    assert asyncio.run(scenario()) == (200, 503)
+    assert controller.in_flight == 0
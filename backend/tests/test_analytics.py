@@ -0,0 +1,35 @@
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import delete
+
+from app.models.analytics import ScanDailyEquipment, ScanDailyUser, ScanConfidenceHistogram
+from app.models.scan import ScanMetadata
+from app.services.analytics import confidence_bucket, rebuild_rollups
+
+from helpers import counts, insert_scans
+
+def test_rebuild_keeps_rollups_of_archived_days(db):
+    user_id, equipment_id = str(uuid4()), str(uuid4())
+    archived_at, live_at = datetime(2024, 1, 10, 8), datetime(2025, 6, 2, 15)
+    rows = [
+        {"scan_id": str(uuid4()), "user_id": user_id, "equipment_id": equipment_id,
+         "confidence_score": 0.7, "scanned_at": scanned_at}
+        for scanned_at in (archived_at, archived_at, live_at)
+    ]
+    insert_scans(db, rows)
+    # What archive-scans leaves behind: the month's rows are gone, its rollups stay
+    db.execute(delete(ScanMetadata).where(ScanMetadata.scanned_at < datetime(2024, 2, 1)))
+    # A live day's rollup drifted and needs the rebuild
+    db.query(ScanDailyUser).filter(ScanDailyUser.day == live_at.date()).update({"scan_count": 9})
+    db.commit()
+    
+    rebuild_rollups(db)
+    
+    archived, live, bucket = archived_at.date(), live_at.date(), confidence_bucket(0.7)
+    assert counts(db, ScanDailyEquipment) == {(archived, equipment_id): 2, (live, equipment_id): 1}
+    assert counts(db, ScanDailyUser) == {(user_id, archived): 2, (user_id, live): 1}
+    assert counts(db, ScanConfidenceHistogram) == {
+        (archived, equipment_id, bucket): 2,
+        (live, equipment_id, bucket): 1,
+    }
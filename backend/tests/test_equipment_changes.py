@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from app.api.equipment import get_equipment_changes
+from app.models.equipment import Equipment, EquipmentTombstone
+
+SYNCED_AT = datetime(2025, 4, 1, 8)
+
+def add_equipment(db, minutes):
+    equipment = Equipment(
+        equipment_id=str(uuid4()), class_name=f"item_{minutes}", name_en="Item", category="glassware",
+        description_en="An item", usage_en="Use it", updated_at=SYNCED_AT + timedelta(minutes=minutes)
+    )
+    db.add(equipment)
+    return equipment.equipment_id
+
+def add_tombstone(db, minutes):
+    tombstone = EquipmentTombstone(
+        equipment_id=str(uuid4()), class_name=f"gone_{minutes}", deleted_at=SYNCED_AT + timedelta(minutes=minutes)
+    )
+    db.add(tombstone)
+    return tombstone.equipment_id
+
+def sync(db, limit, since=SYNCED_AT, since_id=None):
+    """Follow the feed from a cursor to its end; returns the pages"""
+    pages = []
+    while True:
+        page = asyncio.run(get_equipment_changes(
+            updated_since=since, since_id=since_id, limit=limit, image_width=None, db=db
+        ))
+        pages.append(page)
+        since, since_id = page.next_since, page.next_since_id
+        if not page.has_more:
+            return pages
+
+def test_deletions_are_paged_with_updates(db):
+    updated = [add_equipment(db, minutes) for minutes in (1, 3, 5)]
+    deleted = [add_tombstone(db, minutes) for minutes in (2, 4, 6, 7)]
+    db.commit()
+    
+    pages = sync(db, limit=2)
+    
+    assert [len(page.items) + len(page.deleted) for page in pages] == [2, 2, 2, 1]
+    assert [str(item.equipment_id) for page in pages for item in page.items] == updated
+    assert [str(equipment_id) for page in pages for equipment_id in page.deleted] == deleted
+    # Nothing new: resuming from the last cursor returns an empty page
+    last = pages[-1]
+    resumed = sync(db, limit=2, since=last.next_since, since_id=last.next_since_id)
+    assert len(resumed) == 1 and not resumed[0].items and not resumed[0].deleted
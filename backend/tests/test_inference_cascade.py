@@ -0,0 +1,95 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.services.tflite_inference import ModelStage, TFLiteModel
+
+LABELS = ["beaker", "flask", "funnel", "pipette"]
+
+class StubInterpreter:
+    """Stands in for tf.lite.Interpreter: returns fixed raw class scores, records its inputs"""
+    
+    def __init__(self, raw_scores):
+        self.raw_scores = np.asarray([raw_scores])
+        self.inputs = []
+    
+    def set_tensor(self, index, value):
+        self.inputs.append(value)
+    
+    def invoke(self):
+        pass
+    
+    def get_tensor(self, index):
+        return self.raw_scores
+
+def stub_stage(name, raw_scores, input_dtype=np.float32, quantization=(0.0, 0), threshold=None):
+    stage = ModelStage(name, Path(f"{name}.tflite"), threshold=threshold)
+    stage.interpreter = StubInterpreter(raw_scores)
+    stage.input_details = [{"index": 0, "dtype": input_dtype}]
+    stage.output_details = [{"index": 1, "dtype": stage.interpreter.raw_scores.dtype, "quantization": quantization}]
+    stage.input_dtype = np.dtype(input_dtype)
+    return stage
+
+@pytest.fixture
+def model(tmp_path):
+    (tmp_path / "labels.txt").write_text("\n".join(LABELS))
+    model = TFLiteModel(tmp_path)
+    # Interpreters are "built" for this process: the stubs stand in for them
+    model._interpreters_pid = os.getpid()
+    return model
+
+def quantized(scores, scale=1 / 255, zero_point=0, dtype=np.uint8):
+    return np.round(np.asarray(scores) / scale + zero_point).astype(dtype)
+
+def run(model, stages):
+    model.stages = stages
+    return model.predict_array(np.zeros((224, 224, 3), dtype=np.uint8))
+
+def test_confident_quantized_stage_answers_with_dequantized_scores(model):
+    fast = stub_stage("fast", quantized([0.05, 0.9, 0.03, 0.02]), np.uint8, (1 / 255, 0), threshold=0.8)
+    full = stub_stage("full", [0.1, 0.2, 0.6, 0.1])
+    
+    result = run(model, [fast, full])
+    
+    assert result["stage"] == "fast"
+    assert result["class_name"] == "flask"
+    assert result["confidence"] == pytest.approx(0.9, abs=1 / 255)
+    assert all(0 <= p["confidence"] <= 1 for p in result["top_3_predictions"])
+    assert not full.interpreter.inputs
+    # uint8 stages take the raw pixels
+    assert fast.interpreter.inputs[0].dtype == np.uint8
+
+def test_unsure_quantized_stage_escalates(model):
+    # Raw uint8 scores peak at 140: only the dequantized 0.55 is below the threshold
+    fast = stub_stage("fast", quantized([0.55, 0.25, 0.1, 0.1]), np.uint8, (1 / 255, 0), threshold=0.8)
+    full = stub_stage("full", [0.1, 0.2, 0.6, 0.1])
+    
+    result = run(model, [fast, full])
+    
+    assert result["stage"] == "full"
+    assert result["class_name"] == "funnel"
+    assert result["confidence"] == pytest.approx(0.6)
+    assert full.interpreter.inputs[0].dtype == np.float32
+
+def test_int8_stage_uses_its_zero_point(model):
+    scale, zero_point = 1 / 256, -128
+    fast = stub_stage(
+        "fast", quantized([0.1, 0.1, 0.05, 0.75], scale, zero_point, np.int8), np.uint8, (scale, zero_point),
+        threshold=0.7
+    )
+    
+    result = run(model, [fast, stub_stage("full", [0.25, 0.25, 0.25, 0.25])])
+    
+    assert result["stage"] == "fast"
+    assert result["class_name"] == "pipette"
+    assert result["confidence"] == pytest.approx(0.75, abs=scale)
+
+def test_per_class_threshold_overrides_stage_threshold(model):
+    fast = stub_stage("fast", [0.05, 0.85, 0.05, 0.05], threshold=0.8)
+    fast.class_thresholds = {"flask": 0.95}
+    
+    result = run(model, [fast, stub_stage("full", [0.1, 0.7, 0.1, 0.1])])
+    
+    assert result["stage"] == "full"
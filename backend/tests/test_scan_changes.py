@@ -0,0 +1,56 @@
+from datetime import datetime
+from uuid import uuid4
+
+from app.models.analytics import ScanDailyEquipment, ScanDailyUser, ScanConfidenceHistogram
+from app.models.scan import ScanMetadata, ScanTombstone
+from app.services.analytics import confidence_bucket
+from app.services.scan_changes import delete_scan
+
+from helpers import counts, insert_scans
+
+def test_delete_scan_decrements_every_rollup(db):
+    user_id, equipment_id = str(uuid4()), str(uuid4())
+    scanned_at = datetime(2025, 3, 14, 9, 30)
+    rows = [
+        {"scan_id": str(uuid4()), "user_id": user_id, "equipment_id": equipment_id,
+         "confidence_score": 0.91, "scanned_at": scanned_at}
+        for _ in range(2)
+    ]
+    # Same day, other equipment and confidence bucket: must be left alone
+    other_equipment_id = str(uuid4())
+    rows.append({"scan_id": str(uuid4()), "user_id": user_id, "equipment_id": other_equipment_id,
+                 "confidence_score": 0.55, "scanned_at": scanned_at})
+    insert_scans(db, rows)
+    
+    day, bucket = scanned_at.date(), confidence_bucket(0.91)
+    assert counts(db, ScanDailyEquipment)[(day, equipment_id)] == 2
+    assert counts(db, ScanDailyUser)[(user_id, day)] == 3
+    assert counts(db, ScanConfidenceHistogram)[(day, equipment_id, bucket)] == 2
+    
+    delete_scan(db, db.get(ScanMetadata, rows[0]["scan_id"]))
+    db.commit()
+    
+    assert db.get(ScanMetadata, rows[0]["scan_id"]) is None
+    assert db.query(ScanTombstone).filter(ScanTombstone.scan_id == rows[0]["scan_id"]).count() == 1
+    assert counts(db, ScanDailyEquipment) == {(day, equipment_id): 1, (day, other_equipment_id): 1}
+    assert counts(db, ScanDailyUser) == {(user_id, day): 2}
+    assert counts(db, ScanConfidenceHistogram) == {
+        (day, equipment_id, bucket): 1,
+        (day, other_equipment_id, confidence_bucket(0.55)): 1,
+    }
+
+def test_deleting_every_scan_zeroes_the_rollups(db):
+    user_id, equipment_id = str(uuid4()), str(uuid4())
+    rows = [
+        {"scan_id": str(uuid4()), "user_id": user_id, "equipment_id": equipment_id,
+         "confidence_score": 0.8, "scanned_at": datetime(2025, 3, day, 12)}
+        for day in (14, 15)
+    ]
+    insert_scans(db, rows)
+    
+    for row in rows:
+        delete_scan(db, db.get(ScanMetadata, row["scan_id"]))
+    db.commit()
+    
+    for model in (ScanDailyEquipment, ScanDailyUser, ScanConfidenceHistogram):
+        assert set(counts(db, model).values()) == {0}
@@ -0,0 +1,75 @@
+import asyncio
+import fcntl
+import json
+import os
+from datetime import datetime
+from uuid import uuid4
+
+from app.core.database import SessionLocal
+from app.models.scan import ScanMetadata
+from app.services.scan_logger import ScanLogger
+
+def spooled_row():
+    return {
+        "scan_id": str(uuid4()),
+        "user_id": str(uuid4()),
+        "equipment_id": str(uuid4()),
+        "confidence_score": 0.9,
+        "scanned_at": datetime(2025, 5, 1, 10).isoformat()
+    }
+
+def write_spool(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(row) + "\n" for row in rows)
+    open(f"{path}.lock", "w").close()
+
+def stored(db, rows):
+    return {scan_id for (scan_id,) in db.query(ScanMetadata.scan_id).filter(
+        ScanMetadata.scan_id.in_([row["scan_id"] for row in rows])
+    )}
+
+def restart(logger):
+    async def cycle():
+        await logger.start()
+        await logger.stop()
+    asyncio.run(cycle())
+
+def test_replays_only_spools_of_exited_workers(db, tmp_path):
+    spool = str(tmp_path / "scans.ndjson")
+    exited_rows, live_rows = [spooled_row()], [spooled_row()]
+    write_spool(f"{spool}.1001", exited_rows)
+    write_spool(f"{spool}.1002", live_rows)
+    # Worker 1002 is still running: it holds its lock
+    live_lock = os.open(f"{spool}.1002.lock", os.O_RDWR)
+    fcntl.flock(live_lock, fcntl.LOCK_EX)
+    try:
+        restart(ScanLogger(session_factory=SessionLocal, spool_path=spool))
+        
+        assert stored(db, exited_rows) == {exited_rows[0]["scan_id"]}
+        assert not os.path.exists(f"{spool}.1001") and not os.path.exists(f"{spool}.1001.lock")
+        assert not stored(db, live_rows)
+        with open(f"{spool}.1002", encoding="utf-8") as f:
+            assert json.loads(f.read())["scan_id"] == live_rows[0]["scan_id"]
+    finally:
+        os.close(live_lock)
+    
+    # Once worker 1002 has exited, the next start picks its records up
+    restart(ScanLogger(session_factory=SessionLocal, spool_path=spool))
+    assert stored(db, live_rows) == {live_rows[0]["scan_id"]}
+    assert os.listdir(tmp_path) == []
+
+def test_spools_under_own_pid_and_cleans_up_after_a_clean_stop(db, tmp_path):
+    spool = str(tmp_path / "scans.ndjson")
+    logger = ScanLogger(session_factory=SessionLocal, spool_path=spool, flush_interval_ms=10)
+    row = spooled_row()
+    row["scanned_at"] = datetime(2025, 5, 1, 10)
+    
+    async def log_one():
+        await logger.start()
+        await logger.enqueue(row)
+        assert os.path.exists(f"{spool}.{os.getpid()}")
+        await logger.stop()
+    asyncio.run(log_one())
+    
+    assert stored(db, [row]) == {row["scan_id"]}
+    assert os.listdir(tmp_path) == []
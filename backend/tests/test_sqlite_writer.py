@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.core.sqlite import configure_sqlite_engine, sqlite_connect_args
+
+def test_event_loop_writes_do_not_wait_for_the_writer_lock(tmp_path):
+    engine = configure_sqlite_engine(
+        create_engine(f"sqlite:///{tmp_path}/writer.db", connect_args=sqlite_connect_args())
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE notes (body TEXT)"))
+    
+    # A worker thread keeps the process writer lock: it has committed but not yet returned its connection
+    holding, done = threading.Event(), threading.Event()
+    
+    def worker():
+        with engine.connect() as conn:
+            conn.execute(text("INSERT INTO notes VALUES ('thread')"))
+            conn.commit()
+            holding.set()
+            done.wait(5)
+    
+    thread = threading.Thread(target=worker)
+    thread.start()
+    holding.wait(5)
+    
+    async def write_from_route():
+        started = time.monotonic()
+        with engine.connect() as conn:
+            conn.execute(text("INSERT INTO notes VALUES ('loop')"))
+            conn.commit()
+        return time.monotonic() - started
+    
+    try:
+        assert asyncio.run(write_from_route()) < 1
+    finally:
+        done.set()
+        thread.join()
+    
+    with engine.connect() as conn:
+        assert sorted(conn.execute(text("SELECT body FROM notes")).scalars()) == ["loop", "thread"]
+    engine.dispose()